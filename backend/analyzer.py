@@ -1,48 +1,206 @@
-import math
+import json
+import os
+import shutil
+from contextlib import closing
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterator, Optional
 
 import cv2
 import numpy as np
 
+from backend import metrics, stats
+from backend.cache import AnalysisCache
 from backend.logger import logger
+from backend.previews import jpeg_size
+from backend.pipeline import (
+    AsyncWriter,
+    PipelineConfig,
+    cv_threads,
+    imap_ordered,
+    prefetch,
+    resolve_workers,
+)
 from backend.storage import (
+    MEASUREMENTS_FILE,
     SESSION_CAL_DIR,
     SESSION_RES_DIR,
+    link_or_copy,
+    write_session_file,
 )
 
+# ---------------------------------------------------------------------------
+# Параметры пайплайна
+# ---------------------------------------------------------------------------
+
+CLAHE_CLIP_LIMIT = 2.0
+CLAHE_TILE_GRID  = (8, 8)
+BLUR_KERNEL      = (5, 5)
+BINARY_THRESHOLD = 127
+MIN_CONTOUR_AREA = 100
+
+# Кадры больше TILED_MIN_PIXELS (сшитые сканы препаратов) обрабатываются
+# тайлами TILE_SIZE x TILE_SIZE, см. «Тайловая обработка больших кадров».
+# Результат тот же, что у обработки целиком, поэтому в ключ кэша не входят.
+# Полноразмерные contrasted/, contours/ и analyzed/ для таких кадров не
+# строятся: частицы показываются оверлеем поверх sources/.
+TILED_MIN_PIXELS = 32 * 1024 ** 2
+TILE_SIZE        = 2048
+
+# Увеличивать при любом изменении кода, влияющем на результат анализа:
+# версия входит в ключ кэша (backend.cache)
+PIPELINE_VERSION = 2
+
+PIPELINE_PARAMS = {
+    'version':     PIPELINE_VERSION,
+    'clahe_clip':  CLAHE_CLIP_LIMIT,
+    'clahe_grid':  CLAHE_TILE_GRID,
+    'blur':        BLUR_KERNEL,
+    'threshold':   BINARY_THRESHOLD,
+    'min_area':    MIN_CONTOUR_AREA,
+}
+
+# Промежуточные изображения исследования (папки сессии рядом с sources/)
+INTERMEDIATE_FOLDERS = ('contrasted', 'contours', 'analyzed')
+
+# Папка сессии, куда пишется идущий анализ; см. _publish_run
+STAGING_FOLDER = '.analysis'
+
 # ---------------------------------------------------------------------------
 # Низкоуровневые функции обработки
 # ---------------------------------------------------------------------------
 
+# Весь анализ идёт в одном канале: исходники декодируются сразу в оттенки
+# серого (IMREAD_GRAYSCALE), цвет появляется только при отрисовке контуров
+# и номеров. Функции принимают и BGR — он переводится в серый один раз.
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
 def increase_contrast(image: np.ndarray) -> np.ndarray:
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    """
+    CLAHE + размытие; результат одноканальный. Большой кадр собирается
+    из тайлов (_contrast_tiles) без полноразмерных промежуточных копий.
+    """
+    gray = _to_gray(image)
+    if gray.size > TILED_MIN_PIXELS:
+        out = np.empty_like(gray)
+        for y, x, block in _contrast_tiles(gray):
+            out[y:y + block.shape[0], x:x + block.shape[1]] = block
+        return out
+    clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID)
     contrasted = clahe.apply(gray)
-    blurred = cv2.GaussianBlur(contrasted, (5, 5), 0)
-    return cv2.cvtColor(blurred, cv2.COLOR_GRAY2BGR)
+    return cv2.GaussianBlur(contrasted, BLUR_KERNEL, 0)
 
 
-def find_and_draw_contours(image: np.ndarray) -> np.ndarray:
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    h, w = image.shape[:2]
+def _binarize(image: np.ndarray) -> np.ndarray:
+    _, thresh = cv2.threshold(image, BINARY_THRESHOLD, 255, cv2.THRESH_BINARY_INV)
+    return thresh
+
+
+def filter_contours(contours, shape: tuple[int, ...]) -> list[np.ndarray]:
+    """
+    Оставляет контуры площадью > MIN_CONTOUR_AREA, ни одна точка которых
+    не лежит на однопиксельной рамке кадра. Все точки склеиваются в один
+    массив, а min/max координат и площадь (формула Гаусса, как в
+    cv2.contourArea) считаются для всех контуров сразу через reduceat.
+    """
+    if len(contours) == 0:
+        return []
+    h, w = shape[:2]
+
+    lengths = np.fromiter((len(c) for c in contours), dtype=np.int64, count=len(contours))
+    starts = np.zeros_like(lengths)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    pts = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+    x, y = pts[:, 0], pts[:, 1]
+
+    # Индекс следующей вершины с замыканием каждого контура на свою первую точку
+    nxt = np.arange(1, len(pts) + 1)
+    nxt[starts + lengths - 1] = starts
+    area = np.abs(np.add.reduceat(x * y[nxt] - x[nxt] * y, starts)) / 2
+
+    mins = np.minimum.reduceat(pts, starts, axis=0)
+    maxs = np.maximum.reduceat(pts, starts, axis=0)
+    keep = (
+        (area > MIN_CONTOUR_AREA)
+        & (mins[:, 0] > 0) & (mins[:, 1] > 0)
+        & (maxs[:, 0] < w - 1) & (maxs[:, 1] < h - 1)
+    )
+    return [contours[i] for i in np.flatnonzero(keep)]
+
+
+def extract_contours(image: np.ndarray) -> list[np.ndarray]:
+    """
+    Единственный проход бинаризации и поиска контуров: возвращает частицы
+    площадью > MIN_CONTOUR_AREA, не касающиеся края кадра. Этот набор используется
+    и для отрисовки contours/, и для измерений analyzed/.
+    """
+    contours, _ = cv2.findContours(_binarize(_to_gray(image)), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return filter_contours(contours, image.shape)
 
-    def within_bounds(cnt):
-        for pt in cnt:
-            x, y = pt[0]
-            if x <= 0 or y <= 0 or x >= w - 1 or y >= h - 1:
-                return False
-        return True
 
-    filtered = [c for c in contours if cv2.contourArea(c) > 100 and within_bounds(c)]
-    cv2.drawContours(image, filtered, -1, (0, 0, 255), 2)
+def find_particles(image: np.ndarray) -> list[np.ndarray]:
+    """
+    То же, что extract_contours(increase_contrast(image)), когда сами
+    промежуточные изображения не нужны (ленивый анализ, оверлей).
+    Большой кадр бинаризуется по тайлам прямо из исходника: кроме него
+    в памяти только маска.
+    """
+    gray = _to_gray(image)
+    if gray.size <= TILED_MIN_PIXELS:
+        return extract_contours(increase_contrast(gray))
+    mask = np.empty_like(gray)
+    for y, x, block in _contrast_tiles(gray):
+        mask[y:y + block.shape[0], x:x + block.shape[1]] = _binarize(block)
+    # Контуры ищутся по всей маске сразу, поэтому частицы на стыках
+    # тайлов прослеживаются целиком — склеивать и отсеивать их половинки
+    # не нужно, набор частиц тот же, что у кадра целиком
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return filter_contours(contours, gray.shape)
+
+
+def find_and_draw_contours(
+    image: np.ndarray,
+    contours: list[np.ndarray] | None = None,
+) -> np.ndarray:
+    """
+    Рисует контуры красным. BGR-изображение меняется на месте, для
+    одноканального возвращается новая цветная копия.
+    """
+    if contours is None:
+        contours = extract_contours(image)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    cv2.drawContours(image, contours, -1, (0, 0, 255), 2)
     return image
 
 
-def pixels_to_real_units(pixels: float, coeff: float, division: float) -> float:
-    if coeff == 0:
-        return pixels
-    return (pixels / coeff) * division
+def measure_contours(
+    contours: list[np.ndarray],
+    start_number: int = 1,
+    calibration_coefficient: float = 1.0,
+    division_price_value: float = 1.0,
+) -> list[dict]:
+    """
+    Измеряет готовый набор контуров (см. extract_contours) без отрисовки
+    номеров. Тонкое представление над столбцами metrics.measure.
+    """
+    cols = metrics.to_real_units(
+        metrics.measure(contours), calibration_coefficient, division_price_value,
+    )
+    return metrics.to_rows(cols, start_number)
+
+
+def draw_contour_numbers(image: np.ndarray, contours: list[dict]) -> np.ndarray:
+    """Подписывает номера частиц в их центрах масс."""
+    for c in contours:
+        label, pos = str(c['contour_number']), (c['cx'], c['cy'])
+        cv2.putText(image, label, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 6)
+        cv2.putText(image, label, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+    return image
 
 
 def analyze_contours(
@@ -50,63 +208,143 @@ def analyze_contours(
     start_number: int = 1,
     calibration_coefficient: float = 1.0,
     division_price_value: float = 1.0,
+    contours: list[np.ndarray] | None = None,
 ) -> tuple[np.ndarray, list[dict], int]:
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    h, w = image.shape[:2]
+    if contours is None:
+        contours = extract_contours(image)
+    results = measure_contours(contours, start_number, calibration_coefficient, division_price_value)
+    draw_contour_numbers(image, results)
+    return image, results, start_number + len(results)
 
-    def within_bounds(cnt):
-        for pt in cnt:
-            x, y = pt[0]
-            if x <= 0 or y <= 0 or x >= w - 1 or y >= h - 1:
-                return False
-        return True
-
-    filtered = [c for c in contours if cv2.contourArea(c) > 100 and within_bounds(c)]
-    results = []
-
-    for cnt in filtered:
-        M = cv2.moments(cnt)
-        cx = int(M['m10'] / M['m00']) if M['m00'] != 0 else 0
-        cy = int(M['m01'] / M['m00']) if M['m00'] != 0 else 0
-
-        perimeter_px = cv2.arcLength(cnt, True)
-        area_px = cv2.contourArea(cnt)
-        rect = cv2.minAreaRect(cnt)
-        width_px = min(rect[1])
-        length_px = max(rect[1])
-        dek_px = math.sqrt((4 * area_px) / math.pi)
-
-        c, d = calibration_coefficient, division_price_value
-        results.append({
-            'contour_number': start_number,
-            'perimeter': round(pixels_to_real_units(perimeter_px, c, d), 2),
-            'area':      round(pixels_to_real_units(area_px, c ** 2, d ** 2), 2),
-            'length':    round(pixels_to_real_units(length_px, c, d), 2),
-            'width':     round(pixels_to_real_units(width_px, c, d), 2),
-            'dek':       round(pixels_to_real_units(dek_px, c, d), 2),
-            'cx': cx,
-            'cy': cy,
-        })
-
-        cv2.putText(image, str(start_number), (cx, cy),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 6)
-        cv2.putText(image, str(start_number), (cx, cy),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-        start_number += 1
-
-    return image, results, start_number
+
+# ---------------------------------------------------------------------------
+# Тайловая обработка больших кадров
+# ---------------------------------------------------------------------------
+#
+# cv2 CLAHE и GaussianBlur работают с кадром целиком и на каждом шаге
+# создают полноразмерные копии — на сканах в сотни мегапикселей это
+# гигабайты. Здесь тот же результат, бит в бит, собирается по тайлам:
+#   - таблицы CLAHE (сетка CLAHE_TILE_GRID) считаются один раз по
+#     гистограммам всего кадра, как в OpenCV, включая его дополнение
+#     отражением, если размер не делится на сетку;
+#   - каждый тайл отображается через эти общие таблицы с той же
+#     билинейной интерполяцией в float32 — швов между тайлами нет;
+#   - размытие считается по тайлу с перекрытием BLUR_KERNEL // 2, чтобы
+#     на стыках были те же соседи, что и в целом кадре.
+# Рабочая память — несколько буферов размера тайла, не кадра.
+
+
+def _reflect_101(idx: np.ndarray, n: int) -> np.ndarray:
+    """Индексы за краем [0, n) — как cv2.BORDER_REFLECT_101."""
+    return np.where(idx >= n, 2 * (n - 1) - idx, idx)
+
+
+def _clahe_luts(gray: np.ndarray) -> tuple[np.ndarray, tuple[int, int]]:
+    """
+    Таблицы CLAHE (float32, [строка сетки, столбец сетки, яркость]) и
+    размер ячейки (ширина, высота) — как в cv2.CLAHE.apply для 8 бит.
+    """
+    h, w = gray.shape
+    gx, gy = CLAHE_TILE_GRID
+    if w % gx == 0 and h % gy == 0:
+        tw, th = w // gx, h // gy
+    else:
+        # OpenCV дополняет кадр до кратного сетке по обеим осям сразу
+        tw, th = (w + gx - w % gx) // gx, (h + gy - h % gy) // gy
+
+    total = tw * th
+    clip = max(int(CLAHE_CLIP_LIMIT * total / 256), 1) if CLAHE_CLIP_LIMIT > 0 else 0
+    scale = np.float32(255) / np.float32(total)
+
+    luts = np.empty((gy, gx, 256), np.float32)
+    for i in range(gy):
+        rows = np.arange(i * th, (i + 1) * th)
+        for j in range(gx):
+            cols = np.arange(j * tw, (j + 1) * tw)
+            if rows[-1] < h and cols[-1] < w:
+                cell = gray[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+            else:
+                cell = gray[np.ix_(_reflect_101(rows, h), _reflect_101(cols, w))]
+            hist = np.bincount(cell.ravel(), minlength=256)
+            if clip:
+                clipped = int(np.maximum(hist - clip, 0).sum())
+                np.minimum(hist, clip, out=hist)
+                batch, residual = divmod(clipped, 256)
+                hist += batch
+                if residual:
+                    hist[np.arange(0, 256, max(256 // residual, 1))[:residual]] += 1
+            luts[i, j] = np.clip(np.rint(np.cumsum(hist).astype(np.float32) * scale), 0, 255)
+    return luts, (tw, th)
+
+
+def _clahe_axis(start: int, stop: int, cell: int, cells: int):
+    """Соседние ячейки сетки и веса интерполяции для координат [start, stop)."""
+    pos = np.arange(start, stop).astype(np.float32) * (np.float32(1) / np.float32(cell)) - np.float32(0.5)
+    first = np.floor(pos)
+    weight = pos - first
+    first = first.astype(np.int64)
+    return np.maximum(first, 0), np.minimum(first + 1, cells - 1), weight, np.float32(1) - weight
+
+
+def _runs(a: np.ndarray, b: np.ndarray) -> list[tuple[int, int]]:
+    """Отрезки [начало, конец), на которых пара (a, b) постоянна."""
+    bounds = (np.flatnonzero((np.diff(a) != 0) | (np.diff(b) != 0)) + 1).tolist()
+    return list(zip([0] + bounds, bounds + [len(a)]))
+
+
+def _clahe_apply(
+    window: np.ndarray,
+    y0: int,
+    x0: int,
+    luts: np.ndarray,
+    cell: tuple[int, int],
+) -> np.ndarray:
+    """CLAHE для окна кадра с левым верхним углом (x0, y0) по общим таблицам."""
+    tw, th = cell
+    gy, gx = luts.shape[:2]
+    h, w = window.shape
+    ty1, ty2, ya, ya1 = _clahe_axis(y0, y0 + h, th, gy)
+    tx1, tx2, xa, xa1 = _clahe_axis(x0, x0 + w, tw, gx)
+
+    out = np.empty_like(window)
+    # Внутри каждого куска окна четыре соседние таблицы одни и те же
+    for r0, r1 in _runs(ty1, ty2):
+        top, bottom = luts[ty1[r0]], luts[ty2[r0]]
+        wy, wy1 = ya[r0:r1, None], ya1[r0:r1, None]
+        for c0, c1 in _runs(tx1, tx2):
+            left, right = tx1[c0], tx2[c0]
+            v = window[r0:r1, c0:c1]
+            wx, wx1 = xa[c0:c1], xa1[c0:c1]
+            # Порядок операций — как в OpenCV, иначе округление разойдётся
+            res = ((cv2.LUT(v, top[left]) * wx1 + cv2.LUT(v, top[right]) * wx) * wy1
+                   + (cv2.LUT(v, bottom[left]) * wx1 + cv2.LUT(v, bottom[right]) * wx) * wy)
+            out[r0:r1, c0:c1] = np.clip(np.rint(res), 0, 255)
+    return out
+
+
+def _contrast_tiles(gray: np.ndarray) -> Iterator[tuple[int, int, np.ndarray]]:
+    """(y, x, блок increase_contrast) для тайлов TILE_SIZE x TILE_SIZE по порядку строк."""
+    h, w = gray.shape
+    tile = max(TILE_SIZE, 1)
+    halo = BLUR_KERNEL[0] // 2
+    luts, cell = _clahe_luts(gray)
+    logger.debug(f'Тайловая обработка {w}x{h}: тайл {tile}')
+    for y in range(0, h, tile):
+        for x in range(0, w, tile):
+            y1, x1 = min(y + tile, h), min(x + tile, w)
+            wy, wx = max(0, y - halo), max(0, x - halo)
+            window = gray[wy:min(h, y1 + halo), wx:min(w, x1 + halo)]
+            blurred = cv2.GaussianBlur(_clahe_apply(window, wy, wx, luts, cell), BLUR_KERNEL, 0)
+            yield y, x, blurred[y - wy:y1 - wy, x - wx:x1 - wx]
 
 
 # ---------------------------------------------------------------------------
 # Функции калибровки
 # ---------------------------------------------------------------------------
 
-def find_vertical_lines(img_bgr: np.ndarray) -> np.ndarray:
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+def find_vertical_lines(image: np.ndarray) -> np.ndarray:
     binary_inv = cv2.adaptiveThreshold(
-        gray, 255,
+        _to_gray(image), 255,
         cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
         cv2.THRESH_BINARY_INV,
         blockSize=31,
@@ -143,61 +381,416 @@ def detect_black_strips_left_edges(binary: np.ndarray, draw_img: np.ndarray) ->
 # Пайплайны
 # ---------------------------------------------------------------------------
 
+@dataclass
+class _ImageResult:
+    """Результат обработки одного исходника в процессе пула."""
+    name: str
+    ok: bool = True
+    pixel_cols: dict[str, np.ndarray] = field(default_factory=metrics.empty_columns)
+    contoured: Optional[np.ndarray] = None  # None при попадании в кэш и в ленивом режиме
+    cache_key: str = ''
+    cached: bool = False
+    # False — промежуточные изображения не строились (ленивый режим, большой кадр)
+    rendered: bool = True
+
+
+def _encode_jpg(image: np.ndarray) -> bytes:
+    ok, buf = cv2.imencode('.jpg', image)
+    if not ok:
+        raise ValueError('Не удалось закодировать изображение')
+    return buf.tobytes()
+
+
+def _process_research_image(
+    src_path: Path,
+    res_dir: Path,
+    cache: Optional[AnalysisCache] = None,
+    lazy: bool = False,
+    data: Optional[bytes] = None,
+    save: Optional[Callable[..., None]] = None,
+) -> _ImageResult:
+    """
+    Обработка одного исходника; выполняется в пуле процессов или потоков.
+    Пишет contrasted/ и contours/, возвращает изображение с контурами
+    и пиксельные столбцы измерений — перевод в единицы, глобальные номера
+    и подписи в analyzed/ делает основной процесс.
+    При попадании в кэш промежуточные файлы берутся из него ссылками.
+    lazy — только измерения, без кодирования и записи изображений.
+    Кадры больше TILED_MIN_PIXELS всегда обрабатываются как в ленивом
+    режиме: полноразмерные изображения контуров для них не строятся.
+    data — уже прочитанные байты исходника (стадия чтения конвейера).
+    save(fn, *args) — стадия записи; None — писать сразу.
+    """
+    name = src_path.name
+    if data is None:
+        data = src_path.read_bytes()
+    size = jpeg_size(data)
+    if size and size[0] * size[1] > TILED_MIN_PIXELS:
+        lazy = True
+
+    key = cache.key(data) if cache else ''
+    if cache:
+        cols = cache.load_columns(key)
+        if cols is not None:
+            if lazy:
+                return _ImageResult(name, pixel_cols=cols, cache_key=key, cached=True, rendered=False)
+            cached = [cache.file_path(key, f'{folder}.jpg') for folder in ('contrasted', 'contours')]
+            # Запись, созданная ленивым анализом, картинок может не содержать
+            if all(cached):
+                for folder, path in zip(('contrasted', 'contours'), cached):
+                    link_or_copy(path, res_dir / folder / name)
+                return _ImageResult(name, pixel_cols=cols, cache_key=key, cached=True)
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return _ImageResult(name, ok=False)
+
+    # Не-JPEG: размер известен только после декодирования
+    lazy = lazy or image.size > TILED_MIN_PIXELS
+    if lazy:
+        found = find_particles(image)
+    else:
+        contrasted = increase_contrast(image)
+        found = extract_contours(contrasted)
+    # Исходник больше не нужен — на больших кадрах это сотни мегабайт
+    del image
+    cols = metrics.measure(found)
+    if cache:
+        # Картинки добавятся в запись при записи (_save_intermediates)
+        cache.store(key, cols, {})
+    if lazy:
+        return _ImageResult(name, pixel_cols=cols, cache_key=key, rendered=False)
+
+    contoured = find_and_draw_contours(contrasted, found)
+    (save or _call)(_save_intermediates, res_dir, name, contrasted, contoured, cache, key)
+    return _ImageResult(name, pixel_cols=cols, contoured=contoured, cache_key=key)
+
+
+def _call(fn: Callable, *args) -> None:
+    fn(*args)
+
+
+def _save_intermediates(
+    res_dir: Path,
+    name: str,
+    contrasted: np.ndarray,
+    contoured: np.ndarray,
+    cache: Optional[AnalysisCache],
+    key: str,
+) -> None:
+    """Стадия записи: кодирует contrasted/ и contours/, пишет в сессию и в кэш."""
+    for folder, image in (('contrasted', contrasted), ('contours', contoured)):
+        jpg = _encode_jpg(image)
+        write_session_file(res_dir / folder / name, jpg)
+        if cache:
+            cache.store_file(key, f'{folder}.jpg', jpg)
+
+
+def _write_analyzed(
+    result: _ImageResult,
+    contours: list[dict],
+    start_number: int,
+    analyzed_path: Path,
+    cache: Optional[AnalysisCache],
+) -> None:
+    """
+    Пишет analyzed/ с глобальными номерами частиц; выполняется на стадии
+    записи. Картинка из кэша годится как есть, если нумерация на ней
+    начинается с того же номера; иначе номера наносятся заново на
+    закэшированное изображение контуров.
+    """
+    key = result.cache_key
+    if result.contoured is None:
+        cached = cache.file_path(key, 'analyzed.jpg')
+        if cached and cache.read_meta(key).get('start_number') == start_number:
+            link_or_copy(cached, analyzed_path)
+            return
+        image = cv2.imread(str(cache.file_path(key, 'contours.jpg')))
+    else:
+        # Тот же массив может ещё кодироваться в contours/ другим потоком записи
+        image = result.contoured.copy()
+
+    draw_contour_numbers(image, contours)
+    analyzed_jpg = _encode_jpg(image)
+    write_session_file(analyzed_path, analyzed_jpg)
+    if cache:
+        cache.store_file(key, 'analyzed.jpg', analyzed_jpg, {'start_number': start_number})
+
+
+def _compute_stage(
+    process: Callable[..., _ImageResult],
+    files: list[Path],
+    workers: int,
+    config: PipelineConfig,
+    writer: AsyncWriter,
+    in_process: bool,
+) -> Iterator[_ImageResult]:
+    """
+    Стадии чтения и расчёта конвейера: результаты в порядке файлов.
+    В этом процессе (потоки) исходники читаются наперёд, а картинки
+    уходят на стадию записи; в пуле процессов каждый процесс читает и
+    пишет сам.
+    """
+    if in_process:
+        return imap_ordered(
+            lambda item: process(item[0], data=item[1], save=writer.submit),
+            prefetch(files, config.read_ahead), workers, 'threads',
+        )
+    if config.cv_threads >= 0:
+        return imap_ordered(process, files, workers,
+                            initializer=cv2.setNumThreads, initargs=(config.cv_threads,))
+    return imap_ordered(process, files, workers)
+
+
 def run_research_analysis(
     calibration_coefficient: float = 1.0,
     division_price_value: float = 1.0,
+    workers: int = 1,
+    on_progress: Optional[Callable[..., None]] = None,
+    cache_dir: Optional[Path] = None,
+    lazy: bool = False,
+    pipeline: Optional[PipelineConfig] = None,
+    streaming: bool = False,
 ) -> dict:
     """
     Обрабатывает все файлы из session/research/sources/.
-    Результаты пишет в contrasted/, contours/, analyzed/.
-    Возвращает {'contours': [...], 'averages': {...}}.
+    Результаты пишет в contrasted/, contours/, analyzed/, пиксельные
+    измерения — в measurements.npz (для пересчёта под другую калибровку).
+    lazy — изображения не пишутся, их строит render_research_image по запросу.
+    workers — число процессов или потоков расчёта (1 — в этом потоке,
+    0 — по числу ядер); остальное устройство конвейера — pipeline.
+    on_progress(done, total, filename, contours) вызывается после каждого
+    файла; исключение из колбэка прерывает анализ (так работает отмена).
+    cache_dir — папка кэша по содержимому (None — без кэша).
+    Средние считаются накопителями (stats.StreamingStats), измерения
+    пишутся на диск по мере обработки (metrics.MeasurementsWriter).
+    streaming — не собирать контуры в ответ: памяти нужно на одно
+    изображение, а частицы доступны только через on_progress и
+    measurements.npz.
+    Возвращает {'contours': [...], 'count': n, 'averages': {...}}; при
+    streaming contours пуст, зато есть приближённая сводка 'stats'.
+    Всё пишется в STAGING_FOLDER и заменяет результаты сессии только
+    после успешного завершения: ошибка или отмена оставляют прежние.
     """
-    sources_dir    = SESSION_RES_DIR / 'sources'
-    contrasted_dir = SESSION_RES_DIR / 'contrasted'
-    contours_dir   = SESSION_RES_DIR / 'contours'
-    analyzed_dir   = SESSION_RES_DIR / 'analyzed'
+    sources_dir = SESSION_RES_DIR / 'sources'
+    staging     = SESSION_RES_DIR / STAGING_FOLDER
+    # Остатки прерванного запуска (например, закрытого приложения)
+    shutil.rmtree(staging, ignore_errors=True)
+    for folder in INTERMEDIATE_FOLDERS + (OVERLAY_FOLDER,):
+        (staging / folder).mkdir(parents=True)
+    analyzed_dir = staging / 'analyzed'
 
     all_contours: list[dict] = []
+    running = stats.StreamingStats()
     contour_number = 1
 
-    files = sorted(sources_dir.iterdir()) if sources_dir.exists() else []
+    files = sorted(p for p in sources_dir.iterdir() if p.is_file()) if sources_dir.exists() else []
+    config = pipeline or PipelineConfig()
+    workers = resolve_workers(workers, len(files))
+    # Расчёт в этом процессе: потоки или последовательный проход
+    in_process = config.executor == 'threads' or workers <= 1
     logger.info(
         f'Анализ: {len(files)} файлов, '
-        f'коэфф={calibration_coefficient}, деление={division_price_value}'
+        f'{"потоков" if in_process else "процессов"}={workers}, '
+        f'коэфф={calibration_coefficient}, деление={division_price_value}, ленивый={lazy}'
     )
 
-    for src_path in files:
-        if not src_path.is_file():
-            continue
-        logger.info(f'Обработка {src_path.name}')
+    cache = AnalysisCache(cache_dir, PIPELINE_PARAMS) if cache_dir else None
+    hits = misses = 0
+
+    process = partial(_process_research_image, res_dir=staging, cache=cache, lazy=lazy)
+    try:
+        with metrics.MeasurementsWriter(staging / MEASUREMENTS_FILE) as measurements, \
+                AsyncWriter(config.write_threads, config.write_queue) as writer, \
+                cv_threads(config.cv_threads if in_process else -1), \
+                closing(_compute_stage(process, files, workers, config, writer, in_process)) as results:
+            for done, result in enumerate(results, 1):
+                name = result.name
+                if not result.ok:
+                    logger.error(f'Не удалось прочитать {name}')
+                    if on_progress:
+                        on_progress(done, len(files), name, [])
+                    continue
+                hits += result.cached
+                misses += not result.cached
+
+                # Номера назначаются здесь, в порядке файлов, — как при последовательном проходе
+                cols = metrics.to_real_units(result.pixel_cols, calibration_coefficient, division_price_value)
+                contours = metrics.to_rows(cols, contour_number)
+                if not lazy and result.rendered:
+                    writer.submit(_write_analyzed, result, contours, contour_number, analyzed_dir / name, cache)
+                contour_number += len(contours)
+                running.add(cols)
+                measurements.append(name, result.pixel_cols)
+
+                logger.info(f'{name}: найдено {len(contours)} контуров')
+                if not streaming:
+                    all_contours.extend(contours)
+                if on_progress:
+                    on_progress(done, len(files), name, contours)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _publish_run(staging)
+
+    if cache:
+        logger.info(f'Кэш: попаданий {hits}, промахов {misses}')
+        cache.evict()
+    logger.info(f'Анализ завершён: итого {running.count} контуров')
+    result = {'contours': all_contours, 'count': running.count, 'averages': running.averages()}
+    if streaming:
+        result['stats'] = running.summary()
+    return result
+
+
+def _publish_run(staging: Path) -> None:
+    """
+    Заменяет результаты сессии результатами из staging: картинки и
+    оверлеи прошлого анализа не переживают новый (особенно ленивый),
+    measurements.npz подменяется последним.
+    """
+    for folder in INTERMEDIATE_FOLDERS + (OVERLAY_FOLDER,):
+        target = SESSION_RES_DIR / folder
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging / folder, target)
+    os.replace(staging / MEASUREMENTS_FILE, SESSION_RES_DIR / MEASUREMENTS_FILE)
+    shutil.rmtree(staging, ignore_errors=True)
 
-        image = cv2.imread(str(src_path))
+
+# ---------------------------------------------------------------------------
+# Отложенные промежуточные изображения
+# ---------------------------------------------------------------------------
+#
+# После ленивого анализа в сессии есть только исходники и measurements.npz.
+# Пайплайн детерминирован, поэтому любую промежуточную картинку можно
+# построить заново из исходника, а номера частиц и их центры — взять из
+# сохранённых измерений. Построенная картинка остаётся в сессии.
+
+def _file_measurements(res_dir: Path, name: str) -> Optional[tuple[dict[str, np.ndarray], int]]:
+    """Пиксельные столбцы частиц файла name и номер первой из них; None — файл не анализировался."""
+    measurements_path = res_dir / MEASUREMENTS_FILE
+    if not measurements_path.exists():
+        return None
+    m = metrics.load_measurements(measurements_path)
+    if name not in m.files:
+        return None
+    i = m.files.index(name)
+    first = int(m.counts[:i].sum())
+    cols = {k: v[first:first + int(m.counts[i])] for k, v in m.columns.items()}
+    return cols, first + 1
+
+
+def render_research_image(name: str, folder: str, res_dir: Optional[Path] = None) -> Optional[Path]:
+    """
+    Путь к промежуточному изображению folder/name, при необходимости
+    построенному сейчас. None — файл не анализировался, не читается или
+    больше TILED_MIN_PIXELS (для него — оверлей поверх sources/).
+    res_dir — папка исследования (по умолчанию сессия).
+    """
+    res_dir = res_dir or SESSION_RES_DIR
+    path = res_dir / folder / name
+    if path.exists():
+        return path
+
+    source = res_dir / 'sources' / name
+    if folder not in INTERMEDIATE_FOLDERS or not source.exists():
+        return None
+    measured = _file_measurements(res_dir, name)
+    if measured is None:
+        return None
+    data = source.read_bytes()
+    size = jpeg_size(data)
+    image = None
+    if not size or size[0] * size[1] <= TILED_MIN_PIXELS:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
         if image is None:
-            logger.error(f'Не удалось прочитать {src_path.name}')
-            continue
+            return None
+    if image is None or image.size > TILED_MIN_PIXELS:
+        logger.info(f'{name}: кадр слишком велик для {folder}/, используется оверлей')
+        return None
 
-        contrasted = increase_contrast(image.copy())
-        cv2.imwrite(str(contrasted_dir / src_path.name), contrasted)
+    out = increase_contrast(image)
+    if folder != 'contrasted':
+        out = find_and_draw_contours(out, extract_contours(out))
+    if folder == 'analyzed':
+        cols, start_number = measured
+        draw_contour_numbers(out, metrics.to_rows(cols, start_number))
 
-        contoured = find_and_draw_contours(contrasted.copy())
-        cv2.imwrite(str(contours_dir / src_path.name), contoured)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_session_file(path, _encode_jpg(out))
+    logger.debug(f'Построено отложенное изображение {folder}/{name}')
+    return path
 
-        analyzed, contours, contour_number = analyze_contours(
-            contoured, contour_number,
-            calibration_coefficient, division_price_value,
-        )
-        cv2.imwrite(str(analyzed_dir / src_path.name), analyzed)
 
-        logger.info(f'{src_path.name}: найдено {len(contours)} контуров')
-        all_contours.extend(contours)
+# ---------------------------------------------------------------------------
+# Векторный оверлей
+# ---------------------------------------------------------------------------
+#
+# Контуры и номера частиц в виде данных, а не пикселей: UI рисует их
+# поверх исходника (SVG) и может скрывать, подсвечивать и масштабировать
+# без обращения к серверу. Формат overlays/<имя файла>.json (1.jpg.json —
+# с расширением, чтобы 1.jpg и 1.png не делили один оверлей):
+#   {'width': w, 'height': h,
+#    'particles': [{'number': n, 'cx': x, 'cy': y, 'points': [[x, y], ...]}]}
+# Координаты — в пикселях исходника, многоугольники упрощены approxPolyDP.
 
-    averages: dict[str, float] = {'perimeter': 0, 'area': 0, 'width': 0, 'length': 0, 'dek': 0}
-    if all_contours:
-        for key in averages:
-            averages[key] = round(sum(c[key] for c in all_contours) / len(all_contours), 2)
+OVERLAY_FOLDER  = 'overlays'
+OVERLAY_EPSILON = 1.0  # допуск упрощения контура, px
 
-    logger.info(f'Анализ завершён: итого {len(all_contours)} контуров')
-    return {'contours': all_contours, 'averages': averages}
+
+def build_overlay(image: np.ndarray, cols: dict[str, np.ndarray], start_number: int) -> Optional[dict]:
+    """
+    Оверлей для одноканального исходника и уже измеренных частиц на нём.
+    None — найденные контуры не совпадают с измерениями по числу: номера
+    легли бы не на те частицы, вместо оверлея нужна картинка analyzed/.
+    """
+    found = find_particles(image)
+    if len(found) != metrics.count(cols):
+        logger.warning(f'Оверлей: найдено {len(found)} контуров, в измерениях {metrics.count(cols)}')
+        return None
+    particles = [
+        {
+            'number': start_number + i,
+            'cx': x,
+            'cy': y,
+            'points': cv2.approxPolyDP(cnt, OVERLAY_EPSILON, True).reshape(-1, 2).tolist(),
+        }
+        for i, (cnt, x, y) in enumerate(zip(found, cols['cx'].tolist(), cols['cy'].tolist()))
+    ]
+    h, w = image.shape[:2]
+    return {'width': w, 'height': h, 'particles': particles}
+
+
+def overlay_path(name: str, res_dir: Optional[Path] = None) -> Path:
+    """Файл оверлея исходника name в папке исследования (по умолчанию сессия)."""
+    return (res_dir or SESSION_RES_DIR) / OVERLAY_FOLDER / f'{name}.json'
+
+
+def get_research_overlay(name: str, res_dir: Optional[Path] = None) -> Optional[dict]:
+    """
+    Оверлей файла name исследования; строится при первом запросе и
+    сохраняется рядом с промежуточными картинками. None — файл не
+    анализировался или оверлей не совпал с измерениями (build_overlay).
+    """
+    res_dir = res_dir or SESSION_RES_DIR
+    path = overlay_path(name, res_dir)
+    if path.exists():
+        return json.loads(path.read_text('utf-8'))
+
+    source = res_dir / 'sources' / name
+    measured = _file_measurements(res_dir, name) if source.exists() else None
+    if measured is None:
+        return None
+    image = cv2.imread(str(source), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+
+    overlay = build_overlay(image, *measured)
+    if overlay is None:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_session_file(path, json.dumps(overlay, separators=(',', ':')).encode('utf-8'))
+    return overlay
 
 
 def run_calibration_analysis() -> dict:
@@ -212,27 +805,27 @@ def run_calibration_analysis() -> dict:
 
     logger.info('Калибровка: начало обработки')
 
-    src = cv2.imread(str(source_path))
+    src = cv2.imread(str(source_path), cv2.IMREAD_GRAYSCALE)
     if src is None:
         raise ValueError('Не удалось прочитать sources.jpg')
 
     contrasted = increase_contrast(src)
-    cv2.imwrite(str(SESSION_CAL_DIR / 'contrasted.jpg'), contrasted)
+    write_session_file(SESSION_CAL_DIR / 'contrasted.jpg', _encode_jpg(contrasted))
 
     binary = find_vertical_lines(contrasted)
-    contours_img = contrasted.copy()
+    contours_img = cv2.cvtColor(contrasted, cv2.COLOR_GRAY2BGR)
     xs = detect_black_strips_left_edges(binary, contours_img)
-    cv2.imwrite(str(SESSION_CAL_DIR / 'contours.jpg'), contours_img)
+    write_session_file(SESSION_CAL_DIR / 'contours.jpg', _encode_jpg(contours_img))
 
     if len(xs) < 2:
-        cv2.imwrite(str(SESSION_CAL_DIR / 'calibrated.jpg'), contrasted)
+        write_session_file(SESSION_CAL_DIR / 'calibrated.jpg', _encode_jpg(contrasted))
         logger.info('Калибровка: найдено менее 2 полос, коэффициент=0')
         return {'coefficient': 0.0}
 
     distances = [xs[i] - xs[i - 1] for i in range(1, len(xs))]
     avg_distance = sum(distances) / len(distances)
 
-    final_img = contrasted.copy()
+    final_img = cv2.cvtColor(contrasted, cv2.COLOR_GRAY2BGR)
     h, w = final_img.shape[:2]
 
     y_blue = int(h * 0.6)
@@ -248,7 +841,7 @@ def run_calibration_analysis() -> dict:
     cv2.putText(final_img, label, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 3)
     cv2.putText(final_img, label, pos, cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 1)
 
-    cv2.imwrite(str(SESSION_CAL_DIR / 'calibrated.jpg'), final_img)
+    write_session_file(SESSION_CAL_DIR / 'calibrated.jpg', _encode_jpg(final_img))
 
     coefficient = round(avg_distance, 3)
     logger.info(f'Калибровка завершена: коэффициент={coefficient}')
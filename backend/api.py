@@ -3,21 +3,41 @@ import json
 from pathlib import Path
 
 import cv2
+import numpy as np
 
 import backend.database as db
 import backend.storage as storage
-from backend.analyzer import run_calibration_analysis, run_research_analysis
+from backend import metrics, stats
+from backend.analyzer import (
+    INTERMEDIATE_FOLDERS,
+    get_research_overlay,
+    overlay_path,
+    render_research_image,
+    run_calibration_analysis,
+    run_research_analysis,
+)
+from backend.image_server import ImageServer
+from backend.jobs import Job, JobManager
 from backend.logger import logger
 from backend.models import (
     DIVISION_PRICES,
     MICROSCOPES,
     Calibration,
-    ContourData,
     Research,
 )
+from backend.pipeline import PipelineConfig
+from backend.previews import PREVIEW_SIZES, PreviewStore
 
 _CUSTOM_MICROSCOPES_PATH = storage.DATA_DIR / 'microscopes.json'
 
+# Ресурс JobManager: импорт и анализ работают с одной папкой сессии
+# исследования и не выполняются одновременно
+_RESEARCH_SESSION = 'research_session'
+
+
+class CalibrationNotFound(Exception):
+    """Калибровки, в единицах которой нужны результаты сессии, больше нет."""
+
 
 def _load_custom_microscopes() -> list[dict]:
     if _CUSTOM_MICROSCOPES_PATH.exists():
@@ -41,8 +61,21 @@ def _cal_to_dict(cal: Calibration) -> dict:
     }
 
 
-def _res_to_dict(res: Research, contours: list[ContourData] | None = None) -> dict:
-    d = {
+def _contour_rows(cols: dict[str, np.ndarray]) -> list[dict]:
+    """Столбцы из db.load_contour_columns -> строки для UI."""
+    keys = db.CONTOUR_COLUMNS
+    return [dict(zip(keys, values)) for values in zip(*(cols[k].tolist() for k in keys))]
+
+
+def _contour_columns(cols: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Столбцы metrics (в единицах калибровки) -> db.CONTOUR_COLUMNS, номера с 1."""
+    contour_cols = {k: cols[k] for k in db.CONTOUR_COLUMNS if k != 'contour_number'}
+    contour_cols['contour_number'] = np.arange(1, metrics.count(cols) + 1, dtype=np.int32)
+    return contour_cols
+
+
+def _res_to_dict(res: Research) -> dict:
+    return {
         'id': res.id,
         'name': res.name,
         'employee': res.employee,
@@ -55,27 +88,26 @@ def _res_to_dict(res: Research, contours: list[ContourData] | None = None) -> di
         'average_dek': res.average_dek,
         'date': res.date.isoformat(),
     }
-    if contours is not None:
-        d['contours'] = [
-            {
-                'contour_number': c.contour_number,
-                'perimeter': c.perimeter,
-                'area': c.area,
-                'width': c.width,
-                'length': c.length,
-                'dek': c.dek,
-            }
-            for c in contours
-        ]
-    return d
 
 
 class Api:
     """Публичные методы этого класса вызываются из JS через window.pywebview.api.*"""
 
     def __init__(self):
-        # id=0 означает «ещё не сохранено»
-        self.session = {'research_id': 0, 'calibration_id': 0}
+        # id=0 означает «ещё не сохранено»; analysis_calibration_id —
+        # калибровка, в единицах которой посчитаны результаты сессии
+        self.session = {'research_id': 0, 'calibration_id': 0, 'analysis_calibration_id': 0}
+        self._jobs = JobManager()
+        self._previews = PreviewStore(storage.SESSION_DIR, storage.SESSION_PREV_DIR)
+        self._images = ImageServer(storage.SESSION_DIR, self._previews)
+        self._window = None
+        # (ключ, значение) последнего источника get_contours_page и его выборки
+        self._contours_cache: tuple | None = None
+        self._order_cache: tuple | None = None
+
+    def bind_window(self, window) -> None:
+        """Окно pywebview нужно для нативных диалогов; задаётся из main.py."""
+        self._window = window
 
     # -----------------------------------------------------------------------
     # Управление сессией
@@ -86,6 +118,7 @@ class Api:
         try:
             storage.clear_session_research()
             self.session['research_id'] = 0
+            self.session['analysis_calibration_id'] = 0
             return {'ok': True}
         except Exception:
             logger.exception('Ошибка new_research')
@@ -106,6 +139,10 @@ class Api:
     # -----------------------------------------------------------------------
 
     def upload_image(self, filename: str, b64_data: str, context: str) -> dict:
+        """
+        Файл целиком в base64 через мост. Для исследований — только запасной
+        путь (перетаскивание); основной — import_images по путям на диске.
+        """
         logger.info(f'upload_image filename={filename} context={context}')
         try:
             # Убираем data URI префикс если есть
@@ -120,30 +157,109 @@ class Api:
                 path = storage.SESSION_RES_DIR / 'sources' / filename
                 (storage.SESSION_RES_DIR / 'sources').mkdir(parents=True, exist_ok=True)
 
-            path.write_bytes(raw)
+            storage.write_session_file(path, raw)
             return {'ok': True, 'filename': filename}
         except Exception:
             logger.exception(f'Ошибка upload_image filename={filename}')
             return {'ok': False}
 
+    def import_images(self, paths: list[str]) -> dict:
+        """
+        Импорт исходников исследования по путям на диске (файлы или папки)
+        в фоновой задаче 'import'; ход выполнения — через get_job_status.
+        """
+        logger.info(f'import_images paths={len(paths)}')
+        try:
+            files = storage.expand_import_paths(paths)
+            if not files:
+                return {'ok': False, 'error': 'Среди выбранного нет изображений'}
+
+            def run(job: Job) -> dict:
+                return {'files': storage.import_source_files(files, job.report)}
+
+            job = self._jobs.start('import', run, _RESEARCH_SESSION)
+            return {'ok': True, 'job_id': job.id}
+        except Exception as e:
+            logger.exception('Ошибка import_images')
+            return {'ok': False, 'error': str(e)}
+
+    def import_images_dialog(self, folder: bool = False) -> dict:
+        """
+        Нативный диалог выбора файлов (или папки, если folder) и импорт
+        выбранного. job_id=None — пользователь закрыл диалог.
+        """
+        logger.info(f'import_images_dialog folder={folder}')
+        try:
+            import webview
+
+            if folder:
+                selected = self._window.create_file_dialog(webview.FileDialog.FOLDER)
+            else:
+                patterns = ';'.join(f'*{s}' for s in storage.IMAGE_SUFFIXES)
+                selected = self._window.create_file_dialog(
+                    webview.FileDialog.OPEN,
+                    allow_multiple=True,
+                    file_types=(f'Изображения ({patterns})', 'Все файлы (*.*)'),
+                )
+            if not selected:
+                return {'ok': True, 'job_id': None}
+            return self.import_images(list(selected))
+        except Exception:
+            logger.exception('Ошибка import_images_dialog')
+            return {'ok': False, 'error': 'Не удалось открыть диалог'}
+
     def delete_image(self, filename: str, context: str) -> dict:
         logger.info(f'delete_image filename={filename} context={context}')
         try:
             if context == 'calibration':
-                for name in ('sources.jpg', 'contrasted.jpg', 'contours.jpg', 'calibrated.jpg'):
-                    p = storage.SESSION_CAL_DIR / name
-                    if p.exists():
-                        p.unlink()
+                paths = [storage.SESSION_CAL_DIR / name
+                         for name in ('sources.jpg', 'contrasted.jpg', 'contours.jpg', 'calibrated.jpg')]
             else:
-                for folder in ('sources', 'contrasted', 'contours', 'analyzed'):
-                    p = storage.SESSION_RES_DIR / folder / filename
-                    if p.exists():
-                        p.unlink()
-            return {'ok': True}
+                paths = [storage.SESSION_RES_DIR / folder / filename
+                         for folder in ('sources', 'contrasted', 'contours', 'analyzed')]
+                paths.append(overlay_path(filename, storage.SESSION_RES_DIR))
+            self._unlink_session_files(paths)
+            if context != 'calibration' and self._drop_measurements(filename):
+                # Результат сессии изменился — новые итоги для UI
+                try:
+                    cols = self._session_results()
+                except CalibrationNotFound as e:
+                    # Файл уже удалён, а пересчитать итоги не в чем
+                    return {'ok': True, 'results': None, 'error': str(e)}
+                return {'ok': True, 'results': {'count': metrics.count(cols), 'averages': metrics.averages(cols)}}
+            return {'ok': True, 'results': None}
         except Exception:
             logger.exception(f'Ошибка delete_image filename={filename}')
             return {'ok': False}
 
+    def _unlink_session_files(self, paths: list[Path]) -> None:
+        for p in paths:
+            if p.exists():
+                self._previews.invalidate(p)
+                p.unlink()
+
+    def _drop_measurements(self, filename: str) -> bool:
+        """
+        Убирает частицы удалённого файла из measurements.npz сессии; False —
+        файл не анализировался. Номера частиц следующих файлов сдвигаются,
+        поэтому их analyzed/ и оверлеи удаляются — они строятся заново по
+        запросу (render_research_image, get_research_overlay).
+        """
+        path = storage.SESSION_RES_DIR / storage.MEASUREMENTS_FILE
+        if not path.exists():
+            return False
+        m = metrics.load_measurements(path)
+        if filename not in m.files:
+            return False
+        later = m.files[m.files.index(filename) + 1:]
+        storage.write_session_file(path, metrics.measurements_bytes(metrics.without_file(m, filename)))
+        self._unlink_session_files(
+            [storage.SESSION_RES_DIR / 'analyzed' / name for name in later]
+            + [overlay_path(name, storage.SESSION_RES_DIR) for name in later]
+        )
+        self._contours_cache = self._order_cache = None
+        return True
+
     def list_images(self, context: str) -> dict:
         logger.info(f'list_images context={context}')
         try:
@@ -153,34 +269,118 @@ class Api:
             logger.exception('Ошибка list_images')
             return {'ok': False, 'files': []}
 
-    def get_image(self, filename: str, folder: str, context: str) -> dict:
-        logger.info(f'get_image filename={filename} folder={folder} context={context}')
+    def get_image(self, filename: str, folder: str, context: str, size: str = 'full') -> dict:
+        """
+        Возвращает URL изображения на локальном сервере (с версией файла
+        в query, чтобы webview кэшировал его сам). Если сервер поднять не
+        удалось — прежний data URI в base64.
+        size: 'full' | 'preview' | 'thumb' — см. backend.previews.PREVIEW_SIZES.
+        """
+        logger.info(f'get_image filename={filename} folder={folder} context={context} size={size}')
         try:
-            b64 = storage.get_session_image_b64(filename, folder, context)
-            return {'ok': True, 'data': b64}
+            path = storage.get_session_image_path(filename, folder, context)
+            if path is None and context == 'research' and folder in INTERMEDIATE_FOLDERS:
+                # После ленивого анализа картинка строится при первом запросе
+                path = render_research_image(filename, folder)
+            if path is None:
+                return {'ok': True, 'data': ''}
+            if size not in PREVIEW_SIZES:
+                size = 'full'
+            try:
+                return {'ok': True, 'data': self._images.url_for(path, size)}
+            except OSError:
+                logger.exception('Сервер изображений недоступен, отдаём base64')
+                return {'ok': True, 'data': storage.image_to_base64(path)}
         except Exception:
             logger.exception(f'Ошибка get_image filename={filename}')
             return {'ok': False, 'data': ''}
 
+    def get_overlay(self, filename: str) -> dict:
+        """
+        Контуры и номера частиц файла исследования для отрисовки поверх
+        исходника (формат — см. backend.analyzer, «Векторный оверлей»).
+        overlay=None — файл ещё не анализировался; fallback=True — файл
+        анализировался, но оверлей не совпал с измерениями, и номера надо
+        показывать на готовой картинке analyzed/.
+        """
+        logger.info(f'get_overlay filename={filename}')
+        try:
+            overlay = get_research_overlay(filename)
+            fallback = False
+            if overlay is None:
+                path = storage.SESSION_RES_DIR / storage.MEASUREMENTS_FILE
+                fallback = path.exists() and filename in metrics.load_measurements(path).files
+            return {'ok': True, 'overlay': overlay, 'fallback': fallback}
+        except Exception:
+            logger.exception(f'Ошибка get_overlay filename={filename}')
+            return {'ok': False, 'overlay': None}
+
     # -----------------------------------------------------------------------
     # Выполнение анализа
     # -----------------------------------------------------------------------
 
-    def execute_research(self, calibration_id: int) -> dict:
-        logger.info(f'execute_research calibration_id={calibration_id}')
+    @staticmethod
+    def _calibration_params(calibration_id: int) -> tuple[float, float]:
+        """Возвращает (коэффициент, цена деления) калибровки или (1.0, 1.0)."""
+        coeff, division = 1.0, 1.0
+        if calibration_id and calibration_id > 0:
+            cal = db.get_calibration(calibration_id)
+            if cal:
+                coeff = cal.coefficient
+                division = float(cal.division_price.split()[0])
+        return coeff, division
+
+    @staticmethod
+    def _existing_calibration_params(calibration_id: int) -> tuple[float, float]:
+        """
+        Как _calibration_params, но удалённая калибровка — ошибка
+        CalibrationNotFound, а не молчаливый пересчёт в пиксели.
+        """
+        if calibration_id and calibration_id > 0 and db.get_calibration(calibration_id) is None:
+            raise CalibrationNotFound('Калибровка результатов удалена: выберите другую или повторите анализ')
+        return Api._calibration_params(calibration_id)
+
+    def _session_results(self) -> dict[str, np.ndarray] | None:
+        """
+        Результат последнего анализа (или загруженного исследования) —
+        пиксельные измерения сессии в единицах калибровки, с которой он
+        получен. None — результатов нет (анализ не запускался, прерван).
+        CalibrationNotFound — эту калибровку с тех пор удалили.
+        """
+        path = storage.SESSION_RES_DIR / storage.MEASUREMENTS_FILE
+        if not path.exists():
+            return None
+        coeff, division = self._existing_calibration_params(self.session['analysis_calibration_id'])
+        return metrics.to_real_units(metrics.load_measurements(path).columns, coeff, division)
+
+    def execute_research(
+        self, calibration_id: int, workers: int = 1, lazy: bool = False, pipeline: dict | None = None,
+        streaming: bool = False,
+    ) -> dict:
+        """
+        workers — число процессов (потоков) анализа: по умолчанию 1, без
+        пула; 0 — по числу ядер.
+        lazy — без промежуточных изображений, они строятся в get_image.
+        pipeline — поля backend.pipeline.PipelineConfig (очереди, потоки).
+        streaming — без списка контуров в ответе: итоги и сводка stats,
+        частицы — через get_contours_page. По умолчанию, как и раньше,
+        весь список contours в ответе.
+        """
+        logger.info(f'execute_research calibration_id={calibration_id} workers={workers} '
+                    f'lazy={lazy} pipeline={pipeline} streaming={streaming}')
         try:
-            coeff, division = 1.0, 1.0
-            if calibration_id and calibration_id > 0:
-                cal = db.get_calibration(calibration_id)
-                if cal:
-                    coeff = cal.coefficient
-                    division = float(cal.division_price.split()[0])
-
-            result = run_research_analysis(coeff, division)
+            coeff, division = self._calibration_params(calibration_id)
+            with self._jobs.hold(_RESEARCH_SESSION, 'research'):
+                result = run_research_analysis(
+                    coeff, division, workers, cache_dir=storage.CACHE_DIR,
+                    lazy=lazy, pipeline=PipelineConfig(**(pipeline or {})), streaming=streaming,
+                )
+            # Только теперь measurements.npz сессии посчитан в этой калибровке
+            self.session['analysis_calibration_id'] = calibration_id
             return {'ok': True, **result}
-        except Exception:
+        except Exception as e:
             logger.exception('Ошибка execute_research')
-            return {'ok': False, 'contours': [], 'averages': {}}
+            return {'ok': False, 'error': str(e), 'contours': [], 'averages': {}}
 
     def execute_calibration(self) -> dict:
         logger.info('execute_calibration')
@@ -191,6 +391,97 @@ class Api:
             logger.exception('Ошибка execute_calibration')
             return {'ok': False, 'coefficient': 0.0}
 
+    def remeasure_research(self, calibration_id: int, streaming: bool = False) -> dict:
+        """
+        Пересчитывает результаты текущей сессии (свежий анализ или
+        загруженное исследование) под другую калибровку по сохранённым
+        пиксельным измерениям — без повторной обработки изображений.
+        Возвращает {'ok', 'contours', 'count', 'averages'}; streaming — как
+        у execute_research: contours пуст, пересчитанные строки отдаёт
+        постранично get_contours_page(0, ...).
+        """
+        logger.info(f'remeasure_research calibration_id={calibration_id} streaming={streaming}')
+        try:
+            if not (storage.SESSION_RES_DIR / storage.MEASUREMENTS_FILE).exists():
+                return {'ok': False, 'error': 'Нет пиксельных измерений, нужен повторный анализ'}
+            self._existing_calibration_params(calibration_id)
+            self.session['analysis_calibration_id'] = calibration_id
+            self._contours_cache = self._order_cache = None
+            cols = self._session_results()
+            return {
+                'ok': True,
+                'contours': [] if streaming else metrics.to_rows(cols),
+                'count': metrics.count(cols),
+                'averages': metrics.averages(cols),
+            }
+        except CalibrationNotFound as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception:
+            logger.exception('Ошибка remeasure_research')
+            return {'ok': False, 'error': 'Ошибка пересчёта'}
+
+    # -----------------------------------------------------------------------
+    # Фоновые задачи
+    # -----------------------------------------------------------------------
+
+    def start_research(
+        self, calibration_id: int, workers: int = 1, lazy: bool = False, pipeline: dict | None = None,
+        streaming: bool = False,
+    ) -> dict:
+        """
+        Запускает анализ в фоне; ход выполнения — через get_job_status.
+        Параметры — как у execute_research; при streaming и задача не
+        копит контуры для опроса, только их число (found).
+        """
+        logger.info(f'start_research calibration_id={calibration_id} workers={workers} '
+                    f'lazy={lazy} pipeline={pipeline} streaming={streaming}')
+        try:
+            coeff, division = self._calibration_params(calibration_id)
+            config = PipelineConfig(**(pipeline or {}))
+
+            def run(job: Job) -> dict:
+                job.keep_contours = not streaming
+                result = run_research_analysis(
+                    coeff, division, workers, on_progress=job.report, cache_dir=storage.CACHE_DIR,
+                    lazy=lazy, pipeline=config, streaming=streaming,
+                )
+                # Отклонённый запуск, ошибка или отмена оставляют прежние
+                # измерения сессии — и калибровку, в которой они посчитаны
+                self.session['analysis_calibration_id'] = calibration_id
+                return result
+
+            job = self._jobs.start('research', run, _RESEARCH_SESSION)
+            return {'ok': True, 'job_id': job.id}
+        except Exception as e:
+            logger.exception('Ошибка start_research')
+            return {'ok': False, 'error': str(e)}
+
+    def start_calibration(self) -> dict:
+        logger.info('start_calibration')
+        try:
+            def run(job: Job) -> dict:
+                job.report(0, 1, 'sources.jpg')
+                result = run_calibration_analysis()
+                job.report(1, 1, 'sources.jpg')
+                return result
+
+            job = self._jobs.start('calibration', run)
+            return {'ok': True, 'job_id': job.id}
+        except Exception as e:
+            logger.exception('Ошибка start_calibration')
+            return {'ok': False, 'error': str(e)}
+
+    def get_job_status(self, job_id: str, offset: int = 0) -> dict:
+        """offset — число уже полученных клиентом контуров."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {'ok': False, 'error': 'Задача не найдена'}
+        return {'ok': True, **job.to_dict(offset)}
+
+    def cancel_job(self, job_id: str) -> dict:
+        logger.info(f'cancel_job id={job_id}')
+        return {'ok': self._jobs.cancel(job_id)}
+
     # -----------------------------------------------------------------------
     # Калибровки
     # -----------------------------------------------------------------------
@@ -266,51 +557,106 @@ class Api:
             logger.exception('Ошибка get_researches')
             return {'ok': False, 'researches': []}
 
+    def get_researches_page(
+        self,
+        limit: int = 50,
+        cursor: list | None = None,
+        sort_by: str = 'date',
+        descending: bool = True,
+        filters: dict | None = None,
+    ) -> dict:
+        """
+        Страница истории (keyset-пагинация). cursor — next_cursor из ответа
+        на предыдущую страницу; filters — поля database.ResearchFilter.
+        """
+        logger.info(f'get_researches_page limit={limit} cursor={cursor} sort_by={sort_by} '
+                    f'descending={descending} filters={filters}')
+        try:
+            page = db.get_researches_page(
+                limit, cursor, sort_by, descending, db.ResearchFilter(**(filters or {})),
+            )
+            return {
+                'ok': True,
+                'researches': [_res_to_dict(r) for r in page.researches],
+                'next_cursor': page.next_cursor,
+                'total_count': page.total_count,
+            }
+        except Exception:
+            logger.exception('Ошибка get_researches_page')
+            return {'ok': False, 'researches': [], 'next_cursor': None, 'total_count': 0}
+
+    def search_history(self, query: str, limit: int = 20) -> dict:
+        """Поиск исследований и калибровок по началам слов названия, сотрудника, микроскопа."""
+        logger.info(f'search_history query={query!r} limit={limit}')
+        try:
+            return {
+                'ok': True,
+                'researches': [_res_to_dict(r) for r in db.search_researches(query, limit)],
+                'calibrations': [_cal_to_dict(c) for c in db.search_calibrations(query, limit)],
+            }
+        except Exception:
+            logger.exception('Ошибка search_history')
+            return {'ok': False, 'researches': [], 'calibrations': []}
+
     def get_research(self, research_id: int) -> dict:
         logger.info(f'get_research id={research_id}')
         try:
             res = db.get_research(research_id)
             if not res:
                 return {'ok': False}
-            contours = db.get_contours(research_id)
-            return {'ok': True, 'research': _res_to_dict(res, contours)}
+            # Как в load_research: число частиц, сами строки — через get_contours_page
+            return {'ok': True, 'research': {**_res_to_dict(res), 'contour_count': db.count_contours(research_id)}}
         except Exception:
             logger.exception(f'Ошибка get_research id={research_id}')
             return {'ok': False}
 
     def save_research(self, data: dict) -> dict:
+        """
+        data — только поля исследования (id, name, employee, microscope,
+        calibration_id). Контуры, средние и статистика берутся из
+        результата анализа в сессии и пишутся одной транзакцией; без
+        результата у уже сохранённого исследования меняются только поля.
+        """
         logger.info(f'save_research id={data.get("id", 0)} name={data.get("name")}')
         try:
+            research_id = data.get('id', 0)
+            calibration_id = data.get('calibration_id') or None
+            contour_cols, research_stats = None, None
+
+            cols = self._session_results()
+            if cols is not None:
+                # Результаты посчитаны в единицах этой калибровки, а не выбранной в форме
+                calibration_id = self.session['analysis_calibration_id'] or None
+                contour_cols = _contour_columns(cols)
+                research_stats = stats.research_stats(contour_cols)
+                averages = metrics.averages(cols)
+            elif research_id:
+                # В сессии нет результата (исследование сохранено до пиксельных
+                # измерений) — контуры и средние остаются прежними
+                old = db.get_research(research_id)
+                if old is None:
+                    return {'ok': False}
+                calibration_id = old.calibration_id
+                averages = {k: getattr(old, f'average_{k}') for k in metrics.AVERAGE_KEYS}
+            else:
+                contour_cols = _contour_columns(metrics.empty_columns())
+                averages = metrics.averages(contour_cols)
+
             res = Research(
-                id=data.get('id', 0),
+                id=research_id,
                 name=data['name'],
                 employee=data['employee'],
                 microscope=data['microscope'],
-                calibration_id=data.get('calibration_id'),
-                average_perimeter=data['average_perimeter'],
-                average_area=data['average_area'],
-                average_width=data['average_width'],
-                average_length=data['average_length'],
-                average_dek=data['average_dek'],
+                calibration_id=calibration_id,
+                **{f'average_{k}': v for k, v in averages.items()},
             )
-            res_id = db.save_research(res)
-
-            contours = [
-                ContourData(
-                    research_id=res_id,
-                    contour_number=c['contour_number'],
-                    perimeter=c['perimeter'],
-                    area=c['area'],
-                    width=c['width'],
-                    length=c['length'],
-                    dek=c['dek'],
-                )
-                for c in data.get('contours', [])
-            ]
-            db.save_contours(res_id, contours)
+            res_id = db.save_research_results(res, contour_cols, research_stats)
+            self._contours_cache = self._order_cache = None
             storage.save_research_files(res_id)
             self.session['research_id'] = res_id
             return {'ok': True, 'id': res_id}
+        except CalibrationNotFound as e:
+            return {'ok': False, 'error': str(e)}
         except Exception:
             logger.exception('Ошибка save_research')
             return {'ok': False}
@@ -321,24 +667,133 @@ class Api:
             res = db.get_research(research_id)
             if not res:
                 return {'ok': False}
-            contours = db.get_contours(research_id)
             storage.load_research_files(research_id)
             self.session['research_id'] = research_id
+            self.session['analysis_calibration_id'] = res.calibration_id or 0
             files = storage.list_session_images('research')
+            # Контуры не передаются целиком — UI запрашивает их страницами
             return {
                 'ok': True,
-                'research': _res_to_dict(res, contours),
+                'research': {**_res_to_dict(res), 'contour_count': db.count_contours(research_id)},
                 'files': files,
             }
         except Exception:
             logger.exception(f'Ошибка load_research id={research_id}')
             return {'ok': False}
 
+    def get_research_stats(self, research_id: int, bins: int = stats.DEFAULT_BINS) -> dict:
+        """
+        Статистика распределения и гистограммы (backend.stats).
+        research_id > 0 — сохранённое исследование (посчитано при сохранении,
+        при другом числе диапазонов пересчитывается по столбцам);
+        0 — результаты текущей сессии по её пиксельным измерениям.
+        """
+        logger.info(f'get_research_stats id={research_id} bins={bins}')
+        try:
+            bins = max(1, min(int(bins), 500))
+            if research_id > 0:
+                stored = db.get_research_stats(research_id)
+                if stored is not None and stored['bins'] == bins:
+                    return {'ok': True, 'stats': stored}
+                result = stats.research_stats(db.load_contour_columns(research_id), bins)
+                if stored is None:
+                    # Исследования, сохранённые до появления статистики
+                    db.save_research_stats(research_id, result)
+                return {'ok': True, 'stats': result}
+
+            cols = self._session_results()
+            if cols is None:
+                return {'ok': False, 'error': 'Нет измерений текущего исследования'}
+            return {'ok': True, 'stats': stats.research_stats(cols, bins)}
+        except CalibrationNotFound as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception:
+            logger.exception(f'Ошибка get_research_stats id={research_id}')
+            return {'ok': False}
+
+    def _contour_source(self, research_or_session: int) -> tuple[tuple, dict[str, np.ndarray]] | None:
+        """
+        (ключ версии, столбцы db.CONTOUR_COLUMNS) исследования или, при 0,
+        результата в сессии. Последний источник держится в памяти, чтобы
+        листание страниц не читало измерения заново. CalibrationNotFound —
+        см. _session_results.
+        """
+        if research_or_session > 0:
+            key = ('research', research_or_session)
+        else:
+            path = storage.SESSION_RES_DIR / storage.MEASUREMENTS_FILE
+            if not path.exists():
+                return None
+            st = path.stat()
+            # Параметры, а не id калибровки: пересчёт и правка калибровки меняют ключ
+            key = ('session', st.st_ino, st.st_mtime_ns, st.st_size,
+                   self._existing_calibration_params(self.session['analysis_calibration_id']))
+
+        cached = self._contours_cache
+        if cached is not None and cached[0] == key:
+            return cached
+        if research_or_session > 0:
+            cols = db.load_contour_columns(research_or_session)
+        else:
+            cols = _contour_columns(self._session_results())
+        self._contours_cache = (key, cols)
+        return self._contours_cache
+
+    def get_contours_page(
+        self,
+        research_or_session: int,
+        offset: int = 0,
+        limit: int = 100,
+        sort_by: str = 'contour_number',
+        filters: dict | None = None,
+    ) -> dict:
+        """
+        Страница контуров: research_or_session — id исследования или 0 для
+        результата текущей сессии. sort_by — столбец, '-столбец' — по
+        убыванию; filters — {столбец: [от, до]}, границы включительно,
+        null — без границы. total — строк под фильтром, count — всего.
+        """
+        logger.info(f'get_contours_page source={research_or_session} offset={offset} limit={limit} '
+                    f'sort_by={sort_by} filters={filters}')
+        try:
+            descending = sort_by.startswith('-')
+            column = sort_by.lstrip('-')
+            ranges = {k: tuple(v) for k, v in (filters or {}).items()}
+            if column not in db.CONTOUR_COLUMNS or not set(ranges) <= set(db.CONTOUR_COLUMNS):
+                return {'ok': False, 'error': 'Неизвестный столбец'}
+
+            source = self._contour_source(research_or_session)
+            if source is None:
+                return {'ok': True, 'contours': [], 'total': 0, 'count': 0}
+            key, cols = source
+
+            order_key = (key, sort_by, sorted(ranges.items()))
+            cached = self._order_cache
+            if cached is not None and cached[0] == order_key:
+                idx = cached[1]
+            else:
+                idx = metrics.select_rows(cols, column, descending, ranges)
+                self._order_cache = (order_key, idx)
+
+            page = idx[max(0, offset):max(0, offset) + max(0, limit)]
+            return {
+                'ok': True,
+                'contours': _contour_rows({k: cols[k][page] for k in db.CONTOUR_COLUMNS}),
+                'total': len(idx),
+                'count': len(cols['contour_number']),
+            }
+        except CalibrationNotFound as e:
+            return {'ok': False, 'error': str(e), 'contours': [], 'total': 0, 'count': 0}
+        except Exception:
+            logger.exception(f'Ошибка get_contours_page source={research_or_session}')
+            return {'ok': False, 'contours': [], 'total': 0, 'count': 0}
+
     def delete_research(self, research_id: int) -> dict:
         logger.info(f'delete_research id={research_id}')
         try:
             db.delete_research(research_id)
             storage.delete_research_files(research_id)
+            self._contours_cache = self._order_cache = None
             return {'ok': True}
         except Exception:
             logger.exception(f'Ошибка delete_research id={research_id}')
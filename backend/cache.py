@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from backend.logger import logger
+
+# ---------------------------------------------------------------------------
+# Кэш результатов анализа по содержимому
+# ---------------------------------------------------------------------------
+#
+# Ключ — sha256 от байтов исходника, параметров пайплайна и его версии,
+# поэтому переименование файла или смена калибровки кэш не сбрасывают.
+# Запись кэша — папка data/cache/<ключ>/:
+#   columns.npz        пиксельные столбцы измерений (см. backend.metrics)
+#   contrasted.jpg     готовые промежуточные изображения
+#   contours.jpg
+#   analyzed.jpg       + meta.json с номером первой частицы на картинке
+# Время изменения columns.npz обновляется при каждом чтении и служит
+# меткой для LRU-вытеснения.
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+_COLUMNS_FILE = 'columns.npz'
+_META_FILE    = 'meta.json'
+
+
+class AnalysisCache:
+    """Экземпляр передаётся в процессы пула, поэтому хранит только путь и лимит."""
+
+    def __init__(self, root: Path, params: dict, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._params = json.dumps(params, sort_keys=True).encode()
+
+    def key(self, data: bytes) -> str:
+        h = hashlib.sha256(data)
+        h.update(self._params)
+        return h.hexdigest()
+
+    # -----------------------------------------------------------------------
+    # Чтение
+    # -----------------------------------------------------------------------
+
+    def load_columns(self, key: str) -> Optional[dict[str, np.ndarray]]:
+        """Возвращает столбцы записи или None; отмечает запись как использованную."""
+        path = self.root / key / _COLUMNS_FILE
+        try:
+            with np.load(path) as npz:
+                cols = {k: npz[k] for k in npz.files}
+            os.utime(path)
+            return cols
+        except (OSError, ValueError):
+            return None
+
+    def file_path(self, key: str, name: str) -> Optional[Path]:
+        path = self.root / key / name
+        return path if path.exists() else None
+
+    def read_meta(self, key: str) -> dict:
+        try:
+            return json.loads((self.root / key / _META_FILE).read_text('utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    # -----------------------------------------------------------------------
+    # Запись
+    # -----------------------------------------------------------------------
+
+    def store(self, key: str, columns: dict[str, np.ndarray], files: dict[str, bytes]) -> None:
+        """
+        Создаёт запись целиком во временной папке и переименовывает её,
+        чтобы параллельные процессы не увидели запись наполовину.
+        В уже существующую запись (например, от ленивого анализа, без
+        картинок) только добавляются файлы.
+        """
+        if (self.root / key).exists():
+            for name, data in files.items():
+                self.store_file(key, name, data)
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f'.tmp-{uuid.uuid4().hex}'
+        tmp.mkdir()
+        try:
+            for name, data in files.items():
+                (tmp / name).write_bytes(data)
+            np.savez(tmp / _COLUMNS_FILE, **columns)
+            tmp.rename(self.root / key)
+        except OSError:
+            # Ту же запись уже успел создать другой процесс
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def store_file(self, key: str, name: str, data: bytes, meta: Optional[dict] = None) -> None:
+        """Добавляет или заменяет файл в существующей записи."""
+        entry = self.root / key
+        if not entry.exists():
+            return
+        self._write_atomic(entry / name, data)
+        if meta is not None:
+            self._write_atomic(entry / _META_FILE, json.dumps(meta).encode())
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex}')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    # -----------------------------------------------------------------------
+    # Вытеснение
+    # -----------------------------------------------------------------------
+
+    def evict(self) -> int:
+        """Удаляет давно не использованные записи сверх max_bytes; возвращает их число."""
+        if not self.root.exists():
+            return 0
+
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if not entry.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+            columns = entry / _COLUMNS_FILE
+            used = columns.stat().st_mtime if columns.exists() else 0.0
+            entries.append((used, size, entry))
+            total += size
+
+        removed = 0
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f'Кэш: вытеснено {removed} записей, размер {total / 1024 ** 2:.1f} МБ')
+        return removed
@@ -1,20 +1,88 @@
+import io
+import json
+import re
 import sqlite3
+import threading
 from contextlib import contextmanager
-from datetime import datetime
-from typing import Optional
+from dataclasses import astuple, dataclass
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+import numpy as np
 
 from backend.logger import logger, ROOT_DIR
 from backend.models import Calibration, ContourData, Research
 
 DB_PATH = ROOT_DIR / 'data' / 'app.db'
 
+# ---------------------------------------------------------------------------
+# Соединения
+# ---------------------------------------------------------------------------
+#
+# pywebview выполняет каждый вызов из JS в новом потоке, поэтому соединения
+# не привязаны к потокам, а берутся из небольшого пула и возвращаются в
+# него после вызова: открытие файла, прагмы и подготовленные выражения
+# (кэш sqlite3 на соединение) переживают отдельные запросы. WAL позволяет
+# читать историю во время записи, а synchronous=NORMAL в WAL не делает
+# fsync на каждый коммит.
+
+_POOL_SIZE = 4
+_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA foreign_keys = ON',
+    'PRAGMA cache_size = -16000',    # КиБ, т. е. ~16 МБ
+    'PRAGMA mmap_size = 268435456',  # 256 МБ
+    'PRAGMA temp_store = MEMORY',
+)
+
+_pool: list[tuple[Path, sqlite3.Connection]] = []
+_pool_lock = threading.Lock()
+
+
+def _open(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    for pragma in _PRAGMAS:
+        conn.execute(pragma)
+    logger.debug(f'Открыто соединение с БД {path}')
+    return conn
+
+
+def _acquire() -> tuple[Path, sqlite3.Connection]:
+    path = DB_PATH
+    with _pool_lock:
+        # Соединения с прежним файлом БД (DB_PATH сменился) больше не нужны
+        stale = [c for p, c in _pool if p != path]
+        _pool[:] = [(p, c) for p, c in _pool if p == path]
+        item = _pool.pop() if _pool else None
+    for conn in stale:
+        conn.close()
+    return item or (path, _open(path))
+
+
+def _release(path: Path, conn: sqlite3.Connection) -> None:
+    with _pool_lock:
+        if path == DB_PATH and len(_pool) < _POOL_SIZE:
+            _pool.append((path, conn))
+            return
+    conn.close()
+
+
+def close_db() -> None:
+    """Закрывает соединения пула (при выходе из приложения)."""
+    with _pool_lock:
+        conns, _pool[:] = [c for _, c in _pool], []
+    for conn in conns:
+        conn.close()
+
 
 @contextmanager
 def _connect():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA foreign_keys = ON')
+    path, conn = _acquire()
     try:
         yield conn
         conn.commit()
@@ -22,46 +90,177 @@ def _connect():
         conn.rollback()
         raise
     finally:
-        conn.close()
+        _release(path, conn)
+
+
+# ---------------------------------------------------------------------------
+# Схема и миграции
+# ---------------------------------------------------------------------------
+#
+# Версия схемы хранится в PRAGMA user_version. Миграция i переводит БД из
+# версии i в i + 1 и выполняется в одной транзакции вместе со сменой
+# версии. Первая миграция — исходная схема (IF NOT EXISTS), поэтому БД,
+# созданные до появления миграций (версия 0), проходят её без изменений.
+# Миграция — SQL-скрипт или функция (для переноса данных, который не
+# выразить в SQL). Новые миграции только добавляются в конец списка.
+
+
+def _migrate_contours_to_columns(conn: sqlite3.Connection) -> None:
+    """3: построчные contour_data -> по одному сжатому блобу на исследование."""
+    conn.execute(_CONTOUR_COLUMNS_TABLE)
+    rows = conn.execute(
+        'SELECT research_id, contour_number, perimeter, area, width, length, dek '
+        'FROM contour_data ORDER BY research_id, contour_number'
+    )
+    converted = 0
+    for research_id, group in groupby(rows, key=lambda r: r[0]):
+        cols = _columns_from_tuples(r[1:] for r in group)
+        _write_contour_columns(conn, research_id, cols)
+        converted += 1
+    conn.execute('DROP TABLE contour_data')
+    logger.info(f'Контуры {converted} исследований перенесены в столбцы')
+
+
+_CONTOUR_COLUMNS_TABLE = """
+    CREATE TABLE IF NOT EXISTS contour_columns (
+        research_id INTEGER PRIMARY KEY REFERENCES research(id) ON DELETE CASCADE,
+        count       INTEGER NOT NULL,
+        data        BLOB    NOT NULL
+    )
+"""
+
+_MIGRATIONS: list[Union[str, Callable[[sqlite3.Connection], None]]] = [
+    # 1: исходная схема
+    """
+    CREATE TABLE IF NOT EXISTS calibration (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        name          TEXT    NOT NULL,
+        microscope    TEXT    NOT NULL,
+        coefficient   REAL    NOT NULL,
+        division_price TEXT   NOT NULL,
+        date          TEXT    NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS research (
+        id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+        name               TEXT NOT NULL,
+        employee           TEXT NOT NULL,
+        microscope         TEXT NOT NULL,
+        calibration_id     INTEGER REFERENCES calibration(id) ON DELETE SET NULL,
+        average_perimeter  REAL NOT NULL,
+        average_area       REAL NOT NULL,
+        average_width      REAL NOT NULL,
+        average_length     REAL NOT NULL,
+        average_dek        REAL NOT NULL,
+        date               TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS contour_data (
+        id             INTEGER PRIMARY KEY AUTOINCREMENT,
+        research_id    INTEGER NOT NULL REFERENCES research(id) ON DELETE CASCADE,
+        contour_number INTEGER NOT NULL,
+        perimeter      REAL    NOT NULL,
+        area           REAL    NOT NULL,
+        width          REAL    NOT NULL,
+        length         REAL    NOT NULL,
+        dek            REAL    NOT NULL
+    );
+    """,
+    # 2: индексы — контуры исследования (get_contours, DELETE, каскад),
+    # списки по дате, SET NULL при удалении калибровки
+    """
+    CREATE INDEX IF NOT EXISTS idx_contour_data_research
+        ON contour_data (research_id, contour_number);
+    CREATE INDEX IF NOT EXISTS idx_research_date ON research (date);
+    CREATE INDEX IF NOT EXISTS idx_research_calibration ON research (calibration_id);
+    CREATE INDEX IF NOT EXISTS idx_calibration_date ON calibration (date);
+    """,
+    _migrate_contours_to_columns,
+    # 4: полнотекстовый поиск по истории (search_history). Внешнее
+    # содержимое — сами таблицы, индекс поддерживается триггерами
+    """
+    CREATE VIRTUAL TABLE research_fts USING fts5(
+        name, employee, microscope,
+        content='research', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    CREATE TRIGGER research_fts_insert AFTER INSERT ON research BEGIN
+        INSERT INTO research_fts (rowid, name, employee, microscope)
+        VALUES (new.id, new.name, new.employee, new.microscope);
+    END;
+    CREATE TRIGGER research_fts_delete AFTER DELETE ON research BEGIN
+        INSERT INTO research_fts (research_fts, rowid, name, employee, microscope)
+        VALUES ('delete', old.id, old.name, old.employee, old.microscope);
+    END;
+    CREATE TRIGGER research_fts_update AFTER UPDATE OF name, employee, microscope ON research BEGIN
+        INSERT INTO research_fts (research_fts, rowid, name, employee, microscope)
+        VALUES ('delete', old.id, old.name, old.employee, old.microscope);
+        INSERT INTO research_fts (rowid, name, employee, microscope)
+        VALUES (new.id, new.name, new.employee, new.microscope);
+    END;
+    INSERT INTO research_fts (research_fts) VALUES ('rebuild');
+
+    CREATE VIRTUAL TABLE calibration_fts USING fts5(
+        name, microscope,
+        content='calibration', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+    CREATE TRIGGER calibration_fts_insert AFTER INSERT ON calibration BEGIN
+        INSERT INTO calibration_fts (rowid, name, microscope)
+        VALUES (new.id, new.name, new.microscope);
+    END;
+    CREATE TRIGGER calibration_fts_delete AFTER DELETE ON calibration BEGIN
+        INSERT INTO calibration_fts (calibration_fts, rowid, name, microscope)
+        VALUES ('delete', old.id, old.name, old.microscope);
+    END;
+    CREATE TRIGGER calibration_fts_update AFTER UPDATE OF name, microscope ON calibration BEGIN
+        INSERT INTO calibration_fts (calibration_fts, rowid, name, microscope)
+        VALUES ('delete', old.id, old.name, old.microscope);
+        INSERT INTO calibration_fts (rowid, name, microscope)
+        VALUES (new.id, new.name, new.microscope);
+    END;
+    INSERT INTO calibration_fts (calibration_fts) VALUES ('rebuild');
+    """,
+    # 5: статистика распределения (backend.stats) сохранённых исследований
+    """
+    CREATE TABLE research_stats (
+        research_id INTEGER PRIMARY KEY REFERENCES research(id) ON DELETE CASCADE,
+        data        TEXT    NOT NULL
+    );
+    """,
+]
+
+SCHEMA_VERSION = len(_MIGRATIONS)
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version > SCHEMA_VERSION:
+        logger.warning(f'Версия схемы БД {version} новее известной ({SCHEMA_VERSION})')
+        return
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        migration = _MIGRATIONS[target - 1]
+        try:
+            if callable(migration):
+                conn.execute('BEGIN')
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+                conn.commit()
+            else:
+                conn.executescript(
+                    f'BEGIN; {migration}; PRAGMA user_version = {target}; COMMIT;'
+                )
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.exception(f'Ошибка миграции БД до версии {target}')
+            raise
+        logger.info(f'БД обновлена до версии {target}')
 
 
 def init_db() -> None:
     with _connect() as conn:
-        conn.executescript("""
-            CREATE TABLE IF NOT EXISTS calibration (
-                id            INTEGER PRIMARY KEY AUTOINCREMENT,
-                name          TEXT    NOT NULL,
-                microscope    TEXT    NOT NULL,
-                coefficient   REAL    NOT NULL,
-                division_price TEXT   NOT NULL,
-                date          TEXT    NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS research (
-                id                 INTEGER PRIMARY KEY AUTOINCREMENT,
-                name               TEXT NOT NULL,
-                employee           TEXT NOT NULL,
-                microscope         TEXT NOT NULL,
-                calibration_id     INTEGER REFERENCES calibration(id) ON DELETE SET NULL,
-                average_perimeter  REAL NOT NULL,
-                average_area       REAL NOT NULL,
-                average_width      REAL NOT NULL,
-                average_length     REAL NOT NULL,
-                average_dek        REAL NOT NULL,
-                date               TEXT NOT NULL
-            );
-
-            CREATE TABLE IF NOT EXISTS contour_data (
-                id             INTEGER PRIMARY KEY AUTOINCREMENT,
-                research_id    INTEGER NOT NULL REFERENCES research(id) ON DELETE CASCADE,
-                contour_number INTEGER NOT NULL,
-                perimeter      REAL    NOT NULL,
-                area           REAL    NOT NULL,
-                width          REAL    NOT NULL,
-                length         REAL    NOT NULL,
-                dek            REAL    NOT NULL
-            );
-        """)
+        _migrate(conn)
     logger.info('БД инициализирована')
 
 
@@ -122,6 +321,8 @@ def delete_calibration(calibration_id: int) -> None:
     except Exception as e:
         logger.error(f'Ошибка удаления калибровки id={calibration_id}: {e}')
         raise
+    finally:
+        _invalidate_counts()
 
 
 # ---------------------------------------------------------------------------
@@ -156,34 +357,64 @@ def get_research(research_id: int) -> Optional[Research]:
     return _row_to_research(row) if row else None
 
 
-def save_research(research: Research) -> int:
+def _write_research(conn: sqlite3.Connection, research: Research) -> int:
     now = datetime.now().isoformat()
+    if research.id == 0:
+        cur = conn.execute(
+            'INSERT INTO research '
+            '(name, employee, microscope, calibration_id, '
+            ' average_perimeter, average_area, average_width, average_length, average_dek, date) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (research.name, research.employee, research.microscope, research.calibration_id,
+             research.average_perimeter, research.average_area, research.average_width,
+             research.average_length, research.average_dek, now),
+        )
+        return cur.lastrowid
+    conn.execute(
+        'UPDATE research SET name=?, employee=?, microscope=?, calibration_id=?, '
+        'average_perimeter=?, average_area=?, average_width=?, average_length=?, average_dek=?, date=? '
+        'WHERE id=?',
+        (research.name, research.employee, research.microscope, research.calibration_id,
+         research.average_perimeter, research.average_area, research.average_width,
+         research.average_length, research.average_dek, now, research.id),
+    )
+    return research.id
+
+
+def save_research(research: Research) -> int:
     try:
         with _connect() as conn:
-            if research.id == 0:
-                cur = conn.execute(
-                    'INSERT INTO research '
-                    '(name, employee, microscope, calibration_id, '
-                    ' average_perimeter, average_area, average_width, average_length, average_dek, date) '
-                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                    (research.name, research.employee, research.microscope, research.calibration_id,
-                     research.average_perimeter, research.average_area, research.average_width,
-                     research.average_length, research.average_dek, now),
-                )
-                return cur.lastrowid
-            else:
-                conn.execute(
-                    'UPDATE research SET name=?, employee=?, microscope=?, calibration_id=?, '
-                    'average_perimeter=?, average_area=?, average_width=?, average_length=?, average_dek=?, date=? '
-                    'WHERE id=?',
-                    (research.name, research.employee, research.microscope, research.calibration_id,
-                     research.average_perimeter, research.average_area, research.average_width,
-                     research.average_length, research.average_dek, now, research.id),
-                )
-                return research.id
+            return _write_research(conn, research)
+    except Exception as e:
+        logger.error(f'Ошибка сохранения исследования: {e}')
+        raise
+    finally:
+        _invalidate_counts()
+
+
+def save_research_results(
+    research: Research,
+    cols: Optional[dict[str, np.ndarray]],
+    stats: Optional[dict],
+) -> int:
+    """
+    Исследование, столбцы его контуров (CONTOUR_COLUMNS) и статистика —
+    одной транзакцией. cols=None — меняются только поля исследования,
+    сохранённые контуры и статистика остаются прежними.
+    """
+    try:
+        with _connect() as conn:
+            research_id = _write_research(conn, research)
+            if cols is not None:
+                _write_contour_columns(conn, research_id, cols)
+            if stats is not None:
+                _write_research_stats(conn, research_id, stats)
+            return research_id
     except Exception as e:
         logger.error(f'Ошибка сохранения исследования: {e}')
         raise
+    finally:
+        _invalidate_counts()
 
 
 def delete_research(research_id: int) -> None:
@@ -193,52 +424,303 @@ def delete_research(research_id: int) -> None:
     except Exception as e:
         logger.error(f'Ошибка удаления исследования id={research_id}: {e}')
         raise
+    finally:
+        _invalidate_counts()
 
 
 # ---------------------------------------------------------------------------
-# ContourData
+# История исследований: страницы
 # ---------------------------------------------------------------------------
+#
+# Keyset-пагинация: страница — первые limit строк после курсора
+# (значение сортировки, id) последней строки предыдущей страницы, поэтому
+# стоимость страницы не растёт с её номером (в отличие от OFFSET), а
+# сортировка по дате идёт по idx_research_date. Число строк под фильтром
+# кэшируется до следующего изменения исследований или калибровок.
+
+RESEARCH_SORT_COLUMNS = ('date', 'id', 'name', 'employee', 'microscope', 'average_dek')
+
+
+@dataclass
+class ResearchFilter:
+    employee: Optional[str] = None        # подстрока
+    microscope: Optional[str] = None
+    calibration_id: Optional[int] = None
+    date_from: Optional[str] = None       # ISO-дата или дата-время, включительно
+    date_to: Optional[str] = None         # ISO-дата (весь день) или дата-время, включительно
+
+
+@dataclass
+class ResearchPage:
+    researches: list[Research]
+    next_cursor: Optional[list]           # None — страниц больше нет
+    total_count: int
+
+
+_count_cache: dict[tuple, int] = {}
+_count_lock = threading.Lock()
+
+
+def _invalidate_counts() -> None:
+    with _count_lock:
+        _count_cache.clear()
+
+
+def _filter_sql(f: ResearchFilter) -> tuple[str, list]:
+    where, params = [], []
+    if f.employee:
+        where.append("employee LIKE ? ESCAPE '\\'")
+        escaped = f.employee.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params.append(f'%{escaped}%')
+    if f.microscope:
+        where.append('microscope = ?')
+        params.append(f.microscope)
+    if f.calibration_id:
+        where.append('calibration_id = ?')
+        params.append(f.calibration_id)
+    if f.date_from:
+        where.append('date >= ?')
+        params.append(f.date_from)
+    if f.date_to:
+        to = f.date_to
+        if len(to) == 10:
+            # Только дата — до начала следующего дня
+            where.append('date < ?')
+            to = (date.fromisoformat(to) + timedelta(days=1)).isoformat()
+        else:
+            where.append('date <= ?')
+        params.append(to)
+    return ' AND '.join(where), params
+
+
+def count_researches(filters: Optional[ResearchFilter] = None) -> int:
+    filters = filters or ResearchFilter()
+    key = (str(DB_PATH), astuple(filters))
+    with _count_lock:
+        if key in _count_cache:
+            return _count_cache[key]
+    where, params = _filter_sql(filters)
+    with _connect() as conn:
+        total = conn.execute(
+            'SELECT COUNT(*) FROM research' + (f' WHERE {where}' if where else ''), params,
+        ).fetchone()[0]
+    with _count_lock:
+        _count_cache[key] = total
+    return total
+
+
+def get_researches_page(
+    limit: int = 50,
+    cursor: Optional[list] = None,
+    sort_by: str = 'date',
+    descending: bool = True,
+    filters: Optional[ResearchFilter] = None,
+) -> ResearchPage:
+    """
+    Страница истории. cursor — next_cursor предыдущей страницы
+    ([значение sort_by, id]); None — первая страница.
+    """
+    if sort_by not in RESEARCH_SORT_COLUMNS:
+        raise ValueError(f'Недопустимая сортировка: {sort_by}')
+    filters = filters or ResearchFilter()
+    where, params = _filter_sql(filters)
+    conditions = [where] if where else []
+
+    op, order = ('<', 'DESC') if descending else ('>', 'ASC')
+    if cursor is not None:
+        if sort_by == 'id':
+            conditions.append(f'id {op} ?')
+            params.append(cursor[1])
+        else:
+            conditions.append(f'({sort_by}, id) {op} (?, ?)')
+            params.extend(cursor)
+
+    order_by = f'id {order}' if sort_by == 'id' else f'{sort_by} {order}, id {order}'
+    sql = 'SELECT * FROM research'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += f' ORDER BY {order_by} LIMIT ?'
 
-def get_contours(research_id: int) -> list[ContourData]:
+    with _connect() as conn:
+        rows = conn.execute(sql, params + [limit + 1]).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = [rows[-1][sort_by], rows[-1]['id']]
+    return ResearchPage(
+        researches=[_row_to_research(r) for r in rows],
+        next_cursor=next_cursor,
+        total_count=count_researches(filters),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Поиск по истории
+# ---------------------------------------------------------------------------
+#
+# По индексам FTS5 research_fts и calibration_fts (миграция 4). Найденное
+# отдаётся от новых к старым: FTS5 перебирает rowid по убыванию и
+# останавливается на limit, не ранжируя все совпадения, поэтому даже
+# частый префикс на большой истории отвечает за миллисекунды.
+
+def _fts_query(text: str) -> Optional[str]:
+    """
+    Текст из поля поиска -> запрос FTS5: каждое слово как префикс, все
+    слова обязательны. Синтаксис FTS5 во вводе не интерпретируется.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def search_researches(text: str, limit: int = 20) -> list[Research]:
+    query = _fts_query(text)
+    if query is None:
+        return []
     with _connect() as conn:
         rows = conn.execute(
-            'SELECT * FROM contour_data WHERE research_id = ? ORDER BY contour_number',
-            (research_id,),
+            'SELECT research.* FROM research_fts '
+            'JOIN research ON research.id = research_fts.rowid '
+            'WHERE research_fts MATCH ? ORDER BY research_fts.rowid DESC LIMIT ?',
+            (query, limit),
         ).fetchall()
-    return [
-        ContourData(
-            research_id=r['research_id'],
-            contour_number=r['contour_number'],
-            perimeter=r['perimeter'],
-            area=r['area'],
-            width=r['width'],
-            length=r['length'],
-            dek=r['dek'],
-        )
-        for r in rows
-    ]
+    return [_row_to_research(r) for r in rows]
 
 
-def save_contours(research_id: int, contours: list[ContourData]) -> None:
+def search_calibrations(text: str, limit: int = 20) -> list[Calibration]:
+    query = _fts_query(text)
+    if query is None:
+        return []
+    with _connect() as conn:
+        rows = conn.execute(
+            'SELECT calibration.* FROM calibration_fts '
+            'JOIN calibration ON calibration.id = calibration_fts.rowid '
+            'WHERE calibration_fts MATCH ? ORDER BY calibration_fts.rowid DESC LIMIT ?',
+            (query, limit),
+        ).fetchall()
+    return [_row_to_calibration(r) for r in rows]
+
+
+# ---------------------------------------------------------------------------
+# ContourData
+# ---------------------------------------------------------------------------
+#
+# Измерения частиц исследования хранятся не строками, а одним блобом на
+# исследование в contour_columns: сжатый .npz со столбцами CONTOUR_COLUMNS
+# (номера — int32, измерения — float64, чтобы округлённые до 0.01 значения
+# читались без искажений). load_contour_columns отдаёт массивы как есть;
+# get_contours разворачивает их в ContourData по требованию.
+
+CONTOUR_COLUMNS = ('contour_number', 'perimeter', 'area', 'width', 'length', 'dek')
+
+
+def _empty_contour_columns() -> dict[str, np.ndarray]:
+    return {k: np.empty(0, dtype=np.int32 if k == 'contour_number' else np.float64)
+            for k in CONTOUR_COLUMNS}
+
+
+def _columns_from_tuples(rows: Iterable[tuple]) -> dict[str, np.ndarray]:
+    """Кортежи в порядке CONTOUR_COLUMNS -> столбцы."""
+    rows = list(rows)
+    if not rows:
+        return _empty_contour_columns()
+    values = list(zip(*rows))
+    cols = {k: np.asarray(v, dtype=np.float64) for k, v in zip(CONTOUR_COLUMNS, values)}
+    cols['contour_number'] = cols['contour_number'].astype(np.int32)
+    return cols
+
+
+def contour_columns_from_rows(rows: Iterable[dict]) -> dict[str, np.ndarray]:
+    """Строки в виде dict (как приходят из UI) -> столбцы."""
+    rows = list(rows)
+    cols = {k: np.fromiter((r[k] for r in rows), dtype=np.float64, count=len(rows))
+            for k in CONTOUR_COLUMNS}
+    cols['contour_number'] = cols['contour_number'].astype(np.int32)
+    return cols
+
+
+def _write_contour_columns(conn: sqlite3.Connection, research_id: int, cols: dict[str, np.ndarray]) -> None:
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **{k: cols[k] for k in CONTOUR_COLUMNS})
+    conn.execute(
+        'INSERT OR REPLACE INTO contour_columns (research_id, count, data) VALUES (?, ?, ?)',
+        (research_id, len(cols['contour_number']), buf.getvalue()),
+    )
+
+
+def load_contour_columns(research_id: int) -> dict[str, np.ndarray]:
+    """Столбцы CONTOUR_COLUMNS исследования; пустые, если контуров нет."""
+    with _connect() as conn:
+        row = conn.execute('SELECT data FROM contour_columns WHERE research_id = ?',
+                           (research_id,)).fetchone()
+    if row is None:
+        return _empty_contour_columns()
+    with np.load(io.BytesIO(row['data'])) as npz:
+        return {k: npz[k] for k in CONTOUR_COLUMNS}
+
+
+def count_contours(research_id: int) -> int:
+    """Число частиц исследования без чтения самих столбцов."""
+    with _connect() as conn:
+        row = conn.execute('SELECT count FROM contour_columns WHERE research_id = ?',
+                           (research_id,)).fetchone()
+    return row['count'] if row else 0
+
+
+def save_contour_columns(research_id: int, cols: dict[str, np.ndarray]) -> None:
     try:
         with _connect() as conn:
-            conn.execute('DELETE FROM contour_data WHERE research_id = ?', (research_id,))
-            conn.executemany(
-                'INSERT INTO contour_data '
-                '(research_id, contour_number, perimeter, area, width, length, dek) '
-                'VALUES (?, ?, ?, ?, ?, ?, ?)',
-                [(research_id, c.contour_number, c.perimeter, c.area, c.width, c.length, c.dek)
-                 for c in contours],
-            )
+            _write_contour_columns(conn, research_id, cols)
     except Exception as e:
         logger.error(f'Ошибка сохранения контуров для исследования id={research_id}: {e}')
         raise
 
 
+def get_contours(research_id: int) -> list[ContourData]:
+    cols = load_contour_columns(research_id)
+    return [
+        ContourData(research_id, *values)
+        for values in zip(*(cols[k].tolist() for k in CONTOUR_COLUMNS))
+    ]
+
+
+def save_contours(research_id: int, contours: list[ContourData]) -> None:
+    save_contour_columns(research_id, _columns_from_tuples(
+        (c.contour_number, c.perimeter, c.area, c.width, c.length, c.dek) for c in contours
+    ))
+
+
 def delete_contours(research_id: int) -> None:
     try:
         with _connect() as conn:
-            conn.execute('DELETE FROM contour_data WHERE research_id = ?', (research_id,))
+            conn.execute('DELETE FROM contour_columns WHERE research_id = ?', (research_id,))
     except Exception as e:
         logger.error(f'Ошибка удаления контуров для исследования id={research_id}: {e}')
         raise
+
+
+# ---------------------------------------------------------------------------
+# Статистика исследований
+# ---------------------------------------------------------------------------
+
+def get_research_stats(research_id: int) -> Optional[dict]:
+    with _connect() as conn:
+        row = conn.execute('SELECT data FROM research_stats WHERE research_id = ?',
+                           (research_id,)).fetchone()
+    return json.loads(row['data']) if row else None
+
+
+def _write_research_stats(conn: sqlite3.Connection, research_id: int, stats: dict) -> None:
+    conn.execute('INSERT OR REPLACE INTO research_stats (research_id, data) VALUES (?, ?)',
+                 (research_id, json.dumps(stats)))
+
+
+def save_research_stats(research_id: int, stats: dict) -> None:
+    try:
+        with _connect() as conn:
+            _write_research_stats(conn, research_id, stats)
+    except Exception as e:
+        logger.error(f'Ошибка сохранения статистики исследования id={research_id}: {e}')
+        raise
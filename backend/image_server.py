@@ -0,0 +1,160 @@
+import mimetypes
+import secrets
+import shutil
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote, unquote, urlsplit
+
+from backend.logger import logger
+from backend.previews import PREVIEW_SIZES, PreviewStore
+
+# ---------------------------------------------------------------------------
+# Локальный HTTP-сервер изображений сессии
+# ---------------------------------------------------------------------------
+#
+# Вместо base64 через мост pywebview UI получает URL вида
+#   http://127.0.0.1:<порт>/<токен>/research/analyzed/1.jpg?v=<etag>
+# и webview сам загружает и кэширует картинку. Сервер слушает только
+# loopback, отдаёт файлы только из своей корневой папки и только по
+# случайному токену, выданному при запуске. Уменьшенные копии
+# (backend.previews) запрашиваются префиксом вида: /<токен>/@thumb/...
+
+
+def file_etag(path: Path) -> str:
+    st = path.stat()
+    return f'{st.st_mtime_ns:x}-{st.st_size:x}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: '_Server'
+
+    def do_GET(self):
+        self._serve(with_body=True)
+
+    def do_HEAD(self):
+        self._serve(with_body=False)
+
+    def _serve(self, with_body: bool) -> None:
+        url = urlsplit(self.path)
+        path, kind = self.server.resolve(unquote(url.path))
+        if path is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        etag = file_etag(path)
+        data = None
+        if kind != 'full':
+            try:
+                data = self.server.previews.get(path, kind, etag)
+            except Exception:
+                logger.exception(f'Ошибка построения превью {kind} для {path.name}')
+                self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+                return
+            etag = f'{etag}-{kind}'
+
+        # В URL уже зашита версия файла — такой ответ можно кэшировать навсегда
+        if url.query == f'v={etag}':
+            cache_control = 'private, max-age=31536000, immutable'
+        else:
+            cache_control = 'no-cache'
+
+        if self.headers.get('If-None-Match') == f'"{etag}"':
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', f'"{etag}"')
+            self.send_header('Cache-Control', cache_control)
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        if data is not None:
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+        else:
+            self.send_header('Content-Type', mimetypes.guess_type(path.name)[0] or 'application/octet-stream')
+            self.send_header('Content-Length', str(path.stat().st_size))
+        self.send_header('ETag', f'"{etag}"')
+        self.send_header('Cache-Control', cache_control)
+        self.end_headers()
+        if not with_body:
+            return
+        if data is not None:
+            self.wfile.write(data)
+        else:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root: Path, token: str, previews: Optional[PreviewStore]):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.root = root
+        self.token = token
+        self.previews = previews
+
+    def resolve(self, url_path: str) -> tuple[Optional[Path], str]:
+        """
+        URL -> (файл внутри root, вид: 'full' | ключ PREVIEW_SIZES).
+        Файл None — чужой токен, выход за root, нет файла или превью недоступны.
+        """
+        prefix = f'/{self.token}/'
+        if not url_path.startswith(prefix):
+            return None, ''
+        rel, kind = url_path[len(prefix):], 'full'
+        if rel.startswith('@'):
+            kind, _, rel = rel[1:].partition('/')
+            if kind not in PREVIEW_SIZES or self.previews is None:
+                return None, ''
+        root = self.root.resolve()
+        path = (root / rel).resolve()
+        if not path.is_relative_to(root) or not path.is_file():
+            return None, ''
+        return path, kind
+
+
+class ImageServer:
+    """Запускается лениво, при первом запросе URL."""
+
+    def __init__(self, root: Path, previews: Optional[PreviewStore] = None):
+        self.root = Path(root)
+        self.previews = previews
+        self._server: Optional[_Server] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._server is not None:
+                return
+            self._server = _Server(self.root, secrets.token_urlsafe(16), self.previews)
+            threading.Thread(
+                target=self._server.serve_forever, name='image-server', daemon=True,
+            ).start()
+            logger.info(f'Сервер изображений: 127.0.0.1:{self._server.server_port}')
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                self._server = None
+
+    def url_for(self, path: Path, kind: str = 'full') -> str:
+        """
+        URL файла из root с версией (etag) в query — смена файла меняет URL.
+        kind — 'full' или вид уменьшенной копии из PREVIEW_SIZES.
+        """
+        self.start()
+        rel = Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+        etag = file_etag(path)
+        if kind != 'full':
+            rel, etag = f'@{kind}/{rel}', f'{etag}-{kind}'
+        port = self._server.server_port
+        rel = quote(rel, safe='/@')
+        return f'http://127.0.0.1:{port}/{self._server.token}/{rel}?v={etag}'
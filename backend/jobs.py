@@ -0,0 +1,147 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Optional
+
+from backend.logger import logger
+
+# ---------------------------------------------------------------------------
+# Фоновые задачи анализа
+# ---------------------------------------------------------------------------
+#
+# Вызов из JS через pywebview блокирует мост до возврата, поэтому долгий
+# анализ запускается в отдельном потоке, а UI опрашивает состояние задачи
+# через Api.get_job_status и может остановить её через Api.cancel_job.
+
+
+class JobCancelled(Exception):
+    """Задача остановлена пользователем между изображениями."""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    resource: str = ''  # что занимает задача, см. JobManager
+    state: str = 'running'  # 'running' | 'done' | 'error' | 'cancelled'
+    done: int = 0
+    total: int = 0
+    current: str = ''
+    contours: list[dict] = field(default_factory=list)
+    found: int = 0              # контуров найдено всего
+    keep_contours: bool = True  # False — контуры не копятся для опроса, только found
+    result: Optional[dict] = None
+    error: str = ''
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.state != 'running'
+
+    def report(self, done: int, total: int, current: str = '', contours: list[dict] = ()) -> None:
+        """
+        Колбэк прогресса для пайплайна: вызывается после каждого изображения.
+        Здесь же проверяется отмена — исключение прерывает цикл анализа.
+        """
+        self.done, self.total, self.current = done, total, current
+        self.found += len(contours)
+        if self.keep_contours:
+            self.contours.extend(contours)
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def to_dict(self, offset: int = 0) -> dict:
+        """offset — сколько контуров клиент уже получил; отдаются только новые."""
+        d = {
+            'id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'done': self.done,
+            'total': self.total,
+            'current': self.current,
+            'found': self.found,
+            'contours': self.contours[offset:],
+            'error': self.error,
+        }
+        if self.result is not None:
+            d['result'] = {k: v for k, v in self.result.items() if k != 'contours'}
+        return d
+
+
+class JobManager:
+    """
+    Реестр задач. Задача занимает ресурс (по умолчанию — свой вид):
+    одновременно на ресурсе выполняется не более одной задачи или
+    синхронного вызова (hold). Так импорт и анализ, работающие с одной
+    папкой сессии, не пересекаются.
+    """
+
+    def __init__(self):
+        self._jobs: dict[str, Job] = {}
+        self._held: dict[str, str] = {}  # ресурс -> вид синхронного вызова
+        self._lock = threading.Lock()
+
+    def _ensure_free(self, resource: str) -> None:
+        """Вызывается под self._lock; RuntimeError — ресурс занят."""
+        busy = next((j.kind for j in self._jobs.values()
+                     if j.resource == resource and not j.finished), None) or self._held.get(resource)
+        if busy:
+            raise RuntimeError(f'Задача {busy} уже выполняется')
+
+    def start(self, kind: str, fn: Callable[[Job], dict], resource: str = '') -> Job:
+        """
+        Запускает fn(job) в фоновом потоке и сразу возвращает задачу.
+        Бросает RuntimeError, если ресурс (по умолчанию kind) занят.
+        """
+        resource = resource or kind
+        with self._lock:
+            self._ensure_free(resource)
+            # Завершённые задачи больше не опрашиваются — не держим их результаты
+            self._jobs = {k: j for k, j in self._jobs.items() if not j.finished}
+            job = Job(id=uuid.uuid4().hex, kind=kind, resource=resource)
+            self._jobs[job.id] = job
+
+        threading.Thread(target=self._run, args=(job, fn), name=f'job-{kind}', daemon=True).start()
+        logger.info(f'Задача {kind} id={job.id} запущена')
+        return job
+
+    @contextmanager
+    def hold(self, resource: str, kind: str) -> Iterator[None]:
+        """
+        Занимает ресурс на время синхронного вызова, как задача вида kind.
+        Бросает RuntimeError, если ресурс занят.
+        """
+        with self._lock:
+            self._ensure_free(resource)
+            self._held[resource] = kind
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._held[resource]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        logger.info(f'Задача {job.kind} id={job.id}: запрошена отмена')
+        return True
+
+    @staticmethod
+    def _run(job: Job, fn: Callable[[Job], dict]) -> None:
+        try:
+            job.result = fn(job)
+            job.state = 'done'
+            logger.info(f'Задача {job.kind} id={job.id} завершена')
+        except JobCancelled:
+            job.state = 'cancelled'
+            logger.info(f'Задача {job.kind} id={job.id} отменена ({job.done}/{job.total})')
+        except Exception as e:
+            job.error = str(e)
+            job.state = 'error'
+            logger.exception(f'Ошибка задачи {job.kind} id={job.id}')
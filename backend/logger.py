@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import sys
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
@@ -8,27 +9,30 @@ LOG_PATH = ROOT_DIR / 'data' / 'app.log'
 
 
 def _setup() -> logging.Logger:
-    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-
     fmt = logging.Formatter(
         '[%(asctime)s] [%(levelname)s] [%(module)s] %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S',
     )
 
-    file_handler = RotatingFileHandler(
-        LOG_PATH, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8'
-    )
-    file_handler.setFormatter(fmt)
-    file_handler.setLevel(logging.DEBUG)
-
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(fmt)
     console_handler.setLevel(logging.DEBUG)
 
     log = logging.getLogger('optical_analyzer')
     log.setLevel(logging.DEBUG)
-    log.addHandler(file_handler)
     log.addHandler(console_handler)
+
+    # Процессы пула анализа тоже импортируют этот модуль. Второй
+    # RotatingFileHandler на тот же файл ломает ротацию (на Windows файл
+    # занят), поэтому в журнал пишет только основной процесс.
+    if multiprocessing.parent_process() is None:
+        LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            LOG_PATH, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8'
+        )
+        file_handler.setFormatter(fmt)
+        file_handler.setLevel(logging.DEBUG)
+        log.addHandler(file_handler)
     return log
 
 
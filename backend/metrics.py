@@ -0,0 +1,293 @@
+import io
+import shutil
+import uuid
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# ---------------------------------------------------------------------------
+# Колоночные измерения частиц
+# ---------------------------------------------------------------------------
+#
+# Измерения одного изображения хранятся «по столбцам»: dict имя -> массив,
+# где i-й элемент каждого массива относится к i-й частице. Пиксельные
+# столбцы не зависят от калибровки; перевод в реальные единицы и
+# округление выполняются над целыми столбцами.
+
+METRICS = ('perimeter', 'area', 'length', 'width', 'dek')
+COLUMNS = METRICS + ('cx', 'cy')
+
+
+def pixels_to_real_units(pixels, coeff: float, division: float):
+    """Работает и со скалярами, и с numpy-массивами."""
+    if coeff == 0:
+        return pixels
+    return (pixels / coeff) * division
+
+
+def empty_columns() -> dict[str, np.ndarray]:
+    cols = {k: np.empty(0, dtype=np.float64) for k in METRICS}
+    cols['cx'] = np.empty(0, dtype=np.int32)
+    cols['cy'] = np.empty(0, dtype=np.int32)
+    return cols
+
+
+def measure(contours: list[np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Пиксельные измерения всех контуров изображения.
+    OpenCV вызывается по одному разу на контур, результаты сразу ложатся
+    в заранее выделенные массивы — без промежуточных dict.
+    """
+    n = len(contours)
+    cols = empty_columns()
+    if n == 0:
+        return cols
+
+    perimeter = np.empty(n, dtype=np.float64)
+    area      = np.empty(n, dtype=np.float64)
+    length    = np.empty(n, dtype=np.float64)
+    width     = np.empty(n, dtype=np.float64)
+    cx        = np.zeros(n, dtype=np.int32)
+    cy        = np.zeros(n, dtype=np.int32)
+
+    for i, cnt in enumerate(contours):
+        M = cv2.moments(cnt)
+        if M['m00'] != 0:
+            cx[i] = int(M['m10'] / M['m00'])
+            cy[i] = int(M['m01'] / M['m00'])
+        perimeter[i] = cv2.arcLength(cnt, True)
+        area[i] = cv2.contourArea(cnt)
+        (_, _), (rw, rh), _ = cv2.minAreaRect(cnt)
+        width[i], length[i] = min(rw, rh), max(rw, rh)
+
+    cols.update(
+        perimeter=perimeter,
+        area=area,
+        length=length,
+        width=width,
+        dek=np.sqrt((4 * area) / np.pi),
+        cx=cx,
+        cy=cy,
+    )
+    return cols
+
+
+def to_real_units(
+    pixel_cols: dict[str, np.ndarray],
+    calibration_coefficient: float = 1.0,
+    division_price_value: float = 1.0,
+) -> dict[str, np.ndarray]:
+    """Переводит пиксельные столбцы в единицы калибровки и округляет до 0.01."""
+    c, d = calibration_coefficient, division_price_value
+    real = {
+        k: np.round(pixels_to_real_units(pixel_cols[k], c, d), 2)
+        for k in ('perimeter', 'length', 'width', 'dek')
+    }
+    real['area'] = np.round(pixels_to_real_units(pixel_cols['area'], c ** 2, d ** 2), 2)
+    real['cx'] = pixel_cols['cx']
+    real['cy'] = pixel_cols['cy']
+    return real
+
+
+def concat(parts: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    if not parts:
+        return empty_columns()
+    return {k: np.concatenate([p[k] for p in parts]) for k in COLUMNS}
+
+
+def count(cols: dict[str, np.ndarray]) -> int:
+    return len(cols['area'])
+
+
+def to_rows(cols: dict[str, np.ndarray], start_number: int = 1) -> list[dict]:
+    """Представление столбцов в виде привычного списка dict для API и UI."""
+    numbers = range(start_number, start_number + count(cols))
+    return [
+        {
+            'contour_number': num,
+            'perimeter': p,
+            'area':      a,
+            'length':    l,
+            'width':     w,
+            'dek':       d,
+            'cx': x,
+            'cy': y,
+        }
+        for num, p, a, l, w, d, x, y in zip(numbers, *(cols[k].tolist() for k in COLUMNS))
+    ]
+
+
+def select_rows(
+    cols: dict[str, np.ndarray],
+    sort_by: str = '',
+    descending: bool = False,
+    ranges: Optional[dict[str, tuple]] = None,
+) -> np.ndarray:
+    """
+    Индексы строк, попавших в диапазоны ranges ({столбец: (от, до)},
+    границы включительно, None — без границы), в порядке sort_by.
+    Сортировка устойчивая: равные значения остаются в порядке номеров.
+    """
+    n = len(next(iter(cols.values()))) if cols else 0
+    mask = np.ones(n, dtype=bool)
+    for key, (lo, hi) in (ranges or {}).items():
+        if lo is not None:
+            mask &= cols[key] >= lo
+        if hi is not None:
+            mask &= cols[key] <= hi
+    idx = np.flatnonzero(mask)
+    if sort_by:
+        values = cols[sort_by][idx]
+        order = np.argsort(-values if descending else values, kind='stable')
+        idx = idx[order]
+    return idx
+
+
+AVERAGE_KEYS = ('perimeter', 'area', 'width', 'length', 'dek')
+
+
+def sum_cents(values: np.ndarray) -> int:
+    """
+    Точная сумма столбца, уже округлённого до 0.01, в сотых. Не зависит от
+    порядка сложения, поэтому сумма по частям (по изображениям) совпадает
+    с суммой всего столбца.
+    """
+    return int(np.rint(np.asarray(values, dtype=np.float64) * 100).astype(np.int64).sum())
+
+
+def averages_from_cents(sums: dict[str, int], n: int) -> dict[str, float]:
+    result: dict[str, float] = {k: 0 for k in AVERAGE_KEYS}
+    if n:
+        for key in result:
+            result[key] = round(sums[key] / 100 / n, 2)
+    return result
+
+
+def averages(cols: dict[str, np.ndarray]) -> dict[str, float]:
+    """Средние по уже переведённым столбцам (ключи как в run_research_analysis)."""
+    return averages_from_cents({k: sum_cents(cols[k]) for k in AVERAGE_KEYS}, count(cols))
+
+
+# ---------------------------------------------------------------------------
+# Пиксельные измерения исследования на диске
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ResearchMeasurements:
+    """
+    Пиксельные столбцы всех частиц исследования в порядке нумерации
+    (номер частицы = индекс + 1) и число частиц на каждом файле.
+    Позволяет пересчитать результаты под другую калибровку без
+    повторной обработки изображений.
+    """
+    files: list[str]
+    counts: np.ndarray
+    columns: dict[str, np.ndarray]
+
+
+def save_measurements(path: Path, m: ResearchMeasurements) -> None:
+    tmp = path.with_name(f'.{path.stem}.tmp.npz')
+    np.savez(tmp, files=np.array(m.files, dtype=str), counts=m.counts, **m.columns)
+    tmp.replace(path)
+
+
+def measurements_bytes(m: ResearchMeasurements) -> bytes:
+    """Содержимое .npz как у save_measurements — для атомарной записи файла сессии."""
+    buf = io.BytesIO()
+    np.savez(buf, files=np.array(m.files, dtype=str), counts=m.counts, **m.columns)
+    return buf.getvalue()
+
+
+def without_file(m: ResearchMeasurements, name: str) -> ResearchMeasurements:
+    """Измерения без частиц файла name; номера частиц следующих файлов сдвигаются."""
+    if name not in m.files:
+        return m
+    i = m.files.index(name)
+    first = int(m.counts[:i].sum())
+    last = first + int(m.counts[i])
+    return ResearchMeasurements(
+        files=m.files[:i] + m.files[i + 1:],
+        counts=np.delete(m.counts, i),
+        columns={k: np.concatenate([v[:first], v[last:]]) for k, v in m.columns.items()},
+    )
+
+
+def load_measurements(path: Path) -> ResearchMeasurements:
+    with np.load(path) as npz:
+        return ResearchMeasurements(
+            files=npz['files'].tolist(),
+            counts=npz['counts'],
+            columns={k: npz[k] for k in COLUMNS},
+        )
+
+
+class MeasurementsWriter:
+    """
+    Пишет тот же measurements.npz, что save_measurements, но по одному
+    изображению: append дописывает пиксельные столбцы в файлы-спулы на
+    диске, close собирает из них .npz потоково, не загружая столбцы целиком.
+    Память — одно изображение, а не всё исследование. Файл появляется
+    только после успешного close; при исключении в with спулы удаляются.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._spool = self.path.with_name(f'.{self.path.stem}.{uuid.uuid4().hex}.spool')
+        self._spool.mkdir(parents=True)
+        self._files: list[str] = []
+        self._counts: list[int] = []
+        self._dtypes: dict[str, np.dtype] = {}
+        self._handles = {k: open(self._spool / k, 'wb') for k in COLUMNS}
+
+    def append(self, name: str, cols: dict[str, np.ndarray]) -> None:
+        for k in COLUMNS:
+            column = np.ascontiguousarray(cols[k])
+            self._dtypes.setdefault(k, column.dtype)
+            self._handles[k].write(column.astype(self._dtypes[k], copy=False).tobytes())
+        self._files.append(name)
+        self._counts.append(count(cols))
+
+    def close(self) -> None:
+        for f in self._handles.values():
+            f.close()
+        total = sum(self._counts)
+        dtypes = {**{k: v.dtype for k, v in empty_columns().items()}, **self._dtypes}
+        tmp = self.path.with_name(f'.{self.path.stem}.tmp.npz')
+        try:
+            with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+                _write_npy(zf, 'files', np.array(self._files, dtype=str))
+                _write_npy(zf, 'counts', np.array(self._counts, dtype=np.int64))
+                for k in COLUMNS:
+                    header = {'descr': np.lib.format.dtype_to_descr(dtypes[k]),
+                              'fortran_order': False, 'shape': (total,)}
+                    with zf.open(f'{k}.npy', 'w', force_zip64=True) as out, \
+                            open(self._spool / k, 'rb') as src:
+                        np.lib.format.write_array_header_1_0(out, header)
+                        shutil.copyfileobj(src, out, 1024 * 1024)
+            tmp.replace(self.path)
+        finally:
+            tmp.unlink(missing_ok=True)
+            shutil.rmtree(self._spool, ignore_errors=True)
+
+    def abort(self) -> None:
+        for f in self._handles.values():
+            f.close()
+        shutil.rmtree(self._spool, ignore_errors=True)
+
+    def __enter__(self) -> 'MeasurementsWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _write_npy(zf: zipfile.ZipFile, name: str, array: np.ndarray) -> None:
+    with zf.open(f'{name}.npy', 'w', force_zip64=True) as out:
+        np.lib.format.write_array(out, array, allow_pickle=False)
@@ -0,0 +1,202 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+import cv2
+
+from backend.logger import logger
+
+# ---------------------------------------------------------------------------
+# Конвейер анализа
+# ---------------------------------------------------------------------------
+#
+# Три стадии, связанные ограниченными очередями:
+#   чтение    — поток читает файлы наперёд (prefetch);
+#   расчёт    — пул процессов или потоков, результаты строго по порядку
+#               (imap_ordered);
+#   запись    — потоки кодируют JPEG и пишут на диск (AsyncWriter).
+# OpenCV отпускает GIL в imdecode/CLAHE/imencode, поэтому в режиме
+# 'threads' диск, кодек и вычисления перекрываются и без процессов.
+# Глубина каждой очереди ограничена — память не растёт с числом файлов.
+
+
+@dataclass
+class PipelineConfig:
+    executor: str = 'processes'  # 'processes' | 'threads' — чем считать изображения
+    read_ahead: int = 4          # файлов, прочитанных наперёд (для расчёта в этом процессе)
+    write_queue: int = 8         # задач записи в очереди; дальше расчёт ждёт
+    write_threads: int = 2       # 0 — писать сразу, в потоке расчёта
+    cv_threads: int = -1         # cv2.setNumThreads на время расчёта; -1 — не менять
+
+
+def resolve_workers(workers: int, jobs: int) -> int:
+    """workers <= 0 означает «по числу ядер»; больше, чем файлов, не нужно."""
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, jobs))
+
+
+def imap_ordered(
+    fn: Callable,
+    items: Iterable,
+    workers: int,
+    executor: str = 'processes',
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> Iterator:
+    """
+    Аналог map() на пуле: результаты отдаются строго в порядке items,
+    а в работе держится не более 2 * workers задач, чтобы готовые
+    изображения не копились в памяти. workers <= 1 — в текущем потоке.
+    """
+    it = iter(items)
+    try:
+        if workers <= 1:
+            yield from map(fn, it)
+            return
+
+        if executor == 'threads':
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analyze')
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+        with pool:
+            pending = deque(pool.submit(fn, item) for item in islice(it, workers * 2))
+            try:
+                while pending:
+                    result = pending.popleft().result()
+                    for item in islice(it, 1):
+                        pending.append(pool.submit(fn, item))
+                    yield result
+            finally:
+                # Прерванный проход (отмена, ошибка) не ждёт ещё не начатые задачи
+                for future in pending:
+                    future.cancel()
+    finally:
+        # Останавливает и стадию чтения, если items — генератор prefetch
+        close = getattr(it, 'close', None)
+        if close:
+            close()
+
+
+_DONE = object()
+
+
+def prefetch(paths: Iterable[Path], depth: int) -> Iterator[tuple[Path, bytes]]:
+    """
+    (путь, байты) файлов; отдельный поток читает не более depth файлов
+    наперёд. Ошибка чтения пробрасывается потребителю.
+    """
+    if depth <= 0:
+        yield from ((p, p.read_bytes()) for p in paths)
+        return
+
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader() -> None:
+        try:
+            for p in paths:
+                if not put((p, p.read_bytes())):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    threading.Thread(target=reader, name='analyze-read', daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+class AsyncWriter:
+    """
+    Стадия записи: submit(fn, ...) ставит задачу в пул потоков и
+    блокируется, пока в очереди уже write_queue задач. Первая ошибка
+    записи пробрасывается из следующего submit или из close.
+    """
+
+    def __init__(self, threads: int = 2, depth: int = 8):
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if threads > 0:
+            self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='analyze-write')
+        self._slots = threading.BoundedSemaphore(max(1, depth))
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args) -> None:
+        self._raise_error()
+        if self._pool is None:
+            fn(*args)
+            return
+        self._slots.acquire()
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(self._done)
+
+    def _done(self, future: Future) -> None:
+        self._slots.release()
+        if future.exception() is not None:
+            with self._lock:
+                self._error = self._error or future.exception()
+
+    def _raise_error(self) -> None:
+        with self._lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        """Дожидается всех записей."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self._raise_error()
+
+    def __enter__(self) -> 'AsyncWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Основная ошибка (или отмена) важнее ошибок записи
+            try:
+                self.close()
+            except Exception:
+                logger.exception('Ошибка записи после прерывания анализа')
+
+
+@contextmanager
+def cv_threads(n: int):
+    """Временно меняет число потоков OpenCV в этом процессе; n < 0 — без изменений."""
+    if n < 0:
+        yield
+        return
+    previous = cv2.getNumThreads()
+    cv2.setNumThreads(n)
+    try:
+        yield
+    finally:
+        cv2.setNumThreads(previous)
@@ -0,0 +1,153 @@
+import glob
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from backend.logger import logger
+
+# ---------------------------------------------------------------------------
+# Уменьшенные копии изображений сессии
+# ---------------------------------------------------------------------------
+#
+# Для списка файлов и превью в UI не нужен полный кадр микроскопа.
+# Уменьшенные копии строятся один раз на версию файла, лежат на диске в
+# session/previews/<путь исходника>/<вид>/<имя файла>.<etag>.jpg (с
+# расширением исходника: 1.jpg и 1.png — разные файлы) и отдаются
+# сервером изображений из LRU-кэша в памяти, ограниченного по байтам.
+# Версия (etag) в имени файла и в ключе кэша делает перезаписанный
+# исходник (повторный анализ) автоматически «новым» изображением.
+
+PREVIEW_SIZES = {'thumb': 200, 'preview': 800}  # наибольшая сторона, px
+DEFAULT_MEMORY_BYTES = 64 * 1024 ** 2
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def jpeg_size(data: bytes) -> Optional[tuple[int, int]]:
+    """(ширина, высота) из заголовка SOF без декодирования; None для не-JPEG."""
+    if data[:2] != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        seg_len = struct.unpack('>H', data[i + 2:i + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack('>HH', data[i + 5:i + 9])
+            return w, h
+        i += 2 + seg_len
+    return None
+
+
+def make_preview(data: bytes, max_side: int) -> bytes:
+    """
+    Уменьшенная JPEG-копия. Если размер известен из заголовка, JPEG
+    декодируется сразу в 1/2, 1/4 или 1/8 разрешения (IMREAD_REDUCED_*),
+    но не меньше нужного, и доуменьшается INTER_AREA.
+    """
+    flag = cv2.IMREAD_COLOR
+    size = jpeg_size(data)
+    if size:
+        for factor, reduced in _REDUCED_FLAGS:
+            if max(size) // factor >= max_side:
+                flag = reduced
+                break
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if image is None:
+        raise ValueError('Не удалось декодировать изображение')
+
+    h, w = image.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not ok:
+        raise ValueError('Не удалось закодировать превью')
+    return buf.tobytes()
+
+
+def _versions(folder: Path, name: str) -> list[Path]:
+    """Все сохранённые версии превью исходника с именем name в папке."""
+    return [p for p in folder.glob(f'{glob.escape(name)}.*.jpg')
+            if p.name[:-len('.jpg')].rsplit('.', 1)[0] == name]
+
+
+class PreviewStore:
+    """Потокобезопасен: вызывается из потоков сервера изображений."""
+
+    def __init__(self, session_root: Path, previews_root: Path,
+                 memory_bytes: int = DEFAULT_MEMORY_BYTES):
+        self.session_root = Path(session_root)
+        self.previews_root = Path(previews_root)
+        self.memory_bytes = memory_bytes
+        self._lru: OrderedDict[tuple, bytes] = OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _dir(self, source: Path, kind: str) -> Path:
+        rel = source.resolve().relative_to(self.session_root.resolve())
+        return self.previews_root / rel.parent / kind
+
+    def get(self, source: Path, kind: str, etag: str) -> bytes:
+        """Байты превью вида kind для версии etag исходника."""
+        if kind not in PREVIEW_SIZES:
+            raise ValueError(f'Неизвестный вид превью: {kind}')
+        key = (str(source.resolve()), kind, etag)
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                self._lru.move_to_end(key)
+                return data
+
+        folder = self._dir(source, kind)
+        path = folder / f'{source.name}.{etag}.jpg'
+        if path.exists():
+            data = path.read_bytes()
+        else:
+            data = make_preview(source.read_bytes(), PREVIEW_SIZES[kind])
+            folder.mkdir(parents=True, exist_ok=True)
+            # Копии прежних версий этого файла больше не понадобятся
+            for old in _versions(folder, source.name):
+                old.unlink(missing_ok=True)
+            tmp = path.with_name(f'.{path.name}.{threading.get_ident()}')
+            tmp.write_bytes(data)
+            tmp.replace(path)
+            logger.debug(f'Превью {kind} для {source.name} построено')
+
+        self._remember(key, data)
+        return data
+
+    def _remember(self, key: tuple, data: bytes) -> None:
+        with self._lock:
+            if key in self._lru:
+                return
+            self._lru[key] = data
+            self._used += len(data)
+            while self._used > self.memory_bytes and self._lru:
+                _, evicted = self._lru.popitem(last=False)
+                self._used -= len(evicted)
+
+    def invalidate(self, source: Path) -> None:
+        """Удаляет все превью исходника — из памяти и с диска."""
+        source_key = str(source.resolve())
+        with self._lock:
+            for key in [k for k in self._lru if k[0] == source_key]:
+                self._used -= len(self._lru.pop(key))
+        for kind in PREVIEW_SIZES:
+            for old in _versions(self._dir(source, kind), source.name):
+                old.unlink(missing_ok=True)
@@ -0,0 +1,222 @@
+import numpy as np
+
+from backend import metrics
+
+# ---------------------------------------------------------------------------
+# Статистика распределения размеров частиц
+# ---------------------------------------------------------------------------
+#
+# Считается над целыми столбцами (backend.metrics, db.load_contour_columns)
+# в реальных единицах. Для каждого параметра — число, среднее, СКО,
+# минимум, максимум и перцентили; D10/D50/D90 — перцентили ДЭК по числу
+# частиц. Гистограммы отдаются уже посчитанными (границы + количества),
+# чтобы UI не получал все частицы ради графика.
+
+STAT_METRICS = ('perimeter', 'area', 'width', 'length', 'dek')
+PERCENTILES = (10, 25, 50, 75, 90)
+DEFAULT_BINS = 20
+
+
+def summarize(values: np.ndarray) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return {'count': 0, 'mean': 0.0, 'std': 0.0, 'min': 0.0, 'max': 0.0,
+                'percentiles': {f'p{p}': 0.0 for p in PERCENTILES}}
+    return {
+        'count': n,
+        'mean': float(values.mean()),
+        'std': float(values.std(ddof=1)) if n > 1 else 0.0,
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'percentiles': {f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+    }
+
+
+def histogram(values: np.ndarray, bins: int = DEFAULT_BINS, log: bool = False) -> dict:
+    """
+    {'edges': [bins + 1], 'counts': [bins], 'excluded': k}. В логарифмической
+    шкале границы идут геометрической прогрессией, а значения <= 0 в неё
+    не попадают и считаются в excluded.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    excluded = 0
+    if log:
+        positive = values[values > 0]
+        excluded = len(values) - len(positive)
+        values = positive
+    if len(values) == 0:
+        return {'edges': [], 'counts': [], 'excluded': excluded}
+
+    lo, hi = float(values.min()), float(values.max())
+    if lo == hi:
+        return {'edges': [lo, hi], 'counts': [len(values)], 'excluded': excluded}
+    if log:
+        edges = np.geomspace(lo, hi, bins + 1)
+    else:
+        edges = np.linspace(lo, hi, bins + 1)
+    counts, _ = np.histogram(values, edges)
+    return {'edges': edges.tolist(), 'counts': counts.tolist(), 'excluded': excluded}
+
+
+def research_stats(cols: dict[str, np.ndarray], bins: int = DEFAULT_BINS) -> dict:
+    """Сводка и гистограммы (линейные и логарифмические) по всем параметрам."""
+    summaries = {m: summarize(cols[m]) for m in STAT_METRICS}
+    dek = summaries['dek']['percentiles']
+    return {
+        'count': len(cols['dek']),
+        'bins': bins,
+        'metrics': summaries,
+        'd_values': {'d10': dek['p10'], 'd50': dek['p50'], 'd90': dek['p90']},
+        'histograms': {
+            m: {'linear': histogram(cols[m], bins), 'log': histogram(cols[m], bins, log=True)}
+            for m in STAT_METRICS
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Потоковая статистика
+# ---------------------------------------------------------------------------
+#
+# Для анализа без накопления всех частиц в памяти: столбцы каждого
+# изображения вливаются в накопители и больше не нужны. Моменты — по
+# Уэлфорду (слияние пакетов по формуле Чана), квантили — логарифмический
+# скетч с заданной относительной точностью (как DDSketch). Накопители
+# сливаются друг с другом, поэтому годятся и для частичных результатов
+# параллельных воркеров.
+
+
+class RunningMoments:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self._combine(n, mean, m2, float(values.min()), float(values.max()))
+
+    def merge(self, other: 'RunningMoments') -> None:
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+
+    def _combine(self, n: int, mean: float, m2: float, lo: float, hi: float) -> None:
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, lo)
+        self.max = max(self.max, hi)
+
+    @property
+    def std(self) -> float:
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+
+class QuantileSketch:
+    """
+    Квантили с относительной погрешностью не больше alpha: значение v > 0
+    попадает в корзину ceil(log_gamma(v)), gamma = (1 + alpha) / (1 - alpha).
+    Число корзин растёт с логарифмом разброса значений, а не с их числом.
+    """
+
+    def __init__(self, alpha: float = 0.005):
+        self.alpha = alpha
+        self._log_gamma = np.log((1 + alpha) / (1 - alpha))
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0  # значения <= 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def add(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        if len(positive):
+            keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                                     return_counts=True)
+            for k, c in zip(keys.tolist(), counts.tolist()):
+                self.buckets[k] = self.buckets.get(k, 0) + c
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        self.zero_count += other.zero_count
+        for k, c in other.buckets.items():
+            self.buckets[k] = self.buckets.get(k, 0) + c
+
+    def quantile(self, q: float) -> float:
+        n = self.count
+        if n == 0:
+            return 0.0
+        rank = q * (n - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if rank < seen:
+                # Середина корзины (gamma^(k-1), gamma^k] в смысле относительной погрешности
+                return float(2 * np.exp(k * self._log_gamma) / (1 + np.exp(self._log_gamma)))
+        return float(np.exp(max(self.buckets) * self._log_gamma))
+
+
+class StreamingStats:
+    """Накопители по всем STAT_METRICS; add — столбцы одного изображения."""
+
+    def __init__(self, alpha: float = 0.005):
+        self.moments = {m: RunningMoments() for m in STAT_METRICS}
+        self.sketches = {m: QuantileSketch(alpha) for m in STAT_METRICS}
+        # Точные суммы для averages — совпадают с metrics.averages по всем столбцам
+        self.cents = {m: 0 for m in metrics.AVERAGE_KEYS}
+
+    @property
+    def count(self) -> int:
+        return self.moments['dek'].count
+
+    def add(self, cols: dict[str, np.ndarray]) -> None:
+        for m in STAT_METRICS:
+            self.moments[m].add(cols[m])
+            self.sketches[m].add(cols[m])
+        for m in self.cents:
+            self.cents[m] += metrics.sum_cents(cols[m])
+
+    def merge(self, other: 'StreamingStats') -> None:
+        for m in STAT_METRICS:
+            self.moments[m].merge(other.moments[m])
+            self.sketches[m].merge(other.sketches[m])
+        for m in self.cents:
+            self.cents[m] += other.cents[m]
+
+    def averages(self) -> dict[str, float]:
+        """Как metrics.averages по всем добавленным столбцам (значения в 0.01)."""
+        return metrics.averages_from_cents(self.cents, self.count)
+
+    def summary(self) -> dict:
+        """Сводка в формате research_stats, без гистограмм; перцентили — приближённые."""
+        summaries = {}
+        for m in STAT_METRICS:
+            mom, sketch = self.moments[m], self.sketches[m]
+            summaries[m] = {
+                'count': mom.count,
+                'mean': mom.mean,
+                'std': mom.std,
+                'min': mom.min if mom.count else 0.0,
+                'max': mom.max if mom.count else 0.0,
+                'percentiles': {f'p{p}': sketch.quantile(p / 100) for p in PERCENTILES},
+            }
+        dek = summaries['dek']['percentiles']
+        return {
+            'count': self.count,
+            'metrics': summaries,
+            'd_values': {'d10': dek['p10'], 'd50': dek['p50'], 'd90': dek['p90']},
+        }
@@ -1,6 +1,9 @@
 import base64
+import os
 import shutil
+import uuid
 from pathlib import Path
+from typing import Callable, Iterable, Optional
 
 from backend.logger import logger, ROOT_DIR
 
@@ -12,11 +15,15 @@ DATA_DIR         = ROOT_DIR / 'data'
 SESSION_DIR      = DATA_DIR / 'session'
 SESSION_RES_DIR  = SESSION_DIR / 'research'
 SESSION_CAL_DIR  = SESSION_DIR / 'calibration'
+SESSION_PREV_DIR = SESSION_DIR / 'previews'  # уменьшенные копии, см. backend.previews
 RESEARCH_DIR     = DATA_DIR / 'research'
 CALIBRATION_DIR  = DATA_DIR / 'calibration'
+CACHE_DIR        = DATA_DIR / 'cache'
 
-_RESEARCH_FOLDERS   = ('sources', 'contrasted', 'contours', 'analyzed')
+_RESEARCH_FOLDERS   = ('sources', 'contrasted', 'contours', 'analyzed', 'overlays')
+MEASUREMENTS_FILE   = 'measurements.npz'  # пиксельные измерения, см. backend.metrics
 _CALIBRATION_FILES  = ('sources.jpg', 'contrasted.jpg', 'contours.jpg', 'calibrated.jpg')
+IMAGE_SUFFIXES      = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
 
 
 # ---------------------------------------------------------------------------
@@ -29,17 +36,52 @@ def _recreate_dir(path: Path) -> None:
     path.mkdir(parents=True)
 
 
-def _copy_dir(src: Path, dst: Path) -> None:
-    if src.exists():
-        shutil.copytree(src, dst, dirs_exist_ok=True)
-        logger.debug(f'Скопирована папка {src} -> {dst}')
+def link_or_copy(src: Path, dst: Path) -> bool:
+    """
+    Жёсткая ссылка вместо копии, если src и dst на одном томе NTFS/ext4;
+    иначе (другой диск, FAT, сетевая папка) — обычное копирование.
+    Существующий dst сначала удаляется, а не перезаписывается: он сам
+    может быть ссылкой на файл архива. Возвращает True для ссылки.
+    """
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copyfile(src, dst)
+        return False
 
 
-def _copy_file(src: Path, dst: Path) -> None:
+def _link_file(src: Path, dst: Path) -> None:
     if src.exists():
         dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src, dst)
-        logger.debug(f'Скопирован файл {src.name} -> {dst}')
+        link_or_copy(src, dst)
+
+
+def _link_dir(src: Path, dst: Path) -> None:
+    """Повторяет дерево src в dst жёсткими ссылками — время не зависит от объёма файлов."""
+    if not src.exists():
+        return
+    dst.mkdir(parents=True, exist_ok=True)
+    for f in src.rglob('*'):
+        target = dst / f.relative_to(src)
+        if f.is_dir():
+            target.mkdir(parents=True, exist_ok=True)
+        else:
+            link_or_copy(f, target)
+    logger.debug(f'Связана папка {src} -> {dst}')
+
+
+def write_session_file(path: Path, data: bytes) -> None:
+    """
+    Запись файла сессии через временный файл и замену. Файлы сессии после
+    загрузки или сохранения — жёсткие ссылки на архив (и на кэш анализа),
+    поэтому писать в них на месте нельзя: изменился бы и архив.
+    Замена создаёт новый файл, а архивная копия остаётся прежней.
+    """
+    tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex}')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
 
 
 # ---------------------------------------------------------------------------
@@ -49,11 +91,14 @@ def _copy_file(src: Path, dst: Path) -> None:
 def clear_session_research() -> None:
     for folder in _RESEARCH_FOLDERS:
         _recreate_dir(SESSION_RES_DIR / folder)
+    (SESSION_RES_DIR / MEASUREMENTS_FILE).unlink(missing_ok=True)
+    shutil.rmtree(SESSION_PREV_DIR / 'research', ignore_errors=True)
     logger.debug('Сессия исследования очищена')
 
 
 def clear_session_calibration() -> None:
     _recreate_dir(SESSION_CAL_DIR)
+    shutil.rmtree(SESSION_PREV_DIR / 'calibration', ignore_errors=True)
     logger.debug('Сессия калибровки очищена')
 
 
@@ -71,7 +116,8 @@ def save_research_files(research_id: int) -> None:
     dst_root = RESEARCH_DIR / str(research_id)
     _recreate_dir(dst_root)
     for folder in _RESEARCH_FOLDERS:
-        _copy_dir(SESSION_RES_DIR / folder, dst_root / folder)
+        _link_dir(SESSION_RES_DIR / folder, dst_root / folder)
+    _link_file(SESSION_RES_DIR / MEASUREMENTS_FILE, dst_root / MEASUREMENTS_FILE)
     logger.debug(f'Файлы исследования id={research_id} сохранены')
 
 
@@ -79,7 +125,8 @@ def load_research_files(research_id: int) -> None:
     clear_session_research()
     src_root = RESEARCH_DIR / str(research_id)
     for folder in _RESEARCH_FOLDERS:
-        _copy_dir(src_root / folder, SESSION_RES_DIR / folder)
+        _link_dir(src_root / folder, SESSION_RES_DIR / folder)
+    _link_file(src_root / MEASUREMENTS_FILE, SESSION_RES_DIR / MEASUREMENTS_FILE)
     logger.debug(f'Файлы исследования id={research_id} загружены в сессию')
 
 
@@ -98,7 +145,7 @@ def save_calibration_files(calibration_id: int) -> None:
     dst_root = CALIBRATION_DIR / str(calibration_id)
     dst_root.mkdir(parents=True, exist_ok=True)
     for fname in _CALIBRATION_FILES:
-        _copy_file(SESSION_CAL_DIR / fname, dst_root / fname)
+        _link_file(SESSION_CAL_DIR / fname, dst_root / fname)
     logger.debug(f'Файлы калибровки id={calibration_id} сохранены')
 
 
@@ -106,7 +153,7 @@ def load_calibration_files(calibration_id: int) -> None:
     clear_session_calibration()
     src_root = CALIBRATION_DIR / str(calibration_id)
     for fname in _CALIBRATION_FILES:
-        _copy_file(src_root / fname, SESSION_CAL_DIR / fname)
+        _link_file(src_root / fname, SESSION_CAL_DIR / fname)
     logger.debug(f'Файлы калибровки id={calibration_id} загружены в сессию')
 
 
@@ -139,9 +186,9 @@ def image_to_base64(path: Path) -> str:
     return f'data:image/jpeg;base64,{data}'
 
 
-def get_session_image_b64(filename: str, folder: str, context: str) -> str:
+def get_session_image_path(filename: str, folder: str, context: str) -> Optional[Path]:
     """
-    Возвращает base64 изображения из сессии.
+    Возвращает путь к изображению сессии или None, если его нет.
     context: 'research' | 'calibration'
     folder:  'sources' | 'contrasted' | 'contours' | 'analyzed'  (для research)
              имя файла без папки                                   (для calibration)
@@ -150,6 +197,76 @@ def get_session_image_b64(filename: str, folder: str, context: str) -> str:
         path = SESSION_RES_DIR / folder / filename
     else:
         path = SESSION_CAL_DIR / filename
-    if not path.exists():
+    return path if path.exists() else None
+
+
+def get_session_image_b64(filename: str, folder: str, context: str) -> str:
+    """Возвращает base64 изображения из сессии (см. get_session_image_path)."""
+    path = get_session_image_path(filename, folder, context)
+    if path is None:
         return ''
     return image_to_base64(path)
+
+
+# ---------------------------------------------------------------------------
+# Импорт исходников по путям
+# ---------------------------------------------------------------------------
+#
+# Файлы выбираются нативным диалогом и попадают в сессию по пути на диске,
+# минуя base64 через мост pywebview. Имена в sources/ — те же
+# последовательные номера, что выдаёт UI при загрузке через <input>.
+
+def expand_import_paths(paths: Iterable[str]) -> list[Path]:
+    """Файлы изображений из списка путей; папки раскрываются на один уровень."""
+    result: list[Path] = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            result.extend(sorted(f for f in p.iterdir()
+                                 if f.is_file() and f.suffix.lower() in IMAGE_SUFFIXES))
+        elif p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES:
+            result.append(p)
+    return result
+
+
+def _in_data_dir(path: Path) -> bool:
+    return path.resolve().is_relative_to(DATA_DIR.resolve())
+
+
+def _next_source_number(folder: Path) -> int:
+    numbers = [int(f.stem) for f in folder.iterdir() if f.stem.isdigit()]
+    return max(numbers, default=0) + 1
+
+
+def import_source_files(
+    paths: list[Path],
+    on_progress: Optional[Callable[[int, int, str], None]] = None,
+) -> list[str]:
+    """
+    Переносит исходники в session/research/sources/ под следующими
+    свободными номерами. Файлы пользователя копируются: при сохранении
+    исследования они станут ссылками в архиве, и правка оригинала на
+    месте изменила бы архив. Жёсткие ссылки — только для файлов из
+    DATA_DIR (архив, сессия).
+    on_progress(готово, всего, имя) вызывается после каждого файла;
+    исключение из него прерывает импорт, уже перенесённые файлы остаются.
+    Возвращает имена новых файлов в сессии.
+    """
+    folder = SESSION_RES_DIR / 'sources'
+    folder.mkdir(parents=True, exist_ok=True)
+    number = _next_source_number(folder)
+
+    names: list[str] = []
+    linked = 0
+    for done, src in enumerate(paths, 1):
+        name = f'{number}{src.suffix.lower()}'
+        if _in_data_dir(src):
+            linked += link_or_copy(src, folder / name)
+        else:
+            shutil.copy2(src, folder / name)
+        names.append(name)
+        number += 1
+        if on_progress:
+            on_progress(done, len(paths), name)
+
+    logger.info(f'Импортировано файлов: {len(names)} (ссылками: {linked})')
+    return names
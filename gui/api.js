@@ -7,6 +7,25 @@ const api = (() => {
     return window.pywebview.api[method](...args);
   }
 
+  const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+  /**
+   * Опрашивает фоновую задачу до завершения.
+   * onProgress(status) получает каждый ответ get_job_status; в status.contours
+   * только новые контуры с прошлого опроса. Возвращает последний статус.
+   */
+  async function waitJob(jobId, onProgress, intervalMs = 300) {
+    let offset = 0;
+    for (;;) {
+      const status = await call('get_job_status', jobId, offset);
+      if (!status.ok) return status;
+      offset += status.contours.length;
+      if (onProgress) onProgress(status);
+      if (status.state !== 'running') return status;
+      await sleep(intervalMs);
+    }
+  }
+
   return {
     // Сессия
     newResearch:       ()                          => call('new_research'),
@@ -14,13 +33,26 @@ const api = (() => {
 
     // Изображения
     uploadImage:       (filename, b64, context)    => call('upload_image', filename, b64, context),
+    importImages:      (paths)                     => call('import_images', paths),
+    importImagesDialog:(folder = false)            => call('import_images_dialog', folder),
     deleteImage:       (filename, context)         => call('delete_image', filename, context),
     listImages:        (context)                   => call('list_images', context),
-    getImage:          (filename, folder, context) => call('get_image', filename, folder, context),
+    getImage:          (filename, folder, context, size = 'full') => call('get_image', filename, folder, context, size),
+    getOverlay:        (filename)                  => call('get_overlay', filename),
 
     // Анализ
-    executeResearch:   (calibrationId)             => call('execute_research', calibrationId),
+    executeResearch:   (calibrationId, workers = 1, lazy = false, pipeline = null, streaming = false) =>
+                         call('execute_research', calibrationId, workers, lazy, pipeline, streaming),
     executeCalibration:()                          => call('execute_calibration'),
+    remeasureResearch: (calibrationId, streaming = false) => call('remeasure_research', calibrationId, streaming),
+
+    // Фоновые задачи
+    startResearch:     (calibrationId, workers = 1, lazy = false, pipeline = null, streaming = false) =>
+                         call('start_research', calibrationId, workers, lazy, pipeline, streaming),
+    startCalibration:  ()                          => call('start_calibration'),
+    getJobStatus:      (jobId, offset = 0)         => call('get_job_status', jobId, offset),
+    cancelJob:         (jobId)                     => call('cancel_job', jobId),
+    waitJob,
 
     // Калибровки
     getCalibrations:   ()                          => call('get_calibrations'),
@@ -31,10 +63,16 @@ const api = (() => {
 
     // Исследования
     getResearches:     ()                          => call('get_researches'),
+    getResearchesPage: (limit = 50, cursor = null, sortBy = 'date', descending = true, filters = null) =>
+                         call('get_researches_page', limit, cursor, sortBy, descending, filters),
+    searchHistory:     (query, limit = 20)         => call('search_history', query, limit),
     getResearch:       (id)                        => call('get_research', id),
     saveResearch:      (data)                      => call('save_research', data),
     loadResearch:      (id)                        => call('load_research', id),
     deleteResearch:    (id)                        => call('delete_research', id),
+    getResearchStats:  (id, bins = 20)             => call('get_research_stats', id, bins),
+    getContoursPage:   (source, offset = 0, limit = 100, sortBy = 'contour_number', filters = null) =>
+                         call('get_contours_page', source, offset, limit, sortBy, filters),
 
     // Справочники
     getMicroscopes:    ()                          => call('get_microscopes'),
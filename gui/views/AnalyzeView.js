@@ -1,3 +1,6 @@
+const CONTOURS_PAGE = 100;
+const ANALYSIS_WORKERS = 0;  // процессов анализа, 0 — по числу ядер
+
 window.AnalyzeView = {
   template: `
     <div>
@@ -30,6 +33,9 @@ window.AnalyzeView = {
             </tr>
           </tbody>
         </table>
+        <button v-if="loadNextCursor" class="btn btn-sm btn-outline-secondary" @click="fetchMoreLoadResearches">
+          Показать ещё ({{ loadResearches.length }} из {{ loadTotalCount }})
+        </button>
         <div class="d-flex col-md-6 justify-content-end mt-2 ms-auto">
           <button class="btn flex-fill btn-danger me-1"
                   :disabled="!selectedResearchRow" @click="deleteLoadResearch">Удалить</button>
@@ -62,7 +68,7 @@ window.AnalyzeView = {
           <div class="col-md-6">
             <label class="form-label">Калибровка:</label>
             <select v-model="$root.analyzeSelectedCalibration" class="form-select"
-                    :disabled="isCalibrationSelectDisabled">
+                    :disabled="isCalibrationSelectDisabled" @change="remeasure">
               <option :value="null" disabled>{{ calibrationPlaceholder }}</option>
               <option v-for="c in availableCalibrations" :key="c.id" :value="c">
                 {{ c.name }} (k={{ c.coefficient }})
@@ -81,21 +87,37 @@ window.AnalyzeView = {
             <h6>Список файлов:</h6>
             <ul class="list-group text-center mb-3">
               <li v-for="file in files" :key="file.name"
-                  class="list-group-item"
+                  class="list-group-item d-flex align-items-center"
                   :class="{ active: file === currentFile }"
                   style="cursor:pointer;user-select:none;"
                   @click="selectFile(file)">
-                {{ file.name.split('.')[0] }}
+                <img v-if="file.thumb" :src="file.thumb" loading="lazy" class="me-2"
+                     style="width:40px;height:40px;object-fit:cover;">
+                <span class="flex-fill">{{ file.name.split('.')[0] }}</span>
               </li>
             </ul>
             <div class="d-flex mb-3">
               <button class="btn flex-fill btn-danger me-1"
                       :disabled="!currentFile" @click="deleteCurrentFile">Удалить</button>
-              <button class="btn flex-fill btn-success ms-1"
+              <button v-if="!busy" class="btn flex-fill btn-success ms-1"
                       :disabled="isAnalyzeButtonDisabled" @click="analyzeAllFiles">
-                {{ busy ? 'Анализ...' : 'Анализировать' }}
+                Анализировать
+              </button>
+              <button v-else class="btn flex-fill btn-warning ms-1"
+                      :disabled="!jobId" @click="cancelJob">
+                Остановить
               </button>
             </div>
+            <div v-if="busy" class="mb-3">
+              <div class="progress mb-1" style="height:6px;">
+                <div class="progress-bar" :style="{ width: progressPercent + '%' }"></div>
+              </div>
+              <div class="small text-muted text-truncate">
+                {{ busyKind === 'import' ? 'Импорт' : 'Анализ' }} {{ progress.done }}/{{ progress.total || files.length }}
+                <span v-if="progress.current">— {{ progress.current }}</span>
+                <span v-if="progress.found">, частиц: {{ progress.found }}</span>
+              </div>
+            </div>
           </div>
 
           <!-- Превью -->
@@ -112,20 +134,44 @@ window.AnalyzeView = {
                 {{ folderNames[folder] }}
               </button>
             </div>
+            <div v-if="folderButtonStates.contours" class="form-check form-switch align-self-start mb-2">
+              <input class="form-check-input" type="checkbox" id="analyzeShowOverlay" v-model="showOverlay">
+              <label class="form-check-label small" for="analyzeShowOverlay">Контуры поверх исходника</label>
+            </div>
 
             <!-- Картинка -->
             <div class="img-thumbnail d-flex justify-content-center align-items-center mb-3"
                  style="width:400px;height:386px;background:#f8f9fa;cursor:pointer;"
                  @click="openModal">
-              <img v-if="currentImage" :src="currentImage"
-                   style="max-width:100%;max-height:100%;object-fit:contain;">
+              <div v-if="currentImage" class="overlay-frame">
+                <img :src="currentImage">
+                <!-- Оверлей в координатах исходника; meet совпадает с object-fit:contain -->
+                <svg v-if="overlayVisible" class="particle-overlay"
+                     :viewBox="'0 0 ' + overlay.width + ' ' + overlay.height"
+                     preserveAspectRatio="xMidYMid meet">
+                  <g v-for="p in overlay.particles" :key="p.number"
+                     :class="{ highlighted: p.number === highlighted }"
+                     @mouseenter="highlighted = p.number" @mouseleave="highlighted = null">
+                    <polygon :points="p.svgPoints"></polygon>
+                    <text :x="p.cx" :y="p.cy" :font-size="overlay.fontSize">{{ p.number }}</text>
+                  </g>
+                </svg>
+              </div>
               <div v-else-if="imageLoading" class="text-muted small">Загрузка...</div>
               <span v-else class="text-muted">Нет изображения</span>
             </div>
 
-            <!-- Загрузка файлов с диска -->
+            <!-- Загрузка файлов с диска: по путям через нативный диалог,
+                 <input> остаётся для перетаскивания файлов -->
             <div class="mb-3" style="width:400px;" v-if="isDefaultMicroscope">
-              <input type="file" accept="image/*" multiple @change="handleFileSelect" class="form-control">
+              <div class="d-flex mb-2">
+                <button class="btn btn-outline-primary flex-fill me-1"
+                        :disabled="busy" @click="importFromDialog(false)">Добавить файлы</button>
+                <button class="btn btn-outline-primary flex-fill ms-1"
+                        :disabled="busy" @click="importFromDialog(true)">Добавить папку</button>
+              </div>
+              <input type="file" accept="image/*" multiple @change="handleFileSelect" class="form-control"
+                     title="Перетащите файлы сюда">
             </div>
             <!-- Кнопки для подключённого микроскопа -->
             <div class="d-flex mb-3" style="width:400px;" v-if="!isDefaultMicroscope">
@@ -138,17 +184,38 @@ window.AnalyzeView = {
           <!-- Результаты -->
           <div class="col-md-5">
             <h6>Результаты анализа:</h6>
-            <div v-if="$root.results.length > 0">
-              <div style="max-height:265px;overflow-y:auto;">
+            <div v-if="$root.resultsCount > 0">
+              <div class="d-flex align-items-center gap-1 mb-1">
+                <select v-model="rangeFilter.column" class="form-select form-select-sm" style="width:auto;">
+                  <option v-for="col in tableColumns.slice(1)" :key="col.key" :value="col.key">{{ col.title }}</option>
+                </select>
+                <input type="number" step="any" v-model="rangeFilter.min" class="form-control form-control-sm"
+                       style="width:80px;" placeholder="от" @keyup.enter="applyRangeFilter">
+                <input type="number" step="any" v-model="rangeFilter.max" class="form-control form-control-sm"
+                       style="width:80px;" placeholder="до" @keyup.enter="applyRangeFilter">
+                <button class="btn btn-sm btn-outline-secondary" @click="applyRangeFilter">Фильтр</button>
+                <button class="btn btn-sm btn-outline-secondary" :disabled="!tableFilters"
+                        @click="resetRangeFilter">×</button>
+              </div>
+              <div class="small text-muted mb-1">
+                Показано {{ table.rows.length }} из {{ table.total }}<span
+                  v-if="table.total !== $root.resultsCount"> (всего {{ $root.resultsCount }})</span>
+              </div>
+              <div ref="resultsTable" style="max-height:265px;overflow-y:auto;" @scroll="onTableScroll">
                 <table class="table table-sm table-bordered">
-                  <thead class="table-light">
+                  <thead class="table-light" style="position:sticky;top:0;">
                     <tr>
-                      <th>№</th><th>Периметр</th><th>Площадь</th>
-                      <th>Ширина</th><th>Длина</th><th>ДЭК</th>
+                      <th v-for="col in tableColumns" :key="col.key"
+                          style="cursor:pointer;" @click="sortTable(col.key)">
+                        {{ col.title }}<span v-if="tableSort.by === col.key">{{ tableSort.descending ? ' ▼' : ' ▲' }}</span>
+                      </th>
                     </tr>
                   </thead>
                   <tbody>
-                    <tr v-for="r in $root.results" :key="r.contour_number">
+                    <tr v-for="r in table.rows" :key="r.contour_number"
+                        :class="{ 'table-warning': r.contour_number === highlighted }"
+                        style="cursor:pointer;"
+                        @click="highlighted = r.contour_number">
                       <td>{{ r.contour_number }}</td>
                       <td>{{ r.perimeter.toFixed(2) }}</td>
                       <td>{{ r.area.toFixed(2) }}</td>
@@ -187,8 +254,18 @@ window.AnalyzeView = {
             <div class="modal-content bg-dark">
               <div class="modal-body d-flex justify-content-center align-items-center"
                    @click="closeModal" style="cursor:pointer;">
-                <img v-if="currentImage" :src="currentImage"
-                     style="max-width:100%;max-height:100%;object-fit:contain;">
+                <div v-if="modalImage" class="overlay-frame">
+                  <img :src="modalImage">
+                  <svg v-if="overlayVisible" class="particle-overlay"
+                       :viewBox="'0 0 ' + overlay.width + ' ' + overlay.height"
+                       preserveAspectRatio="xMidYMid meet">
+                    <g v-for="p in overlay.particles" :key="p.number"
+                       :class="{ highlighted: p.number === highlighted }">
+                      <polygon :points="p.svgPoints"></polygon>
+                      <text :x="p.cx" :y="p.cy" :font-size="overlay.fontSize">{{ p.number }}</text>
+                    </g>
+                  </svg>
+                </div>
               </div>
             </div>
           </div>
@@ -207,6 +284,8 @@ window.AnalyzeView = {
 
       isResearchLoadVisible: false,
       loadResearches:        [],
+      loadNextCursor:        null,
+      loadTotalCount:        0,
       selectedResearchRow:   null,
 
       files:             [],
@@ -217,11 +296,34 @@ window.AnalyzeView = {
       folderNames: { sources: 'Исходные', contrasted: 'Контраст', contours: 'Контуры', analyzed: 'Результат' },
       selectedFolder: 'sources',
 
-      currentImage:  '',
+      currentImage:  '',  // уменьшенная копия для окна превью
+      modalImage:    '',  // полный кадр для полноэкранного просмотра
       imageLoading:  false,
-      imageCache:    {},  // { 'filename': { 'folder': 'data:image/jpeg;base64,...' } }
+      imageCache:    {},  // { 'filename': { 'folder': 'http://127.0.0.1:.../file.jpg?v=...' } }
+
+      overlay:       null,  // контуры и номера текущего файла, см. loadOverlay
+      overlayCache:  {},    // { 'filename': overlay }
+      showOverlay:   true,
+      highlighted:   null,  // номер подсвеченной частицы
+
+      // Таблица частиц: страницы по CONTOURS_PAGE строк с сервера, дальше — по прокрутке
+      table:        { rows: [], total: 0, loading: false, request: 0 },
+      tableSort:    { by: 'contour_number', descending: false },
+      tableFilters: null,  // { столбец: [от, до] } для get_contours_page
+      rangeFilter:  { column: 'dek', min: '', max: '' },
+      tableColumns: [
+        { key: 'contour_number', title: '№' },
+        { key: 'perimeter',      title: 'Периметр' },
+        { key: 'area',           title: 'Площадь' },
+        { key: 'width',          title: 'Ширина' },
+        { key: 'length',         title: 'Длина' },
+        { key: 'dek',            title: 'ДЭК' },
+      ],
 
       busy:     false,
+      busyKind: '',  // 'analysis' | 'import'
+      jobId:    null,
+      progress: { done: 0, total: 0, current: '', found: 0 },
       errorMsg: '',
     };
   },
@@ -243,11 +345,19 @@ window.AnalyzeView = {
       return this.files.length === 0 || !this.$root.analyzeSelectedCalibration || !this.selectedMicroscope || this.busy;
     },
     isSaveButtonDisabled() {
-      return this.$root.results.length === 0;
+      return this.$root.resultsCount === 0 || this.busy;
+    },
+    progressPercent() {
+      const total = this.progress.total || this.files.length;
+      return total ? Math.round(100 * this.progress.done / total) : 0;
+    },
+    // Векторный оверлей рисуется только поверх исходника
+    overlayVisible() {
+      return this.showOverlay && !!this.overlay && this.selectedFolder === 'sources';
     },
     folderButtonStates() {
       const hasFiles   = this.files.length > 0;
-      const hasResults = this.$root.results.length > 0;
+      const hasResults = this.$root.resultsCount > 0;
       return {
         sources:    hasFiles,
         contrasted: hasResults,
@@ -285,6 +395,10 @@ window.AnalyzeView = {
     '$root.currentTab'(tab) {
       if (tab === 'analyze') this.fetchCalibrations();
     },
+    // Новые результаты (анализ, пересчёт, загрузка) — таблица с первой страницы
+    '$root.resultsVersion'() {
+      this.fetchRows();
+    },
     // При смене микроскопа сбрасываем калибровку
     selectedMicroscope(newVal, oldVal) {
       if (newVal !== oldVal) this.$root.analyzeSelectedCalibration = null;
@@ -305,8 +419,7 @@ window.AnalyzeView = {
       if (!res.ok) { this.errorMsg = 'Ошибка создания нового исследования.'; return; }
       this.$root.selectedResearch           = null;
       this.$root.analyzeSelectedCalibration = null;
-      this.$root.results                    = [];
-      this.$root.averages                   = {};
+      this.$root.setResults();
       this.$root.analyzeResetKey++;
     },
 
@@ -317,8 +430,19 @@ window.AnalyzeView = {
     },
 
     async fetchLoadResearches() {
-      const res = await api.getResearches();
-      if (res.ok) this.loadResearches = res.researches;
+      const res = await api.getResearchesPage();
+      if (!res.ok) return;
+      this.loadResearches = res.researches;
+      this.loadNextCursor = res.next_cursor;
+      this.loadTotalCount = res.total_count;
+    },
+
+    async fetchMoreLoadResearches() {
+      const res = await api.getResearchesPage(50, this.loadNextCursor);
+      if (!res.ok) return;
+      this.loadResearches = this.loadResearches.concat(res.researches);
+      this.loadNextCursor = res.next_cursor;
+      this.loadTotalCount = res.total_count;
     },
 
     async doLoadResearch(r) {
@@ -326,14 +450,13 @@ window.AnalyzeView = {
       if (!res.ok) { this.errorMsg = 'Не удалось загрузить исследование.'; return; }
       const research = res.research;
       this.$root.selectedResearch = research;
-      this.$root.results          = research.contours || [];
-      this.$root.averages         = {
+      this.$root.setResults(research.contour_count, {
         perimeter: research.average_perimeter,
         area:      research.average_area,
         width:     research.average_width,
         length:    research.average_length,
         dek:       research.average_dek,
-      };
+      }, research.id);
       this.$root.analyzeSelectedCalibration = research.calibration_id
         ? { id: research.calibration_id }
         : null;
@@ -377,6 +500,8 @@ window.AnalyzeView = {
 
       // Загружаем файлы текущей сессии
       this.imageCache   = {};
+      this.overlayCache = {};
+      this.overlay      = null;
       this.currentImage = '';
       this.files        = [];
       this.currentFile  = null;
@@ -384,9 +509,10 @@ window.AnalyzeView = {
 
       const listRes = await api.listImages('research');
       if (listRes.ok && listRes.files.length > 0) {
-        this.files = listRes.files.map(n => ({ name: n }));
+        this.files = listRes.files.map(n => ({ name: n, thumb: '' }));
+        this.files.forEach(f => this.loadThumb(f));
         this.lastUsedIndex = Math.max(...this.files.map(f => parseInt(f.name) || 0));
-        const hasResults = this.$root.results.length > 0;
+        const hasResults = this.$root.resultsCount > 0;
         this.selectedFolder = hasResults ? 'analyzed' : 'sources';
         await this.selectFile(this.files[0]);
       }
@@ -411,7 +537,8 @@ window.AnalyzeView = {
         const b64  = await this._readAsBase64(file);
         const res  = await api.uploadImage(name, b64, 'research');
         if (res.ok) {
-          this.files.push({ name });
+          this.files.push({ name, thumb: '' });
+          this.loadThumb(this.files[this.files.length - 1]);
         }
       }
       if (!this.currentFile && this.files.length > 0) {
@@ -420,8 +547,54 @@ window.AnalyzeView = {
       event.target.value = '';
     },
 
+    // Импорт по путям на диске: файлы не проходят через мост целиком
+    async importFromDialog(folder) {
+      this.errorMsg = '';
+      const start = await api.importImagesDialog(folder);
+      if (!start.ok) {
+        this.errorMsg = start.error || 'Не удалось импортировать файлы.';
+        return;
+      }
+      if (!start.job_id) return;  // диалог закрыт без выбора
+
+      this.busy     = true;
+      this.busyKind = 'import';
+      this.jobId    = start.job_id;
+      this.progress = { done: 0, total: 0, current: '' };
+      const res = await api.waitJob(this.jobId, status => {
+        this.progress = { done: status.done, total: status.total, current: status.current };
+      });
+      this.busy     = false;
+      this.busyKind = '';
+      this.jobId    = null;
+
+      if (res.state === 'error' || !res.ok) {
+        this.errorMsg = 'Ошибка импорта файлов.';
+      } else if (res.state === 'cancelled') {
+        this.errorMsg = `Импорт остановлен после ${res.done} из ${res.total} файлов.`;
+      }
+      // Список перечитывается и после отмены — часть файлов уже в сессии
+      await this.refreshFiles();
+    },
+
+    async refreshFiles() {
+      const listRes = await api.listImages('research');
+      if (!listRes.ok) return;
+      const known = new Set(this.files.map(f => f.name));
+      for (const name of listRes.files) {
+        if (known.has(name)) continue;
+        this.files.push({ name, thumb: '' });
+        this.loadThumb(this.files[this.files.length - 1]);
+        this.lastUsedIndex = Math.max(this.lastUsedIndex, parseInt(name) || 0);
+      }
+      if (!this.currentFile && this.files.length > 0) {
+        await this.selectFile(this.files[0]);
+      }
+    },
+
     async selectFile(file) {
       this.currentFile = file;
+      this.loadOverlay(file.name);
       await this.loadImage(file.name, this.selectedFolder);
     },
 
@@ -438,6 +611,14 @@ window.AnalyzeView = {
         const idx = this.files.indexOf(this.currentFile);
         this.files.splice(idx, 1);
         delete this.imageCache[this.currentFile.name];
+        delete this.overlayCache[this.currentFile.name];
+        if (res.results) {
+          // Частицы файла убраны из результата, номера следующих сдвинулись
+          this.$root.setResults(res.results.count, res.results.averages);
+          this.dropProcessedImageUrls();
+        } else if (res.error) {
+          this.errorMsg = res.error;
+        }
         if (this.files.length > 0) {
           await this.selectFile(this.files[Math.min(idx, this.files.length - 1)]);
         } else {
@@ -461,7 +642,7 @@ window.AnalyzeView = {
       }
       this.imageLoading = true;
       this.currentImage = '';
-      const res = await api.getImage(filename, folder, 'research');
+      const res = await api.getImage(filename, folder, 'research', 'preview');
       this.imageLoading = false;
       if (res.ok && res.data) {
         if (!this.imageCache[filename]) this.imageCache[filename] = {};
@@ -470,6 +651,40 @@ window.AnalyzeView = {
       }
     },
 
+    async loadThumb(file) {
+      const res = await api.getImage(file.name, 'sources', 'research', 'thumb');
+      if (res.ok) file.thumb = res.data;
+    },
+
+    dropProcessedImageUrls() {
+      for (const name in this.imageCache) {
+        this.imageCache[name] = { sources: this.imageCache[name].sources };
+      }
+      this.overlayCache = {};
+      this.overlay      = null;
+    },
+
+    async loadOverlay(filename) {
+      this.overlay = null;
+      if (!this.$root.resultsCount) return;
+      let overlay = this.overlayCache[filename];
+      if (!overlay) {
+        const res = await api.getOverlay(filename);
+        if (res.ok && res.fallback && this.currentFile?.name === filename && this.selectedFolder === 'sources') {
+          // Оверлей не совпал с измерениями — номера берём с готовой картинки
+          await this.changeFolder('analyzed');
+        }
+        if (!res.ok || !res.overlay) return;
+        overlay = res.overlay;
+        for (const p of overlay.particles) p.svgPoints = p.points.map(pt => pt.join(',')).join(' ');
+        overlay.fontSize = Math.max(overlay.width, overlay.height) / 60;
+        // Тысячи точек не нужно делать реактивными
+        overlay = Object.freeze(overlay);
+        this.overlayCache[filename] = overlay;
+      }
+      if (this.currentFile?.name === filename) this.overlay = overlay;
+    },
+
     _readAsBase64(file) {
       return new Promise(resolve => {
         const reader = new FileReader();
@@ -483,12 +698,32 @@ window.AnalyzeView = {
     // ------------------------------------------------------------------
     async analyzeAllFiles() {
       this.busy     = true;
+      this.busyKind = 'analysis';
       this.errorMsg = '';
-      const res = await api.executeResearch(this.$root.analyzeSelectedCalibration?.id || 0);
-      this.busy = false;
-      if (res.ok) {
-        this.$root.results  = res.contours;
-        this.$root.averages = res.averages;
+      this.progress = { done: 0, total: this.files.length, current: '', found: 0 };
+      this.$root.setResults();
+
+      // Промежуточные картинки строятся по запросу, при просмотре (lazy).
+      // Частицы не копятся ни в задаче, ни в UI (streaming): таблица
+      // запрашивает их страницами, когда анализ закончен
+      const start = await api.startResearch(
+        this.$root.analyzeSelectedCalibration?.id || 0, ANALYSIS_WORKERS, true, null, true);
+      if (!start.ok) {
+        this.busy     = false;
+        this.errorMsg = 'Не удалось запустить анализ.';
+        return;
+      }
+      this.jobId = start.job_id;
+
+      const res = await api.waitJob(this.jobId, status => {
+        this.progress = { done: status.done, total: status.total, current: status.current, found: status.found };
+      });
+      this.busy     = false;
+      this.busyKind = '';
+      this.jobId    = null;
+
+      if (res.ok && res.state === 'done') {
+        this.$root.setResults(res.result.count, res.result.averages);
         this.$root.selectedResearch = {
           id:             this.researchId,
           name:           this.name,
@@ -497,48 +732,138 @@ window.AnalyzeView = {
           calibration_id: this.$root.analyzeSelectedCalibration?.id || 0,
           date:           new Date().toISOString(),
         };
-        // Очищаем кеш analyzed-папки и показываем результат
-        for (const f of this.files) {
-          if (this.imageCache[f.name]) delete this.imageCache[f.name]['analyzed'];
+        // Промежуточные картинки перезаписаны — их URL сменили версию
+        this.dropProcessedImageUrls();
+        // С оверлеем номера рисует UI — готовый analyzed/ не нужен
+        this.selectedFolder = this.showOverlay ? 'sources' : 'analyzed';
+        if (this.currentFile) {
+          this.loadOverlay(this.currentFile.name);
+          await this.loadImage(this.currentFile.name, this.selectedFolder);
         }
-        this.selectedFolder = 'analyzed';
-        if (this.currentFile) await this.loadImage(this.currentFile.name, 'analyzed');
+      } else if (res.state === 'cancelled') {
+        this.dropProcessedImageUrls();
+        this.errorMsg = `Анализ остановлен после ${res.done} из ${res.total} файлов.`;
       } else {
         this.errorMsg = 'Ошибка выполнения анализа.';
       }
     },
 
+    // ------------------------------------------------------------------
+    // Таблица частиц
+    // ------------------------------------------------------------------
+    // Первая страница по текущей сортировке и фильтру; дальше — fetchMoreRows
+    async fetchRows() {
+      const request = ++this.table.request;
+      if (!this.$root.resultsCount) {
+        this.table.rows    = [];
+        this.table.total   = 0;
+        this.table.loading = false;
+        return;
+      }
+      this.table.loading = true;
+      const res = await this.fetchRowsPage(0);
+      if (request !== this.table.request) return;  // таблицу уже перезапросили
+      this.table.loading = false;
+      if (!res.ok) { this.errorMsg = res.error || 'Не удалось загрузить частицы.'; return; }
+      // Строки только дописываются — реактивность им не нужна
+      this.table.rows  = Object.freeze(res.contours);
+      this.table.total = res.total;
+      if (this.$refs.resultsTable) this.$refs.resultsTable.scrollTop = 0;
+    },
+
+    async fetchMoreRows() {
+      if (this.table.loading || this.table.rows.length >= this.table.total) return;
+      const request = this.table.request;
+      this.table.loading = true;
+      const res = await this.fetchRowsPage(this.table.rows.length);
+      if (request !== this.table.request) return;
+      this.table.loading = false;
+      if (res.ok) this.table.rows = Object.freeze(this.table.rows.concat(res.contours));
+    },
+
+    fetchRowsPage(offset) {
+      const sortBy = (this.tableSort.descending ? '-' : '') + this.tableSort.by;
+      return api.getContoursPage(this.$root.resultsResearchId, offset, CONTOURS_PAGE, sortBy, this.tableFilters);
+    },
+
+    onTableScroll(event) {
+      const el = event.target;
+      if (el.scrollTop + el.clientHeight >= el.scrollHeight - 40) this.fetchMoreRows();
+    },
+
+    sortTable(key) {
+      if (this.tableSort.by === key) {
+        this.tableSort.descending = !this.tableSort.descending;
+      } else {
+        this.tableSort = { by: key, descending: key !== 'contour_number' };
+      }
+      this.fetchRows();
+    },
+
+    applyRangeFilter() {
+      const { column, min, max } = this.rangeFilter;
+      const lo = min === '' || min === null ? null : Number(min);
+      const hi = max === '' || max === null ? null : Number(max);
+      this.tableFilters = lo === null && hi === null ? null : { [column]: [lo, hi] };
+      this.fetchRows();
+    },
+
+    resetRangeFilter() {
+      this.rangeFilter.min = '';
+      this.rangeFilter.max = '';
+      this.tableFilters    = null;
+      this.fetchRows();
+    },
+
+    async cancelJob() {
+      if (this.jobId) await api.cancelJob(this.jobId);
+    },
+
+    // Смена калибровки при готовых результатах — пересчёт без повторного анализа
+    async remeasure() {
+      const cal = this.$root.analyzeSelectedCalibration;
+      if (!cal || this.busy || this.$root.resultsCount === 0) return;
+      // Строки таблицы — страницами через get_contours_page
+      const res = await api.remeasureResearch(cal.id, true);
+      if (!res.ok) {
+        this.errorMsg = res.error || 'Калибровка изменена: запустите анализ повторно.';
+        return;
+      }
+      this.errorMsg       = '';
+      this.$root.setResults(res.count, res.averages);
+      if (this.$root.selectedResearch) this.$root.selectedResearch.calibration_id = cal.id;
+    },
+
     // ------------------------------------------------------------------
     // Сохранение
     // ------------------------------------------------------------------
     async saveResearch() {
       this.errorMsg = '';
+      // Контуры и средние не передаются: сервер сохраняет результат анализа из сессии
       const res = await api.saveResearch({
-        id:               this.researchId,
-        name:             this.name,
-        employee:         this.employee,
-        microscope:       this.selectedMicroscope?.name || '',
-        calibration_id:   this.$root.analyzeSelectedCalibration?.id || 0,
-        average_perimeter: this.$root.averages.perimeter,
-        average_area:      this.$root.averages.area,
-        average_width:     this.$root.averages.width,
-        average_length:    this.$root.averages.length,
-        average_dek:       this.$root.averages.dek,
-        contours:          this.$root.results,
+        id:             this.researchId,
+        name:           this.name,
+        employee:       this.employee,
+        microscope:     this.selectedMicroscope?.name || '',
+        calibration_id: this.$root.analyzeSelectedCalibration?.id || 0,
       });
       if (res.ok) {
         this.researchId = res.id;
+        // Те же частицы теперь лежат в БД — версию результатов не меняем
+        this.$root.resultsResearchId = res.id;
         if (this.$root.selectedResearch) this.$root.selectedResearch.id = res.id;
       } else {
-        this.errorMsg = 'Ошибка сохранения исследования.';
+        this.errorMsg = res.error || 'Ошибка сохранения исследования.';
       }
     },
 
     // ------------------------------------------------------------------
     // Модальное окно
     // ------------------------------------------------------------------
-    openModal() {
-      if (!this.currentImage) return;
+    async openModal() {
+      if (!this.currentImage || !this.currentFile) return;
+      const res = await api.getImage(this.currentFile.name, this.selectedFolder, 'research');
+      this.modalImage = res.ok ? res.data : this.currentImage;
       new bootstrap.Modal(document.getElementById('analyzeImageModal')).show();
     },
     closeModal() {
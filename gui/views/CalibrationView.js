@@ -232,10 +232,11 @@ window.CalibrationView = {
     async runCalibration() {
       this.busy = true;
       this.errorMsg = '';
-      const res = await api.executeCalibration();
+      const start = await api.startCalibration();
+      const res   = start.ok ? await api.waitJob(start.job_id) : start;
       this.busy = false;
-      if (res.ok) {
-        this.calibCoefficient = parseFloat(res.coefficient).toFixed(3);
+      if (res.ok && res.state === 'done') {
+        this.calibCoefficient = parseFloat(res.result.coefficient).toFixed(3);
         for (const fname of ['contrasted.jpg', 'contours.jpg', 'calibrated.jpg']) {
           this.calibFileExists[fname] = true;
           await this._loadImage(fname);
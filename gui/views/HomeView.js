@@ -3,46 +3,85 @@ window.HomeView = {
     <div>
       <div class="d-flex justify-content-between align-items-center mb-3 mt-2">
         <h5 class="mb-0">Исследования</h5>
-        <button class="btn btn-primary btn-sm" @click="newResearch">+ Новое исследование</button>
+        <div class="d-flex">
+          <input type="search" v-model="searchQuery" class="form-control form-control-sm me-2"
+                 style="width:16rem;" placeholder="Поиск: название, сотрудник..." @input="onSearchInput">
+          <button class="btn btn-primary btn-sm text-nowrap" @click="newResearch">+ Новое исследование</button>
+        </div>
+      </div>
+
+      <!-- Фильтры истории (при поиске не применяются) -->
+      <div v-if="!searchQuery.trim()" class="row g-2 mb-2">
+        <div class="col-md-3">
+          <input type="text" v-model.trim="filters.employee" class="form-control form-control-sm"
+                 placeholder="Сотрудник" @change="fetchResearches">
+        </div>
+        <div class="col-md-2">
+          <select v-model="filters.microscope" class="form-select form-select-sm" @change="fetchResearches">
+            <option :value="null">Все микроскопы</option>
+            <option v-for="m in $root.microscopes" :key="m.name" :value="m.name">{{ m.name }}</option>
+          </select>
+        </div>
+        <div class="col-md-3">
+          <select v-model="filters.calibration_id" class="form-select form-select-sm" @change="fetchResearches">
+            <option :value="null">Все калибровки</option>
+            <option v-for="c in calibrations" :key="c.id" :value="c.id">{{ c.name }}</option>
+          </select>
+        </div>
+        <div class="col-md-2">
+          <input type="date" v-model="filters.date_from" class="form-control form-control-sm"
+                 title="С даты" @change="fetchResearches">
+        </div>
+        <div class="col-md-2">
+          <input type="date" v-model="filters.date_to" class="form-control form-control-sm"
+                 title="По дату" @change="fetchResearches">
+        </div>
       </div>
 
       <div v-if="loading" class="text-muted">Загрузка...</div>
 
       <div v-else-if="researches.length === 0" class="text-muted fst-italic">
-        Нет сохранённых исследований.
+        {{ searchQuery.trim() || Object.keys(activeFilters()).length
+           ? 'Ничего не найдено.' : 'Нет сохранённых исследований.' }}
       </div>
 
-      <table v-else class="table table-hover table-sm align-middle">
-        <thead class="table-light">
-          <tr>
-            <th>#</th>
-            <th>Название</th>
-            <th>Сотрудник</th>
-            <th>Микроскоп</th>
-            <th>Дата</th>
-            <th class="text-end">Ср. ДЭК</th>
-            <th class="text-end">Ср. периметр</th>
-            <th class="text-end">Ср. площадь</th>
-            <th></th>
-          </tr>
-        </thead>
-        <tbody>
-          <tr v-for="r in researches" :key="r.id">
-            <td class="text-muted">{{ r.id }}</td>
-            <td>{{ r.name }}</td>
-            <td>{{ r.employee }}</td>
-            <td>{{ r.microscope }}</td>
-            <td>{{ $root.formatDate(r.date) }}</td>
-            <td class="text-end">{{ r.average_dek }}</td>
-            <td class="text-end">{{ r.average_perimeter }}</td>
-            <td class="text-end">{{ r.average_area }}</td>
-            <td class="text-end text-nowrap">
-              <button class="btn btn-sm btn-outline-primary me-1" @click="loadResearch(r.id)">Открыть</button>
-              <button class="btn btn-sm btn-outline-danger"       @click="deleteResearch(r.id)">Удалить</button>
-            </td>
-          </tr>
-        </tbody>
-      </table>
+      <template v-else>
+        <table class="table table-hover table-sm align-middle">
+          <thead class="table-light">
+            <tr>
+              <th v-for="col in columns" :key="col.key" :class="col.cls"
+                  style="cursor:pointer;" @click="sortBy(col.key)">
+                {{ col.title }}<span v-if="sort.by === col.key">{{ sort.descending ? ' ▼' : ' ▲' }}</span>
+              </th>
+              <th>Ср. периметр</th>
+              <th>Ср. площадь</th>
+              <th></th>
+            </tr>
+          </thead>
+          <tbody>
+            <tr v-for="r in researches" :key="r.id">
+              <td class="text-muted">{{ r.id }}</td>
+              <td>{{ r.name }}</td>
+              <td>{{ r.employee }}</td>
+              <td>{{ r.microscope }}</td>
+              <td>{{ $root.formatDate(r.date) }}</td>
+              <td class="text-end">{{ r.average_dek }}</td>
+              <td class="text-end">{{ r.average_perimeter }}</td>
+              <td class="text-end">{{ r.average_area }}</td>
+              <td class="text-end text-nowrap">
+                <button class="btn btn-sm btn-outline-primary me-1" @click="loadResearch(r.id)">Открыть</button>
+                <button class="btn btn-sm btn-outline-danger"       @click="deleteResearch(r.id)">Удалить</button>
+              </td>
+            </tr>
+          </tbody>
+        </table>
+
+        <div class="d-flex justify-content-between align-items-center">
+          <span class="text-muted small">Показано {{ researches.length }} из {{ totalCount }}</span>
+          <button v-if="nextCursor" class="btn btn-sm btn-outline-secondary"
+                  :disabled="loadingMore" @click="fetchMore">Показать ещё</button>
+        </div>
+      </template>
 
       <div v-if="errorMsg" class="alert alert-danger mt-2">{{ errorMsg }}</div>
     </div>
@@ -50,35 +89,124 @@ window.HomeView = {
 
   data() {
     return {
-      researches: [],
-      loading:    true,
-      errorMsg:   '',
+      researches:   [],
+      nextCursor:   null,
+      totalCount:   0,
+      loading:      true,
+      loadingMore:  false,
+      errorMsg:     '',
+      calibrations: [],
+      filters: {
+        employee:       '',
+        microscope:     null,
+        calibration_id: null,
+        date_from:      '',
+        date_to:        '',
+      },
+      sort: { by: 'date', descending: true },
+      searchQuery:  '',
+      searchTimer:  null,
+      columns: [
+        { key: 'id',          title: '#' },
+        { key: 'name',        title: 'Название' },
+        { key: 'employee',    title: 'Сотрудник' },
+        { key: 'microscope',  title: 'Микроскоп' },
+        { key: 'date',        title: 'Дата' },
+        { key: 'average_dek', title: 'Ср. ДЭК', cls: 'text-end' },
+      ],
     };
   },
 
   mounted() {
     this.fetchResearches();
+    this.fetchCalibrations();
   },
 
   watch: {
     '$root.currentTab'(tab) {
-      if (tab === 'home') this.fetchResearches();
+      if (tab === 'home') {
+        this.fetchResearches();
+        this.fetchCalibrations();
+      }
     },
   },
 
   methods: {
+    // Первая страница по текущим фильтрам и сортировке; дальше — fetchMore
     async fetchResearches() {
+      if (this.searchQuery.trim()) return this.search();
       this.loading  = true;
       this.errorMsg = '';
-      const res = await api.getResearches();
+      const res = await this.fetchPage(null);
       if (res.ok) {
         this.researches = res.researches;
+      }
+      this.loading = false;
+    },
+
+    async fetchMore() {
+      this.loadingMore = true;
+      const res = await this.fetchPage(this.nextCursor);
+      if (res.ok) {
+        this.researches = this.researches.concat(res.researches);
+      }
+      this.loadingMore = false;
+    },
+
+    async fetchPage(cursor) {
+      const res = await api.getResearchesPage(
+        50, cursor, this.sort.by, this.sort.descending, this.activeFilters(),
+      );
+      if (res.ok) {
+        this.nextCursor = res.next_cursor;
+        this.totalCount = res.total_count;
       } else {
         this.errorMsg = 'Не удалось загрузить список исследований.';
       }
+      return res;
+    },
+
+    onSearchInput() {
+      clearTimeout(this.searchTimer);
+      this.searchTimer = setTimeout(() => this.fetchResearches(), 200);
+    },
+
+    async search() {
+      const query = this.searchQuery.trim();
+      const res = await api.searchHistory(query, 50);
+      if (query !== this.searchQuery.trim()) return;  // ввод уже изменился
+      if (res.ok) {
+        this.researches = res.researches;
+        this.nextCursor = null;
+        this.totalCount = res.researches.length;
+      } else {
+        this.errorMsg = 'Ошибка поиска.';
+      }
       this.loading = false;
     },
 
+    activeFilters() {
+      const f = {};
+      for (const [key, value] of Object.entries(this.filters)) {
+        if (value !== null && value !== '') f[key] = value;
+      }
+      return f;
+    },
+
+    sortBy(key) {
+      if (this.sort.by === key) {
+        this.sort.descending = !this.sort.descending;
+      } else {
+        this.sort = { by: key, descending: key === 'date' || key === 'id' };
+      }
+      this.fetchResearches();
+    },
+
+    async fetchCalibrations() {
+      const res = await api.getCalibrations();
+      if (res.ok) this.calibrations = res.calibrations;
+    },
+
     async newResearch() {
       const res = await api.newResearch();
       if (!res.ok) { this.errorMsg = 'Ошибка создания нового исследования.'; return; }
@@ -86,8 +214,7 @@ window.HomeView = {
       // Сбрасываем общее состояние
       this.$root.selectedResearch           = null;
       this.$root.analyzeSelectedCalibration = null;
-      this.$root.results                    = [];
-      this.$root.averages                   = {};
+      this.$root.setResults();
       this.$root.analyzeResetKey++;
 
       this.$root.currentTab = 'analyze';
@@ -100,20 +227,19 @@ window.HomeView = {
       const r = res.research;
 
       this.$root.selectedResearch = r;
-      this.$root.results          = r.contours || [];
-      this.$root.averages         = {
+      this.$root.setResults(r.contour_count, {
         perimeter: r.average_perimeter,
         area:      r.average_area,
         width:     r.average_width,
         length:    r.average_length,
         dek:       r.average_dek,
-      };
+      }, r.id);
       this.$root.analyzeSelectedCalibration = r.calibration_id
         ? { id: r.calibration_id }
         : null;
 
       // Результаты есть — сразу открываем вкладку результатов
-      this.$root.currentTab = (r.contours && r.contours.length > 0) ? 'results' : 'analyze';
+      this.$root.currentTab = r.contour_count > 0 ? 'results' : 'analyze';
     },
 
     async deleteResearch(id) {
@@ -121,6 +247,7 @@ window.HomeView = {
       const res = await api.deleteResearch(id);
       if (res.ok) {
         this.researches = this.researches.filter(r => r.id !== id);
+        this.totalCount--;
       } else {
         this.errorMsg = 'Не удалось удалить исследование.';
       }
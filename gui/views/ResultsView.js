@@ -39,12 +39,25 @@ window.ResultsView = {
           </span>
         </h6>
 
-        <!-- Количество диапазонов -->
-        <div class="d-flex align-items-center mb-3 gap-2" style="max-width:260px;">
+        <!-- Количество диапазонов и шкала -->
+        <div class="d-flex align-items-center mb-3 gap-2" style="max-width:480px;">
           <label class="form-label mb-0 text-nowrap small">Диапазонов:</label>
           <input type="number" min="2" max="100" v-model.number="histogramBins"
                  class="form-control form-control-sm" style="width:80px;">
-          <button class="btn btn-sm btn-outline-secondary" @click="redrawAll">Обновить</button>
+          <select v-model="histogramScale" class="form-select form-select-sm" style="width:160px;"
+                  @change="redrawAll">
+            <option value="linear">Линейная шкала</option>
+            <option value="log">Логарифмическая</option>
+          </select>
+          <button class="btn btn-sm btn-outline-secondary" @click="fetchStats">Обновить</button>
+        </div>
+
+        <!-- D-значения распределения ДЭК -->
+        <div v-if="stats" class="small mb-3">
+          Частиц: <b>{{ stats.count }}</b>
+          <span class="ms-3">D10: <b>{{ stats.d_values.d10.toFixed(2) }}</b></span>
+          <span class="ms-3">D50: <b>{{ stats.d_values.d50.toFixed(2) }}</b></span>
+          <span class="ms-3">D90: <b>{{ stats.d_values.d90.toFixed(2) }}</b></span>
         </div>
 
         <div v-for="param in params" :key="param.key" class="border mb-3 bg-white">
@@ -57,6 +70,14 @@ window.ResultsView = {
               <span class="small text-muted ms-3">
                 Среднее: <b>{{ ($root.averages[param.key] ?? 0).toFixed(2) }}</b>
               </span>
+              <span v-if="stats" class="small text-muted ms-3">
+                σ: <b>{{ stats.metrics[param.key].std.toFixed(2) }}</b>
+                <span class="ms-2">Медиана: <b>{{ stats.metrics[param.key].percentiles.p50.toFixed(2) }}</b></span>
+                <span class="ms-2">
+                  P10–P90: <b>{{ stats.metrics[param.key].percentiles.p10.toFixed(2) }}
+                  – {{ stats.metrics[param.key].percentiles.p90.toFixed(2) }}</b>
+                </span>
+              </span>
             </span>
             <span style="font-size:1.4rem;">{{ visible[param.key] ? '▲' : '▼' }}</span>
           </div>
@@ -83,6 +104,10 @@ window.ResultsView = {
       visible: { perimeter: false, area: false, width: false, length: false, dek: false },
       toggleAllVisible: false,
       histogramBins:    20,
+      histogramScale:   'linear',
+      // Сводка и гистограммы с сервера (backend.stats); частицы для графиков не нужны
+      stats:            null,
+      statsDirty:       true,
     };
   },
 
@@ -95,8 +120,14 @@ window.ResultsView = {
   },
 
   watch: {
-    '$root.results'() {
-      this.$nextTick(() => this.redrawAll());
+    // Во время анализа результаты меняются часто — статистика
+    // запрашивается только когда вкладка результатов открыта
+    '$root.resultsVersion'() {
+      this.statsDirty = true;
+      if (this.$root.currentTab === 'results') this.fetchStats();
+    },
+    '$root.currentTab'(tab) {
+      if (tab === 'results' && this.statsDirty) this.fetchStats();
     },
   },
 
@@ -121,43 +152,29 @@ window.ResultsView = {
       });
     },
 
-    // ------------------------------------------------------------------
-    // Гистограмма
-    // ------------------------------------------------------------------
-    createBins(minVal, maxVal, numBins) {
-      if (minVal === maxVal) return [{ start: minVal, end: maxVal, label: minVal.toFixed(2) }];
-      const step = (maxVal - minVal) / numBins;
-      return Array.from({ length: numBins }, (_, i) => {
-        const start = minVal + i * step;
-        const end   = minVal + (i + 1) * step;
-        return { start, end, label: `${start.toFixed(2)} – ${end.toFixed(2)}` };
-      });
-    },
-
-    distributeToBins(data, bins) {
-      const counts = new Array(bins.length).fill(0);
-      for (const v of data) {
-        for (let i = 0; i < bins.length; i++) {
-          const { start, end } = bins[i];
-          const inBin = i < bins.length - 1 ? (v >= start && v < end) : (v >= start && v <= end);
-          if (inBin) { counts[i]++; break; }
-        }
+    async fetchStats() {
+      this.statsDirty = false;
+      if (!this.$root.resultsCount) {
+        this.stats = null;
+        return;
       }
-      return counts;
+      const res = await api.getResearchStats(this.$root.resultsResearchId, this.histogramBins);
+      this.stats = res.ok ? Object.freeze(res.stats) : null;
+      this.redrawAll();
     },
 
+    // ------------------------------------------------------------------
+    // Гистограмма
+    // ------------------------------------------------------------------
     renderHistogram(param) {
-      if (!window.Chart) return;
-      const dataArray = (this.$root.results || [])
-        .map(r => r[param])
-        .filter(v => typeof v === 'number' && !isNaN(v));
-      if (dataArray.length === 0) return;
-
-      const minVal = Math.min(...dataArray);
-      const maxVal = Math.max(...dataArray);
-      const bins   = this.createBins(minVal, maxVal, this.histogramBins);
-      const counts = this.distributeToBins(dataArray, bins);
-      const maxCount = Math.max(...counts);
+      if (!window.Chart || !this.stats) return;
+      const hist = this.stats.histograms[param][this.histogramScale];
+      if (!hist.counts.length) return;
+
+      const counts = hist.counts;
+      const labels = counts.map((_, i) =>
+        `${hist.edges[i].toFixed(2)} – ${hist.edges[i + 1].toFixed(2)}`);
+      const maxCount = counts.reduce((a, b) => Math.max(a, b), 0);
 
       const elem = document.getElementById('hist-' + param);
       if (!elem) return;
@@ -167,7 +184,7 @@ window.ResultsView = {
       ctx._chart = new Chart(ctx, {
         type: 'bar',
         data: {
-          labels: bins.map(b => b.label),
+          labels,
           datasets: [{
             label:           'Количество значений',
             data:            counts,
@@ -207,7 +224,7 @@ window.ResultsView = {
             y: {
               beginAtZero: true,
               suggestedMax: maxCount > 0 ? Math.ceil(maxCount * 1.15) : 10,
-              ticks: { stepSize: 1 },
+              ticks: { precision: 0 },
               title: { display: true, text: 'Количество значений' },
             },
             x: { title: { display: true, text: 'Диапазоны значений' } },
@@ -1,10 +1,11 @@
+import multiprocessing
 import sys
 from pathlib import Path
 
 import webview
 
 from backend.api import Api
-from backend.database import init_db
+from backend.database import close_db, init_db
 from backend.logger import logger, ROOT_DIR
 from backend.storage import clear_session
 
@@ -36,11 +37,15 @@ def main():
         min_size=(900, 600),
         text_select=False,
     )
+    api.bind_window(window)
 
     logger.info(f'Открытие окна: {INDEX_HTML}')
     webview.start(debug=False)
+    close_db()
     logger.info('Приложение закрыто')
 
 
 if __name__ == '__main__':
+    # Нужно для пула процессов анализа в собранном .exe
+    multiprocessing.freeze_support()
     main()
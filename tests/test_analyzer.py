@@ -2,9 +2,11 @@ import shutil
 from pathlib import Path
 
 import cv2
+import numpy as np
 import pytest
 
-from backend import analyzer
+from backend import analyzer, metrics
+from backend.pipeline import PipelineConfig
 
 FIXTURES = Path(__file__).parent / 'fixtures'
 CAL_SRC  = FIXTURES / 'calibration' / 'sources.jpg'
@@ -26,7 +28,7 @@ def test_increase_contrast():
     img = _load(RES_1)
     h, w = img.shape[:2]
     result = analyzer.increase_contrast(img.copy())
-    assert result.shape[:2] == (h, w)
+    assert result.shape == (h, w)
 
 
 def test_find_and_draw_contours():
@@ -46,6 +48,66 @@ def test_analyze_contours_returns_results():
             assert key in r, f'Отсутствует ключ {key}'
 
 
+def _raw_contours(path: Path):
+    gray = analyzer.increase_contrast(_load(path))
+    _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return contours, gray.shape
+
+
+@pytest.mark.parametrize('path', [RES_1, RES_2, CAL_SRC])
+def test_filter_contours_matches_per_point_check(path):
+    contours, (h, w) = _raw_contours(path)
+
+    def within_bounds(cnt):
+        for pt in cnt:
+            x, y = pt[0]
+            if x <= 0 or y <= 0 or x >= w - 1 or y >= h - 1:
+                return False
+        return True
+
+    expected = [i for i, c in enumerate(contours)
+                if cv2.contourArea(c) > 100 and within_bounds(c)]
+    selected = analyzer.filter_contours(contours, (h, w))
+
+    assert len(selected) == len(expected)
+    for i, c in zip(expected, selected):
+        assert c is contours[i]
+
+
+def test_filter_contours_edge_cases():
+    assert analyzer.filter_contours([], (100, 100)) == []
+
+    square = lambda x0, y0, s: np.array(
+        [[[x0, y0]], [[x0, y0 + s]], [[x0 + s, y0 + s]], [[x0 + s, y0]]], dtype=np.int32)
+    inside, on_border, small = square(1, 1, 97), square(0, 10, 50), square(20, 20, 10)
+    assert analyzer.filter_contours([inside, on_border, small], (100, 100)) == [inside]
+    # Правая/нижняя граница: x = w - 1 уже рамка
+    assert analyzer.filter_contours([square(1, 1, 98)], (100, 100)) == []
+
+
+def test_drawing_and_measurement_share_one_contour_set():
+    contrasted = analyzer.increase_contrast(_load(RES_1))
+    found = analyzer.extract_contours(contrasted)
+    assert len(found) > 0
+
+    contoured = analyzer.find_and_draw_contours(contrasted.copy(), found)
+    _, results, next_number = analyzer.analyze_contours(contoured, contours=found)
+
+    # Нарисованные контуры не должны влиять на измерения
+    assert results == analyzer.measure_contours(found)
+    assert next_number == len(found) + 1
+
+
+@pytest.mark.parametrize('path', [RES_1, RES_2])
+def test_grayscale_decode_keeps_measurements(path):
+    # Прежний путь: декодирование в BGR и перевод в серый внутри пайплайна
+    from_color = analyzer.extract_contours(analyzer.increase_contrast(_load(path)))
+    gray = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    from_gray = analyzer.extract_contours(analyzer.increase_contrast(gray))
+    assert analyzer.measure_contours(from_gray) == analyzer.measure_contours(from_color)
+
+
 def test_analyze_contours_with_calibration():
     img        = _load(RES_1)
     contrasted = analyzer.increase_contrast(img.copy())
@@ -63,6 +125,61 @@ def test_analyze_contours_with_calibration():
     assert abs(ratio - 10.0) < 1.0, f'Ожидалось ~10, получено {ratio:.3f}'
 
 
+# ---------------------------------------------------------------------------
+# Тайловая обработка
+# ---------------------------------------------------------------------------
+
+def _force_tiles(monkeypatch, tile: int = 100) -> None:
+    monkeypatch.setattr(analyzer, 'TILED_MIN_PIXELS', 0)
+    monkeypatch.setattr(analyzer, 'TILE_SIZE', tile)
+
+
+# Размеры, кратные и не кратные сетке CLAHE по каждой из осей
+@pytest.mark.parametrize('size', [None, (600, 496), (600, 500), (607, 496), (1999, 1377)])
+def test_tiled_processing_matches_whole_frame(monkeypatch, size):
+    gray = cv2.imread(str(RES_1), cv2.IMREAD_GRAYSCALE)
+    if size:
+        gray = cv2.resize(gray, size)
+    whole = analyzer.increase_contrast(gray)
+    found = analyzer.extract_contours(whole)
+
+    _force_tiles(monkeypatch)
+    np.testing.assert_array_equal(analyzer.increase_contrast(gray), whole)
+    tiled = analyzer.find_particles(gray)
+    assert len(tiled) == len(found)
+    for a, b in zip(tiled, found):
+        np.testing.assert_array_equal(a, b)
+    # Среди частиц есть пересекающие стыки тайлов
+    assert any(c[:, 0, 0].min() // 100 != c[:, 0, 0].max() // 100 for c in found)
+
+
+def test_large_image_goes_through_overlay_path(tmp_path, monkeypatch):
+    results, dirs = {}, {}
+    for tiled in (False, True):
+        res_dir = dirs[tiled] = tmp_path / f'research_{tiled}'
+        (res_dir / 'sources').mkdir(parents=True)
+        shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+        shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+        monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+        if tiled:
+            # 2.jpg (1536x2048) — «большой» кадр, 1.jpg (503x608) — обычный
+            monkeypatch.setattr(analyzer, 'TILED_MIN_PIXELS', 1024 ** 2)
+            monkeypatch.setattr(analyzer, 'TILE_SIZE', 128)
+        results[tiled] = analyzer.run_research_analysis(12.5, 10.0)
+
+    assert results[True] == results[False]
+    for folder in analyzer.INTERMEDIATE_FOLDERS:
+        assert (dirs[True] / folder / '1.jpg').exists()
+        assert not (dirs[True] / folder / '2.jpg').exists()
+        assert analyzer.render_research_image('2.jpg', folder) is None
+
+    overlay = analyzer.get_research_overlay('2.jpg')
+    assert overlay is not None
+    counts = metrics.load_measurements(dirs[True] / analyzer.MEASUREMENTS_FILE).counts
+    assert len(overlay['particles']) == counts[1]
+    assert overlay['particles'][0]['number'] == counts[0] + 1
+
+
 # ---------------------------------------------------------------------------
 # Пайплайны
 # ---------------------------------------------------------------------------
@@ -99,3 +216,126 @@ def test_run_research_analysis(tmp_path, monkeypatch):
     assert 'averages' in result
     for folder in ('contrasted', 'contours', 'analyzed'):
         assert (res_dir / folder / '1.jpg').exists(), f'{folder}/1.jpg не создан'
+
+
+@pytest.mark.parametrize('workers, executor', [(2, 'processes'), (2, 'threads')])
+def test_run_research_analysis_parallel_matches_sequential(tmp_path, monkeypatch, workers, executor):
+    results, dirs = {}, {}
+    for w in (1, workers):
+        res_dir = dirs[w] = tmp_path / f'research_{w}'
+        for folder in ('sources', 'contrasted', 'contours', 'analyzed'):
+            (res_dir / folder).mkdir(parents=True)
+        shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+        shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+
+        monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+        config = PipelineConfig(executor=executor, read_ahead=1, write_queue=1)
+        results[w] = analyzer.run_research_analysis(workers=w, pipeline=config)
+
+    assert results[1] == results[workers]
+    numbers = [c['contour_number'] for c in results[workers]['contours']]
+    assert numbers == list(range(1, len(numbers) + 1))
+    for folder in ('contrasted', 'contours', 'analyzed'):
+        assert (dirs[workers] / folder / '2.jpg').read_bytes() == (dirs[1] / folder / '2.jpg').read_bytes()
+
+
+def test_remeasure_from_saved_pixel_measurements(tmp_path, monkeypatch):
+    res_dir = tmp_path / 'research'
+    for folder in ('sources', 'contrasted', 'contours', 'analyzed'):
+        (res_dir / folder).mkdir(parents=True)
+    shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+    shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+    monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+
+    calibrated = analyzer.run_research_analysis(12.5, 10.0)
+
+    m = metrics.load_measurements(res_dir / 'measurements.npz')
+    assert m.files == ['1.jpg', '2.jpg']
+    assert int(m.counts.sum()) == len(calibrated['contours'])
+
+    cols = metrics.to_real_units(m.columns, 12.5, 10.0)
+    assert metrics.to_rows(cols) == calibrated['contours']
+    assert metrics.averages(cols) == calibrated['averages']
+
+
+def test_streaming_analysis_keeps_totals_without_contours(tmp_path, monkeypatch):
+    results, dirs = {}, {}
+    for streaming in (False, True):
+        res_dir = dirs[streaming] = tmp_path / f'research_{streaming}'
+        (res_dir / 'sources').mkdir(parents=True)
+        shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+        shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+        monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+        seen = []
+        results[streaming] = analyzer.run_research_analysis(
+            12.5, 10.0, lazy=True, streaming=streaming,
+            on_progress=lambda done, total, name, contours: seen.extend(contours),
+        )
+        assert results[streaming]['count'] == len(seen)
+
+    full, streamed = results[False], results[True]
+    assert streamed['contours'] == []
+    assert streamed['count'] == len(full['contours'])
+    assert streamed['averages'] == full['averages']
+    assert streamed['stats']['count'] == streamed['count']
+    assert (dirs[True] / 'measurements.npz').read_bytes() == (dirs[False] / 'measurements.npz').read_bytes()
+
+
+def test_lazy_analysis_renders_same_images_on_demand(tmp_path, monkeypatch):
+    results, dirs = {}, {}
+    for lazy in (False, True):
+        res_dir = dirs[lazy] = tmp_path / f'research_{lazy}'
+        (res_dir / 'sources').mkdir(parents=True)
+        shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+        shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+        monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+        results[lazy] = analyzer.run_research_analysis(lazy=lazy)
+
+    assert results[True] == results[False]
+    assert not (dirs[True] / 'analyzed' / '2.jpg').exists()
+
+    for folder in analyzer.INTERMEDIATE_FOLDERS:
+        path = analyzer.render_research_image('2.jpg', folder, dirs[True])
+        assert path.read_bytes() == (dirs[False] / folder / '2.jpg').read_bytes()
+    assert analyzer.render_research_image('3.jpg', 'analyzed', dirs[True]) is None
+
+
+def test_research_overlay_matches_measurements(tmp_path, monkeypatch):
+    res_dir = tmp_path / 'research'
+    (res_dir / 'sources').mkdir(parents=True)
+    shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+    shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+    monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+    result = analyzer.run_research_analysis(lazy=True)
+
+    overlay = analyzer.get_research_overlay('2.jpg', res_dir)
+    h, w = cv2.imread(str(RES_2), cv2.IMREAD_GRAYSCALE).shape
+    assert (overlay['width'], overlay['height']) == (w, h)
+
+    first_file_count = int(metrics.load_measurements(res_dir / 'measurements.npz').counts[0])
+    rows = result['contours'][first_file_count:]
+    assert [(p['number'], p['cx'], p['cy']) for p in overlay['particles']] == \
+           [(c['contour_number'], c['cx'], c['cy']) for c in rows]
+    assert all(len(p['points']) >= 3 for p in overlay['particles'])
+
+    # Второй запрос читает сохранённый JSON
+    assert analyzer.overlay_path('2.jpg', res_dir).name == '2.jpg.json'
+    assert analyzer.overlay_path('2.jpg', res_dir).exists()
+    assert analyzer.get_research_overlay('2.jpg', res_dir) == overlay
+    assert analyzer.get_research_overlay('3.jpg', res_dir) is None
+
+
+def test_overlay_not_built_when_contours_do_not_match(tmp_path, monkeypatch):
+    res_dir = tmp_path / 'research'
+    (res_dir / 'sources').mkdir(parents=True)
+    shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+    monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+    analyzer.run_research_analysis(lazy=True)
+
+    # Пайплайн находит на одну частицу меньше, чем сохранено в измерениях
+    find_particles = analyzer.find_particles
+    monkeypatch.setattr(analyzer, 'find_particles', lambda image: find_particles(image)[1:])
+    assert analyzer.get_research_overlay('1.jpg', res_dir) is None
+    assert not analyzer.overlay_path('1.jpg', res_dir).exists()
+    # Картинка с номерами по-прежнему строится по измерениям
+    assert analyzer.render_research_image('1.jpg', 'analyzed', res_dir) is not None
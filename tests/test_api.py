@@ -0,0 +1,168 @@
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import backend.api as api_module
+import backend.database as database
+import backend.storage as storage
+from backend import analyzer, metrics
+from backend.api import Api
+from backend.models import Calibration
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+RES_1    = FIXTURES / 'research' / '1.jpg'
+RES_2    = FIXTURES / 'research' / '2.jpg'
+
+
+@pytest.fixture(autouse=True)
+def patched_paths(tmp_path, monkeypatch):
+    """Сессия, архив, кэш и БД — во временной папке."""
+    data_dir    = tmp_path / 'data'
+    session_dir = data_dir / 'session'
+    res_dir     = session_dir / 'research'
+
+    monkeypatch.setattr(storage, 'DATA_DIR',         data_dir)
+    monkeypatch.setattr(storage, 'SESSION_DIR',      session_dir)
+    monkeypatch.setattr(storage, 'SESSION_RES_DIR',  res_dir)
+    monkeypatch.setattr(storage, 'SESSION_CAL_DIR',  session_dir / 'calibration')
+    monkeypatch.setattr(storage, 'SESSION_PREV_DIR', session_dir / 'previews')
+    monkeypatch.setattr(storage, 'RESEARCH_DIR',     data_dir / 'research')
+    monkeypatch.setattr(storage, 'CALIBRATION_DIR',  data_dir / 'calibration')
+    monkeypatch.setattr(storage, 'CACHE_DIR',        data_dir / 'cache')
+    monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+    monkeypatch.setattr(database, 'DB_PATH', tmp_path / 'test.db')
+    database.init_db()
+
+    (res_dir / 'sources').mkdir(parents=True)
+    shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+    shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+
+
+def _wait(api: Api, job_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        status = api.get_job_status(job_id)
+        if status['state'] != 'running':
+            return status
+        assert time.monotonic() < deadline, 'Задача не завершилась'
+        time.sleep(0.01)
+
+
+# ---------------------------------------------------------------------------
+# Калибровка результатов сессии
+# ---------------------------------------------------------------------------
+
+def test_rejected_or_failed_start_keeps_session_calibration(monkeypatch):
+    api = Api()
+    release = threading.Event()
+
+    def slow_analysis(*args, **kwargs):
+        release.wait(10)
+        return {'contours': [], 'count': 0, 'averages': {}}
+
+    monkeypatch.setattr(api_module, 'run_research_analysis', slow_analysis)
+    first = api.start_research(1)
+    assert first['ok']
+    # Второй запуск отклонён, а первый ещё не закончен — калибровка прежняя
+    assert not api.start_research(2)['ok']
+    assert api.session['analysis_calibration_id'] == 0
+
+    # Импорт и синхронный анализ той же сессии тоже ждут
+    assert not api.import_images([str(RES_1)])['ok']
+    assert not api.execute_research(2)['ok']
+
+    release.set()
+    assert _wait(api, first['job_id'])['state'] == 'done'
+    assert api.session['analysis_calibration_id'] == 1
+
+    def failing_analysis(*args, **kwargs):
+        raise RuntimeError('сбой анализа')
+
+    monkeypatch.setattr(api_module, 'run_research_analysis', failing_analysis)
+    assert _wait(api, api.start_research(3)['job_id'])['state'] == 'error'
+    assert not api.execute_research(4)['ok']
+    assert api.session['analysis_calibration_id'] == 1
+
+
+def test_deleted_calibration_is_an_error_not_pixels():
+    cal_id = database.save_calibration(Calibration('x10', 'm', 10.0, '1 мкм'))
+    api = Api()
+    assert api.execute_research(cal_id, workers=1, lazy=True)['ok']
+    api.delete_calibration(cal_id)
+
+    for res in (api.get_contours_page(0), api.get_research_stats(0),
+                api.save_research({'id': 0, 'name': 'n', 'employee': 'e', 'microscope': 'm'}),
+                api.remeasure_research(cal_id)):
+        assert not res['ok'] and res['error']
+    assert database.count_contours(1) == 0
+
+    # Пересчёт в другую калибровку возвращает результатам единицы
+    other = database.save_calibration(Calibration('x20', 'm', 20.0, '1 мкм'))
+    assert api.remeasure_research(other)['ok']
+    assert api.get_contours_page(0)['ok']
+
+
+# ---------------------------------------------------------------------------
+# Результаты без полных списков контуров
+# ---------------------------------------------------------------------------
+
+def _analyze_and_save(api: Api, calibration_id: int = 0) -> int:
+    assert api.execute_research(calibration_id, workers=1, lazy=True)['ok']
+    saved = api.save_research({'id': 0, 'name': 'n', 'employee': 'e', 'microscope': 'm'})
+    assert saved['ok']
+    return saved['id']
+
+
+def test_results_are_counted_not_listed():
+    api = Api()
+    result = api.execute_research(0, workers=1, lazy=True, streaming=True)
+    assert result['contours'] == []
+    assert result['count'] > 0
+    # Без streaming ответ прежний — со всеми контурами
+    assert len(api.execute_research(0, workers=1, lazy=True)['contours']) == result['count']
+
+    research_id = _analyze_and_save(api)
+    research = api.get_research(research_id)['research']
+    assert 'contours' not in research
+    assert research['contour_count'] == result['count']
+    page = api.get_contours_page(research_id, 0, 10)
+    assert page['count'] == result['count'] and len(page['contours']) == 10
+
+
+def test_remeasure_refreshes_contour_pages():
+    api = Api()
+    assert api.execute_research(0, workers=1, lazy=True)['ok']
+    before = api.get_contours_page(0, 0, 5, '-area')['contours']
+
+    cal_id = database.save_calibration(Calibration('x10', 'm', 10.0, '1 мкм'))
+    remeasured = api.remeasure_research(cal_id)
+    assert remeasured['ok'] and len(remeasured['contours']) == remeasured['count']
+    assert api.remeasure_research(cal_id, streaming=True)['contours'] == []
+    after = api.get_contours_page(0, 0, 5, '-area')['contours']
+
+    assert [r['contour_number'] for r in after] == [r['contour_number'] for r in before]
+    for old, new in zip(before, after):
+        assert new['area'] == pytest.approx(round(old['area'] / 100, 2), abs=0.011)
+
+
+# ---------------------------------------------------------------------------
+# Удаление изображения
+# ---------------------------------------------------------------------------
+
+def test_deleted_image_leaves_session_results():
+    api = Api()
+    assert api.execute_research(0, workers=1)['ok']
+    before = api.get_research_stats(0)['stats']['count']
+    m = metrics.load_measurements(storage.SESSION_RES_DIR / storage.MEASUREMENTS_FILE)
+    second = int(m.counts[1])
+
+    res = api.delete_image('1.jpg', 'research')
+    assert res['ok'] and res['results']['count'] == second
+    assert api.get_research_stats(0)['stats']['count'] == second < before
+    assert api.get_contours_page(0)['count'] == second
+    # Номера частиц 2.jpg сдвинулись — analyzed/ строится заново
+    assert not (storage.SESSION_RES_DIR / 'analyzed' / '2.jpg').exists()
+    assert analyzer.render_research_image('2.jpg', 'analyzed') is not None
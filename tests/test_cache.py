@@ -0,0 +1,92 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backend import analyzer
+from backend.cache import AnalysisCache
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+RES_1    = FIXTURES / 'research' / '1.jpg'
+RES_2    = FIXTURES / 'research' / '2.jpg'
+
+
+@pytest.fixture
+def res_dir(tmp_path, monkeypatch):
+    res_dir = tmp_path / 'research'
+    for folder in ('sources', 'contrasted', 'contours', 'analyzed'):
+        (res_dir / folder).mkdir(parents=True)
+    shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+    shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+    monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+    return res_dir
+
+
+def _clear_outputs(res_dir: Path) -> None:
+    for folder in ('contrasted', 'contours', 'analyzed'):
+        for f in (res_dir / folder).iterdir():
+            f.unlink()
+
+
+def test_second_run_is_served_from_cache(res_dir, tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    first = analyzer.run_research_analysis(cache_dir=cache_dir)
+    analyzed = (res_dir / 'analyzed' / '2.jpg').read_bytes()
+    assert len(list(cache_dir.iterdir())) == 2
+
+    _clear_outputs(res_dir)
+    monkeypatch.setattr(analyzer, 'extract_contours', lambda *_: pytest.fail('кэш не использован'))
+    second = analyzer.run_research_analysis(cache_dir=cache_dir)
+
+    assert second == first
+    assert (res_dir / 'analyzed' / '2.jpg').read_bytes() == analyzed
+    assert (res_dir / 'contrasted' / '1.jpg').exists()
+
+
+def test_calibration_change_reuses_pixel_measurements(res_dir, tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    base = analyzer.run_research_analysis(cache_dir=cache_dir)
+
+    monkeypatch.setattr(analyzer, 'extract_contours', lambda *_: pytest.fail('кэш не использован'))
+    scaled = analyzer.run_research_analysis(10.0, 1.0, cache_dir=cache_dir)
+
+    assert len(scaled['contours']) == len(base['contours'])
+    assert scaled['contours'][0]['perimeter'] == pytest.approx(base['contours'][0]['perimeter'] / 10, abs=0.01)
+
+
+def test_renumbered_image_is_relabelled(res_dir, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    analyzer.run_research_analysis(cache_dir=cache_dir)
+
+    # Новый файл в начале списка сдвигает нумерацию 1.jpg и 2.jpg
+    shutil.copy(RES_2, res_dir / 'sources' / '0.jpg')
+    result = analyzer.run_research_analysis(cache_dir=cache_dir)
+
+    numbers = [c['contour_number'] for c in result['contours']]
+    assert numbers == list(range(1, len(numbers) + 1))
+    for name in ('0.jpg', '1.jpg', '2.jpg'):
+        assert (res_dir / 'analyzed' / name).exists()
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = AnalysisCache(tmp_path, {'v': 1}, max_bytes=0)
+    cols = {'area': np.arange(1000, dtype=np.float64)}
+    for i, key in enumerate(('old', 'mid', 'new')):
+        cache.store(key, cols, {'contours.jpg': b'x' * 1000})
+        os.utime(tmp_path / key / 'columns.npz', (i, i))
+
+    size = sum(f.stat().st_size for f in (tmp_path / 'new').iterdir())
+    cache.max_bytes = size
+    assert cache.evict() == 2
+    assert [p.name for p in tmp_path.iterdir()] == ['new']
+    assert cache.load_columns('new') is not None
+    assert cache.load_columns('old') is None
+
+
+def test_key_depends_on_params():
+    a = AnalysisCache(Path('.'), {'threshold': 127})
+    b = AnalysisCache(Path('.'), {'threshold': 128})
+    assert a.key(b'image') != b.key(b'image')
+    assert a.key(b'image') == a.key(b'image')
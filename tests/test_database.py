@@ -1,3 +1,6 @@
+import sqlite3
+
+import numpy as np
 import pytest
 
 import backend.database as database
@@ -9,6 +12,8 @@ def isolated_db(tmp_path, monkeypatch):
     """Каждый тест получает свежую пустую БД во временной папке."""
     monkeypatch.setattr(database, 'DB_PATH', tmp_path / 'test.db')
     database.init_db()
+    yield
+    database.close_db()
 
 
 # ---------------------------------------------------------------------------
@@ -20,6 +25,42 @@ def test_init_db():
     database.init_db()
 
 
+def test_init_db_upgrades_database_without_version(tmp_path, monkeypatch):
+    # БД, созданная до миграций: таблицы и построчные контуры, без индексов и user_version
+    path = tmp_path / 'old.db'
+    conn = sqlite3.connect(path)
+    conn.executescript(database._MIGRATIONS[0])
+    conn.execute("INSERT INTO research (name, employee, microscope, average_perimeter, average_area, "
+                 "average_width, average_length, average_dek, date) "
+                 "VALUES ('Old', 'U', 'M', 1, 1, 1, 1, 1, '2024-01-01T00:00:00')")
+    conn.executemany('INSERT INTO contour_data (research_id, contour_number, perimeter, area, width, length, dek) '
+                     'VALUES (1, ?, ?, 2.5, 3.0, 4.0, 5.01)', [(2, 10.1), (1, 10.0)])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    database.init_db()
+
+    with database._connect() as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == database.SCHEMA_VERSION
+        plan = conn.execute('EXPLAIN QUERY PLAN SELECT * FROM research ORDER BY date DESC').fetchall()
+    assert 'idx_research_date' in ' '.join(r['detail'] for r in plan)
+    assert [r.name for r in database.get_all_researches()] == ['Old']
+
+    contours = database.get_contours(1)
+    assert [c.contour_number for c in contours] == [1, 2]
+    assert contours[1].perimeter == 10.1
+    assert contours[0].dek == 5.01
+
+
+def test_connection_is_reused_in_wal_mode():
+    with database._connect() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    with database._connect() as again:
+        assert again is conn
+
+
 # ---------------------------------------------------------------------------
 # Calibration
 # ---------------------------------------------------------------------------
@@ -83,6 +124,34 @@ def test_save_and_get_research():
     assert loaded_contours[1].contour_number == 2
 
 
+def test_contour_columns_round_trip():
+    res_id = database.save_research(_make_research(name='Columns'))
+    rows = [{'contour_number': i + 1, 'perimeter': 1.01 * i, 'area': 2.0, 'width': 0.33,
+             'length': 0.5, 'dek': 1.27} for i in range(1000)]
+    database.save_contour_columns(res_id, database.contour_columns_from_rows(rows))
+
+    cols = database.load_contour_columns(res_id)
+    assert set(cols) == set(database.CONTOUR_COLUMNS)
+    assert cols['contour_number'].dtype == np.int32
+    assert cols['perimeter'].tolist() == [r['perimeter'] for r in rows]
+    assert database.load_contour_columns(res_id + 1)['area'].size == 0
+
+
+def test_save_research_results_is_one_transaction():
+    cols = database.contour_columns_from_rows([
+        {'contour_number': 1, 'perimeter': 1.0, 'area': 2.0, 'width': 3.0, 'length': 4.0, 'dek': 5.0},
+    ])
+    res_id = database.save_research_results(_make_research(name='Bulk'), cols, {'count': 1})
+    assert database.load_contour_columns(res_id)['dek'].tolist() == [5.0]
+    assert database.get_research_stats(res_id) == {'count': 1}
+
+    # Ошибка на последней записи откатывает и исследование, и контуры
+    with pytest.raises(TypeError):
+        database.save_research_results(_make_research(name='Broken'), cols, {'bad': object()})
+    assert [r.name for r in database.get_all_researches()] == ['Bulk']
+    assert database.count_researches() == 1
+
+
 def test_delete_research_cascades_contours():
     res_id = database.save_research(_make_research(name='Cascade'))
     database.save_contours(res_id, [
@@ -94,3 +163,73 @@ def test_delete_research_cascades_contours():
 
     assert database.get_research(res_id) is None
     assert database.get_contours(res_id) == []
+
+
+# ---------------------------------------------------------------------------
+# История: страницы
+# ---------------------------------------------------------------------------
+
+def _walk_pages(**kwargs):
+    ids, cursor = [], None
+    while True:
+        page = database.get_researches_page(limit=3, cursor=cursor, **kwargs)
+        ids += [r.id for r in page.researches]
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids, page.total_count
+
+
+def test_researches_pages_cover_history_in_order():
+    for i in range(8):
+        database.save_research(_make_research(name=f'R{i % 3}', employee='Иванов' if i % 2 else 'Петров'))
+
+    ids, total = _walk_pages()
+    assert total == 8
+    assert ids == list(range(8, 0, -1))  # новые первыми
+
+    by_name, _ = _walk_pages(sort_by='name', descending=False)
+    names = [database.get_research(i).name for i in by_name]
+    assert sorted(by_name) == list(range(1, 9))
+    assert names == sorted(names)
+
+    ivanov, total = _walk_pages(filters=database.ResearchFilter(employee='Иван'))
+    assert total == 4 and ivanov == [8, 6, 4, 2]
+
+
+def test_researches_total_count_is_cached_until_change():
+    database.save_research(_make_research())
+    assert database.count_researches() == 1
+    assert database.get_researches_page().total_count == 1
+
+    database.save_research(_make_research())
+    assert database.count_researches() == 2
+    database.delete_research(1)
+    assert database.get_researches_page().total_count == 1
+
+
+def test_researches_date_filter_includes_whole_day():
+    res_id = database.save_research(_make_research())
+    today = database.get_research(res_id).date.date().isoformat()
+
+    page = database.get_researches_page(filters=database.ResearchFilter(date_from=today, date_to=today))
+    assert [r.id for r in page.researches] == [res_id]
+    page = database.get_researches_page(filters=database.ResearchFilter(date_to='2000-01-01'))
+    assert page.researches == [] and page.total_count == 0
+
+
+def test_search_follows_saves_and_deletes():
+    keep = database.save_research(_make_research(name='Порошок железа', employee='Иванов'))
+    gone = database.save_research(_make_research(name='Порошок меди', employee='Петров'))
+    database.save_calibration(Calibration(name='Объектив 10x', microscope='М001',
+                                          coefficient=1.0, division_price='1 мкм'))
+
+    assert [r.id for r in database.search_researches('порош')] == [gone, keep]
+    assert [r.id for r in database.search_researches('пор иван')] == [keep]
+
+    database.save_research(_make_research(id=keep, name='Порошок никеля', employee='Иванов'))
+    database.delete_research(gone)
+    assert database.search_researches('железа') == []
+    assert [r.id for r in database.search_researches('никел')] == [keep]
+
+    assert [c.name for c in database.search_calibrations('объект')] == ['Объектив 10x']
+    assert database.search_researches('"*') == []
@@ -0,0 +1,70 @@
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from backend.image_server import ImageServer
+from backend.previews import PreviewStore
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+RES_1    = FIXTURES / 'research' / '1.jpg'
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / 'research' / 'sources').mkdir(parents=True)
+    (tmp_path / 'research' / 'sources' / '1.jpg').write_bytes(RES_1.read_bytes())
+    srv = ImageServer(tmp_path, PreviewStore(tmp_path, tmp_path / 'previews'))
+    yield srv
+    srv.stop()
+
+
+def _get(url: str, **headers):
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=5)
+
+
+def test_serves_file_with_etag(server, tmp_path):
+    url = server.url_for(tmp_path / 'research' / 'sources' / '1.jpg')
+    assert url.startswith('http://127.0.0.1:')
+
+    with _get(url) as resp:
+        assert resp.read() == RES_1.read_bytes()
+        assert resp.headers['Content-Type'] == 'image/jpeg'
+        assert 'immutable' in resp.headers['Cache-Control']
+        etag = resp.headers['ETag']
+
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(url, **{'If-None-Match': etag})
+    assert e.value.code == 304
+
+
+def test_url_changes_with_file(server, tmp_path):
+    path = tmp_path / 'research' / 'sources' / '1.jpg'
+    before = server.url_for(path)
+    path.write_bytes(b'changed')
+    assert server.url_for(path) != before
+
+
+def test_rejects_foreign_token_and_traversal(server, tmp_path):
+    url = server.url_for(tmp_path / 'research' / 'sources' / '1.jpg')
+    base, token = url.rsplit('/', 4)[0], url.split('/')[3]
+    (tmp_path.parent / 'secret.txt').write_text('x')
+
+    for bad in (f'{base}/wrong-token/research/sources/1.jpg',
+                f'{base}/{token}/../secret.txt',
+                f'{base}/{token}/%2E%2E/secret.txt',
+                f'{base}/{token}/research/sources/missing.jpg'):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            _get(bad)
+        assert e.value.code == 404
+
+
+def test_serves_thumbnail(server, tmp_path):
+    url = server.url_for(tmp_path / 'research' / 'sources' / '1.jpg', 'thumb')
+    assert '/@thumb/research/sources/1.jpg?v=' in url
+
+    with _get(url) as resp:
+        data = resp.read()
+    assert data[:2] == b'\xff\xd8'
+    assert len(data) < RES_1.stat().st_size
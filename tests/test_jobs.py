@@ -0,0 +1,139 @@
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from backend import analyzer
+from backend.jobs import Job, JobCancelled, JobManager
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+RES_1    = FIXTURES / 'research' / '1.jpg'
+RES_2    = FIXTURES / 'research' / '2.jpg'
+
+
+def _wait(job: Job, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, 'Задача не завершилась'
+        time.sleep(0.01)
+
+
+def test_job_runs_in_background_and_reports_progress():
+    manager = JobManager()
+
+    def run(job):
+        for i in range(3):
+            job.report(i + 1, 3, f'{i}.jpg', [{'contour_number': i + 1}])
+        return {'contours': job.contours, 'averages': {'area': 1.0}}
+
+    job = manager.start('research', run)
+    _wait(job)
+
+    status = job.to_dict(offset=1)
+    assert status['state'] == 'done'
+    assert (status['done'], status['total']) == (3, 3)
+    assert [c['contour_number'] for c in status['contours']] == [2, 3]
+    # Контуры уже отданы через прогресс и в result не дублируются
+    assert status['result'] == {'averages': {'area': 1.0}}
+
+
+def test_job_without_kept_contours_counts_them():
+    job = Job(id='1', kind='research')
+    job.keep_contours = False
+    job.report(1, 2, '1.jpg', [{'contour_number': 1}, {'contour_number': 2}])
+    job.report(2, 2, '2.jpg', [{'contour_number': 3}])
+
+    status = job.to_dict()
+    assert status['found'] == 3
+    assert status['contours'] == []
+
+
+def test_cancel_stops_between_steps():
+    manager = JobManager()
+    started = threading.Event()
+
+    def run(job):
+        for i in range(1000):
+            started.set()
+            job.report(i + 1, 1000)
+            time.sleep(0.005)
+        return {}
+
+    job = manager.start('research', run)
+    started.wait(5)
+    assert manager.cancel(job.id)
+    _wait(job)
+
+    assert job.state == 'cancelled'
+    assert job.done < 1000
+    assert not manager.cancel(job.id)
+
+
+def test_only_one_job_of_a_kind():
+    manager = JobManager()
+    release = threading.Event()
+    job = manager.start('research', lambda j: release.wait(5) and {})
+
+    with pytest.raises(RuntimeError):
+        manager.start('research', lambda j: {})
+    manager.start('calibration', lambda j: {})
+
+    release.set()
+    _wait(job)
+
+
+def test_jobs_sharing_a_resource_do_not_overlap():
+    manager = JobManager()
+    release = threading.Event()
+    job = manager.start('research', lambda j: release.wait(5) and {}, 'session')
+
+    with pytest.raises(RuntimeError):
+        manager.start('import', lambda j: {}, 'session')
+    with pytest.raises(RuntimeError):
+        with manager.hold('session', 'research'):
+            pass
+
+    release.set()
+    _wait(job)
+    with manager.hold('session', 'research'):
+        with pytest.raises(RuntimeError):
+            manager.start('import', lambda j: {}, 'session')
+    manager.start('import', lambda j: {}, 'session')
+
+
+def test_failed_job_keeps_error():
+    manager = JobManager()
+
+    def run(job):
+        raise ValueError('boom')
+
+    job = manager.start('research', run)
+    _wait(job)
+    assert job.state == 'error'
+    assert job.error == 'boom'
+
+
+def test_research_analysis_cancelled_between_images(tmp_path, monkeypatch):
+    res_dir = tmp_path / 'research'
+    for folder in ('sources', 'contrasted', 'contours', 'analyzed'):
+        (res_dir / folder).mkdir(parents=True)
+    shutil.copy(RES_1, res_dir / 'sources' / '1.jpg')
+    shutil.copy(RES_2, res_dir / 'sources' / '2.jpg')
+    monkeypatch.setattr(analyzer, 'SESSION_RES_DIR', res_dir)
+
+    analyzer.run_research_analysis()
+    before = (res_dir / 'measurements.npz').read_bytes()
+
+    job = Job(id='test', kind='research')
+    job.cancel_event.set()
+    with pytest.raises(JobCancelled):
+        analyzer.run_research_analysis(lazy=True, on_progress=job.report)
+
+    assert (job.done, job.total) == (1, 2)
+    # Прерванный анализ не трогает результаты прошлого
+    assert (res_dir / 'measurements.npz').read_bytes() == before
+    for folder in analyzer.INTERMEDIATE_FOLDERS:
+        assert (res_dir / folder / '2.jpg').exists()
+    assert not (res_dir / analyzer.STAGING_FOLDER).exists()
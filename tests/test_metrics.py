@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from backend import analyzer, metrics
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+RES_1    = FIXTURES / 'research' / '1.jpg'
+
+
+def _contours():
+    img = cv2.imread(str(RES_1))
+    assert img is not None
+    return analyzer.extract_contours(analyzer.increase_contrast(img))
+
+
+def test_measure_returns_columns():
+    contours = _contours()
+    cols = metrics.measure(contours)
+
+    assert set(cols) == set(metrics.COLUMNS)
+    for key in metrics.COLUMNS:
+        assert len(cols[key]) == len(contours)
+    assert np.all(cols['area'] > 100)
+    assert np.all(cols['width'] <= cols['length'])
+
+
+def test_to_real_units_converts_whole_columns():
+    px = metrics.measure(_contours())
+    real = metrics.to_real_units(px, calibration_coefficient=10.0, division_price_value=2.0)
+
+    np.testing.assert_allclose(real['perimeter'], np.round(px['perimeter'] / 10 * 2, 2))
+    np.testing.assert_allclose(real['area'], np.round(px['area'] / 100 * 4, 2))
+    # Центры масс остаются в пикселях
+    assert real['cx'] is px['cx']
+
+
+def test_to_rows_is_view_over_columns():
+    cols = metrics.to_real_units(metrics.measure(_contours()))
+    rows = metrics.to_rows(cols, start_number=5)
+
+    assert len(rows) == metrics.count(cols)
+    assert rows[0]['contour_number'] == 5
+    assert rows[-1]['contour_number'] == 5 + len(rows) - 1
+    assert [r['dek'] for r in rows] == cols['dek'].tolist()
+
+
+def test_empty_columns():
+    cols = metrics.measure([])
+    assert metrics.count(cols) == 0
+    assert metrics.to_rows(cols) == []
+    assert metrics.averages(cols)['area'] == 0
+
+
+def test_select_rows_filters_and_sorts():
+    cols = {
+        'contour_number': np.array([1, 2, 3, 4, 5]),
+        'dek':            np.array([3.0, 1.0, 3.0, 5.0, 2.0]),
+    }
+    assert metrics.select_rows(cols).tolist() == [0, 1, 2, 3, 4]
+    # Устойчиво: при равном ДЭК порядок номеров сохраняется в обе стороны
+    assert metrics.select_rows(cols, 'dek').tolist() == [1, 4, 0, 2, 3]
+    assert metrics.select_rows(cols, 'dek', descending=True).tolist() == [3, 0, 2, 4, 1]
+    assert metrics.select_rows(cols, 'dek', ranges={'dek': (2.0, 3.0)}).tolist() == [4, 0, 2]
+    assert metrics.select_rows(cols, ranges={'dek': (None, 1.5)}).tolist() == [1]
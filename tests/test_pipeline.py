@@ -0,0 +1,79 @@
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from backend.logger import logger
+from backend.pipeline import AsyncWriter, imap_ordered, prefetch
+
+
+def test_prefetch_reads_in_order_and_stops_early(tmp_path):
+    paths = []
+    for i in range(10):
+        p = tmp_path / f'{i}.bin'
+        p.write_bytes(bytes([i]))
+        paths.append(p)
+
+    assert [(p.name, data) for p, data in prefetch(paths, 2)] == \
+           [(p.name, bytes([i])) for i, p in enumerate(paths)]
+
+    gen = prefetch(paths, 2)
+    next(gen)
+    gen.close()  # поток чтения не должен остаться висеть на полной очереди
+
+    missing = prefetch([tmp_path / 'нет.bin'], 2)
+    with pytest.raises(FileNotFoundError):
+        list(missing)
+
+
+def test_imap_ordered_threads_keeps_order():
+    def slow_square(x):
+        time.sleep(0.01 * (5 - x % 5))
+        return x * x
+
+    assert list(imap_ordered(slow_square, range(20), 4, 'threads')) == [x * x for x in range(20)]
+
+
+def test_async_writer_bounds_queue_and_reports_errors():
+    release = threading.Event()
+    started = []
+
+    def blocked(i):
+        started.append(i)
+        release.wait(5)
+
+    writer = AsyncWriter(threads=1, depth=2)
+    writer.submit(blocked, 1)
+    writer.submit(blocked, 2)
+
+    third = threading.Thread(target=writer.submit, args=(blocked, 3))
+    third.start()
+    time.sleep(0.05)
+    # Очередь полна: третья задача ждёт свободного места
+    assert third.is_alive()
+    release.set()
+    third.join(5)
+    writer.close()
+    assert started == [1, 2, 3]
+
+    def fail():
+        raise OSError('диск заполнен')
+
+    writer = AsyncWriter(threads=1, depth=2)
+    writer.submit(fail)
+    with pytest.raises(OSError):
+        writer.close()
+
+
+def _file_handlers() -> int:
+    return sum(isinstance(h, logging.FileHandler) for h in logger.handlers)
+
+
+def test_pool_processes_do_not_open_the_log_file():
+    assert _file_handlers() == 1
+    # spawn — как на Windows: процесс пула импортирует backend.logger заново
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        assert pool.submit(_file_handlers).result() == 0
@@ -0,0 +1,77 @@
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.image_server import file_etag
+from backend.previews import PREVIEW_SIZES, PreviewStore, jpeg_size, make_preview
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+RES_1    = FIXTURES / 'research' / '1.jpg'
+
+
+@pytest.fixture
+def store(tmp_path):
+    src = tmp_path / 'session' / 'research' / 'sources'
+    src.mkdir(parents=True)
+    shutil.copy(RES_1, src / '1.jpg')
+    return PreviewStore(tmp_path / 'session', tmp_path / 'session' / 'previews')
+
+
+def _decode(data: bytes):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_jpeg_size_matches_decoded():
+    img = cv2.imread(str(RES_1))
+    assert jpeg_size(RES_1.read_bytes()) == (img.shape[1], img.shape[0])
+    assert jpeg_size(b'\x89PNG....') is None
+
+
+@pytest.mark.parametrize('max_side', [50, 200, 100000])
+def test_make_preview_limits_longest_side(max_side):
+    img = cv2.imread(str(RES_1))
+    preview = _decode(make_preview(RES_1.read_bytes(), max_side))
+    assert max(preview.shape[:2]) == min(max_side, max(img.shape[:2]))
+
+
+def test_preview_built_once_and_invalidated(store, tmp_path):
+    source = tmp_path / 'session' / 'research' / 'sources' / '1.jpg'
+    etag = file_etag(source)
+
+    thumb = store.get(source, 'thumb', etag)
+    assert max(_decode(thumb).shape[:2]) <= PREVIEW_SIZES['thumb']
+    on_disk = list((tmp_path / 'session' / 'previews' / 'research' / 'sources' / 'thumb').iterdir())
+    assert len(on_disk) == 1
+
+    # Повторный запрос обслуживается из памяти, даже если файл на диске пропал
+    on_disk[0].unlink()
+    assert store.get(source, 'thumb', etag) is thumb
+
+    store.invalidate(source)
+    assert store.get(source, 'thumb', etag) is not thumb
+
+
+def test_memory_is_byte_bounded(store, tmp_path):
+    source = tmp_path / 'session' / 'research' / 'sources' / '1.jpg'
+    etag = file_etag(source)
+    store.memory_bytes = len(store.get(source, 'thumb', etag))
+
+    store.get(source, 'preview', etag)
+    assert store._used <= store.memory_bytes
+
+
+def test_same_stem_sources_keep_separate_previews(store, tmp_path):
+    sources = tmp_path / 'session' / 'research' / 'sources'
+    cv2.imwrite(str(sources / '1.png'), cv2.resize(cv2.imread(str(RES_1)), (100, 50)))
+    jpg, png = sources / '1.jpg', sources / '1.png'
+
+    thumbs = {p.name: store.get(p, 'thumb', file_etag(p)) for p in (jpg, png)}
+    assert _decode(thumbs['1.png']).shape[:2] == (50, 100)
+    assert _decode(thumbs['1.jpg']).shape[:2] != (50, 100)
+
+    store.invalidate(png)
+    on_disk = list((tmp_path / 'session' / 'previews' / 'research' / 'sources' / 'thumb').iterdir())
+    assert [p.name.split('.')[:2] for p in on_disk] == [['1', 'jpg']]
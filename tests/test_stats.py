@@ -0,0 +1,77 @@
+import numpy as np
+
+from backend import metrics, stats
+
+
+def _cols(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    dek = rng.lognormal(mean=1.0, sigma=0.5, size=n)
+    return {
+        'perimeter': np.pi * dek,
+        'area': np.pi * dek ** 2 / 4,
+        'width': dek * 0.8,
+        'length': dek * 1.2,
+        'dek': dek,
+    }
+
+
+def test_summarize_matches_numpy():
+    values = _cols()['dek']
+    s = stats.summarize(values)
+
+    assert s['count'] == len(values)
+    assert np.isclose(s['mean'], values.mean())
+    assert np.isclose(s['std'], values.std(ddof=1))
+    assert np.isclose(s['percentiles']['p50'], np.median(values))
+    assert stats.summarize(np.empty(0))['count'] == 0
+
+
+def test_histogram_counts_every_value():
+    values = np.concatenate([_cols()['area'], [0.0]])
+
+    linear = stats.histogram(values, bins=15)
+    assert len(linear['edges']) == 16 and sum(linear['counts']) == len(values)
+
+    log = stats.histogram(values, bins=15, log=True)
+    assert log['excluded'] == 1
+    assert sum(log['counts']) == len(values) - 1
+    # Логарифмические границы — геометрическая прогрессия
+    ratios = np.diff(np.log(log['edges']))
+    assert np.allclose(ratios, ratios[0])
+
+    assert stats.histogram(np.full(5, 2.0))['counts'] == [5]
+
+
+def test_research_stats_d_values_are_dek_percentiles():
+    cols = _cols()
+    result = stats.research_stats(cols, bins=10)
+
+    assert set(result['metrics']) == set(metrics.METRICS)
+    assert result['count'] == 1000
+    d10, d50, d90 = np.percentile(cols['dek'], [10, 50, 90])
+    assert np.isclose(result['d_values']['d10'], d10)
+    assert np.isclose(result['d_values']['d50'], d50)
+    assert np.isclose(result['d_values']['d90'], d90)
+    assert len(result['histograms']['dek']['linear']['counts']) == 10
+
+
+def test_streaming_stats_match_batch_statistics():
+    cols = {k: np.round(v, 2) for k, v in _cols(5000).items()}
+    parts = [{k: v[i:i + 700] for k, v in cols.items()} for i in range(0, 5000, 700)]
+
+    running, other = stats.StreamingStats(), stats.StreamingStats()
+    for i, part in enumerate(parts):
+        (running if i % 2 else other).add(part)
+    running.merge(other)
+
+    batch = stats.research_stats(cols)
+    summary = running.summary()
+    assert summary['count'] == 5000
+    for m in stats.STAT_METRICS:
+        exact, approx = batch['metrics'][m], summary['metrics'][m]
+        assert np.isclose(approx['mean'], exact['mean'])
+        assert np.isclose(approx['std'], exact['std'])
+        assert approx['min'] == exact['min'] and approx['max'] == exact['max']
+        for p, v in exact['percentiles'].items():
+            assert abs(approx['percentiles'][p] - v) <= 0.02 * v
+    assert running.averages() == metrics.averages(cols)
@@ -18,15 +18,19 @@ def patched_paths(tmp_path, monkeypatch):
     session_dir     = data_dir / 'session'
     res_dir         = session_dir / 'research'
     cal_dir         = session_dir / 'calibration'
+    prev_dir        = session_dir / 'previews'
     research_dir    = data_dir / 'research'
     calibration_dir = data_dir / 'calibration'
+    cache_dir       = data_dir / 'cache'
 
     monkeypatch.setattr(storage, 'DATA_DIR',         data_dir)
     monkeypatch.setattr(storage, 'SESSION_DIR',      session_dir)
     monkeypatch.setattr(storage, 'SESSION_RES_DIR',  res_dir)
     monkeypatch.setattr(storage, 'SESSION_CAL_DIR',  cal_dir)
+    monkeypatch.setattr(storage, 'SESSION_PREV_DIR', prev_dir)
     monkeypatch.setattr(storage, 'RESEARCH_DIR',     research_dir)
     monkeypatch.setattr(storage, 'CALIBRATION_DIR',  calibration_dir)
+    monkeypatch.setattr(storage, 'CACHE_DIR',        cache_dir)
 
 
 # ---------------------------------------------------------------------------
@@ -66,6 +70,36 @@ def test_save_and_load_research_files():
     assert src.stat().st_size == RES_1.stat().st_size
 
 
+def test_measurements_travel_with_research_files():
+    storage.clear_session()
+    measurements = storage.SESSION_RES_DIR / storage.MEASUREMENTS_FILE
+    measurements.write_bytes(b'npz')
+
+    storage.save_research_files(1)
+    storage.clear_session()
+    assert not measurements.exists()
+
+    storage.load_research_files(1)
+    assert measurements.read_bytes() == b'npz'
+
+
+def test_loaded_session_shares_files_with_archive_until_rewritten():
+    storage.clear_session()
+    src = storage.SESSION_RES_DIR / 'analyzed' / '1.jpg'
+    shutil.copy(RES_1, src)
+    storage.save_research_files(1)
+    storage.load_research_files(1)
+
+    archived = storage.RESEARCH_DIR / '1' / 'analyzed' / '1.jpg'
+    # Загрузка не копирует данные: файл сессии — тот же файл на диске
+    assert src.stat().st_ino == archived.stat().st_ino
+
+    # Повторный анализ заменяет файл сессии, архив не меняется
+    storage.write_session_file(src, b'new')
+    assert src.read_bytes() == b'new'
+    assert archived.read_bytes() == RES_1.read_bytes()
+
+
 # ---------------------------------------------------------------------------
 # base64
 # ---------------------------------------------------------------------------
@@ -80,3 +114,47 @@ def test_image_to_base64():
     assert len(decoded) > 0
     # JPEG magic bytes
     assert decoded[:2] == b'\xff\xd8'
+
+
+# ---------------------------------------------------------------------------
+# Импорт по путям
+# ---------------------------------------------------------------------------
+
+def test_import_source_files_numbers_after_existing(tmp_path):
+    storage.clear_session_research()
+    sources = storage.SESSION_RES_DIR / 'sources'
+    shutil.copy(RES_1, sources / '3.jpg')
+
+    outside = tmp_path / 'microscope'
+    outside.mkdir()
+    shutil.copy(RES_1, outside / 'b.JPG')
+    shutil.copy(RES_1, outside / 'a.png')
+    (outside / 'notes.txt').write_text('не изображение')
+
+    paths = storage.expand_import_paths([str(outside)])
+    assert [p.name for p in paths] == ['a.png', 'b.JPG']
+
+    progress = []
+    names = storage.import_source_files(paths, lambda *a: progress.append(a))
+
+    assert names == ['4.png', '5.jpg']
+    assert progress == [(1, 2, '4.png'), (2, 2, '5.jpg')]
+    assert (sources / '5.jpg').read_bytes() == RES_1.read_bytes()
+    # Исходник на месте, в сессии — копия
+    assert (outside / 'b.JPG').exists()
+    assert storage.list_session_images('research') == ['3.jpg', '4.png', '5.jpg']
+
+
+def test_import_copies_external_files_and_links_archive(tmp_path):
+    external = tmp_path / 'external.jpg'
+    shutil.copy(RES_1, external)
+    archived = storage.RESEARCH_DIR / '1' / 'sources' / '1.jpg'
+    archived.parent.mkdir(parents=True)
+    shutil.copy(RES_1, archived)
+
+    storage.import_source_files([external, archived])
+
+    sources = storage.SESSION_RES_DIR / 'sources'
+    assert (sources / '1.jpg').stat().st_ino != external.stat().st_ino
+    assert (sources / '1.jpg').read_bytes() == external.read_bytes()
+    assert (sources / '2.jpg').stat().st_ino == archived.stat().st_ino